@@ -13,7 +13,7 @@ import shutil
 import os
 import re
 import time
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import config
 
 
@@ -96,27 +96,17 @@ def validate_printer_name(printer_name: str) -> bool:
         return False
 
 
-def parse_page_range(page_range: str, total_pages: int) -> List[int]:
+def _parse_page_intervals(page_range: str, total_pages: int) -> List[Tuple[int, int]]:
     """
-    解析页面范围字符串
-
-    Args:
-        page_range: 页面范围字符串，如 "1,3,5-7"
-        total_pages: 文档总页数
+    把页面范围解析为按起始页排序、已合并的闭区间（1-based）
 
-    Returns:
-        页码列表（0-based索引）
+    只与范围段数有关，不展开页码："1-2000000" 在越界校验时直接报错，不会先生成两百万个页码。
 
     Raises:
         ValueError: 页面范围格式错误或超出范围
     """
-    if not page_range or not page_range.strip():
-        return list(range(total_pages))
-
-    pages = set()
-    parts = page_range.replace(' ', '').split(',')
-
-    for part in parts:
+    intervals = []
+    for part in page_range.replace(' ', '').split(','):
         if not part:
             continue
         if '-' in part:
@@ -128,16 +118,46 @@ def parse_page_range(page_range: str, total_pages: int) -> List[int]:
                 raise ValueError(f'起始页不能大于结束页: {part}')
             if start < 1 or end > total_pages:
                 raise ValueError(f'页码超出范围(1-{total_pages}): {part}')
-            pages.update(range(start - 1, end))  # 转为0-based
         else:
             if not part.isdigit():
                 raise ValueError(f'无效的页码: {part}')
-            page = int(part)
-            if page < 1 or page > total_pages:
-                raise ValueError(f'页码超出范围(1-{total_pages}): {page}')
-            pages.add(page - 1)  # 转为0-based
+            start = end = int(part)
+            if start < 1 or start > total_pages:
+                raise ValueError(f'页码超出范围(1-{total_pages}): {start}')
+        intervals.append((start, end))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def parse_page_range(page_range: str, total_pages: int) -> List[int]:
+    """
+    解析页面范围字符串
+
+    Args:
+        page_range: 页面范围字符串，如 "1,3,5-7"
+        total_pages: 文档总页数
+
+    Returns:
+        页码列表（0-based索引）
+
+    Raises:
+        ValueError: 页面范围格式错误或超出范围
+    """
+    if not page_range or not page_range.strip():
+        return list(range(total_pages))
 
-    return sorted(pages)
+    # 先在区间上完成校验与合并，通过后再展开（结果不超过文档总页数，且已去重、有序）
+    pages = []
+    for start, end in _parse_page_intervals(page_range, total_pages):
+        pages.extend(range(start - 1, end))  # 转为0-based
+    return pages
 
 
 def _driver_validate_devmode(hprinter, printer_name: str, devmode):
@@ -0,0 +1,155 @@
+"""按打印机熔断 - Linux版本
+
+打印机停用/离线（PRINTER_HOLD_OFFLINE），或最近连续提交失败达到阈值（PRINTER_BREAKER_THRESHOLD）时熔断，
+两种触发条件分别开关：发往它的任务留在通道中暂停（不做转换和
+Ghostscript 预处理），打印机恢复后自动继续；冷却期过后放行一个试探任务，提交成功即恢复。
+暂停超过 PRINTER_HOLD_SECONDS 的任务交给工作线程直接判定失败。
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+# 快照超过该秒数未更新时不再据此熔断（后台刷新关闭时避免一份旧的离线快照永久挡住任务）
+_SNAPSHOT_MAX_AGE = 60.0
+
+
+def is_printer_failure(exc: BaseException) -> bool:
+    """提交失败是否应记到打印机头上：lp 失败/超时、连不上 cupsd 或 IPP 服务端错误。"""
+    from .ipp import IppError
+    from .printer import PrintSubmitError
+
+    if isinstance(exc, IppError):
+        return exc.status_code is None or exc.status_code >= 0x0500
+    return isinstance(exc, PrintSubmitError)
+
+
+class _Circuit:
+    __slots__ = ('failures', 'open_until', 'trial_until', 'last_error')
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_until = 0.0
+        self.last_error = ''
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+        self._stats = {'opened': 0, 'trials': 0, 'recovered': 0}
+
+    @staticmethod
+    def _threshold() -> int:
+        return int(getattr(config, 'PRINTER_BREAKER_THRESHOLD', 0) or 0)
+
+    @staticmethod
+    def _hold_offline() -> bool:
+        return bool(getattr(config, 'PRINTER_HOLD_OFFLINE', True))
+
+    @staticmethod
+    def _cooldown() -> float:
+        return float(getattr(config, 'PRINTER_BREAKER_COOLDOWN', 60) or 0)
+
+    @staticmethod
+    def resolve(printer: Optional[str]) -> Optional[str]:
+        if printer:
+            return printer
+        from .printer import peek_printer_snapshot
+
+        snapshot = peek_printer_snapshot()
+        return getattr(config, 'DEFAULT_PRINTER', None) or (snapshot.default if snapshot else None)
+
+    def reason(self, printer: Optional[str]) -> Optional[str]:
+        """打印机当前被熔断时返回原因，否则返回 None（不查询 CUPS）。"""
+        threshold = self._threshold()
+        if threshold <= 0 and not self._hold_offline():
+            return None
+        name = self.resolve(printer)
+        if not name:
+            return None
+        if self._hold_offline():
+            from .printer import peek_printer_snapshot
+
+            snapshot = peek_printer_snapshot()
+            if snapshot is not None and snapshot.ok and time.monotonic() - snapshot.taken_at <= _SNAPSHOT_MAX_AGE:
+                for state in snapshot.printers:
+                    if state.name == name and state.status == 'offline':
+                        return f'打印机 {name} 已停用/离线'
+        if threshold <= 0:
+            return None
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if circuit is not None and circuit.failures >= self._threshold() and time.monotonic() < circuit.open_until:
+                return f'打印机 {name} 连续 {circuit.failures} 次提交失败: {circuit.last_error}'
+        return None
+
+    def blocked(self, printer: Optional[str]) -> bool:
+        return self.reason(printer) is not None
+
+    def admits(self, printer: Optional[str]) -> bool:
+        """acquire 此刻是否会放行，但不占用半开状态的试探名额（用于判断池中是否还有成员可用）。"""
+        return self._admit(printer, take_trial=False)
+
+    def acquire(self, printer: Optional[str]) -> bool:
+        """能否为该打印机放行一个任务；冷却期后的半开状态每个冷却周期只放行一个试探任务。"""
+        return self._admit(printer, take_trial=True)
+
+    def _admit(self, printer: Optional[str], take_trial: bool) -> bool:
+        if self.blocked(printer):
+            return False
+        name = self.resolve(printer)
+        if not name:
+            return True
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if circuit is None or circuit.failures < self._threshold():
+                return True
+            now = time.monotonic()
+            if now < circuit.trial_until:
+                return False
+            if take_trial:
+                circuit.trial_until = now + self._cooldown()
+                self._stats['trials'] += 1
+            return True
+
+    def record_success(self, printer: Optional[str]):
+        name = self.resolve(printer)
+        if not name:
+            return
+        with self._lock:
+            circuit = self._circuits.pop(name, None)
+            if circuit is not None and circuit.failures >= self._threshold() > 0:
+                self._stats['recovered'] += 1
+
+    def record_failure(self, printer: Optional[str], error: str = ''):
+        name = self.resolve(printer)
+        if not name or self._threshold() <= 0:
+            return
+        with self._lock:
+            circuit = self._circuits.setdefault(name, _Circuit())
+            circuit.failures += 1
+            circuit.last_error = (error or '')[:200]
+            if circuit.failures >= self._threshold():
+                if circuit.failures == self._threshold():
+                    self._stats['opened'] += 1
+                circuit.open_until = time.monotonic() + self._cooldown()
+                circuit.trial_until = 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            now = time.monotonic()
+            data['open'] = sorted(
+                name for name, c in self._circuits.items()
+                if c.failures >= self._threshold() > 0 and now < c.open_until
+            )
+        return data
+
+
+circuit_breaker = CircuitBreaker()
@@ -1,18 +1,42 @@
 """文档格式转换 - Linux版本 (LibreOffice headless)"""
+import contextlib
+import fcntl
+import json
 import os
+import queue
+import re
 import shutil
 import subprocess
 import tempfile
 import threading
+import time
 import uuid
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 try:
     from labprinter_linux import config
 except ImportError:
     import config
 
-_CONVERT_LOCK = threading.Lock()
+from .file_cache import FileCache, sha256_file
+from .office_pool import get_office_pool, get_office_pool_stats
+from .supervisor import ToolLimitExceeded, ToolStalled, run_tool
+
+_CONVERT_LANES_LOCK = threading.Lock()
+_CONVERT_LANES: Optional[queue.Queue] = None
+_CONVERT_CACHE_LOCK = threading.Lock()
+_CONVERT_CACHE: Optional[FileCache] = None
+_CONVERTER_VERSION_LOCK = threading.Lock()
+_CONVERTER_VERSION: Optional[str] = None
+_CONVERT_BATCHER_LOCK = threading.Lock()
+_CONVERT_BATCHER: Optional['_ConvertBatcher'] = None
+_PROFILE_TEMPLATE_LOCK = threading.Lock()
+_PROFILE_TEMPLATE: Optional[str] = None  # None=未构建，''=不使用模板
+# 模板构建失败后在此时刻之前不再重试（一次偶发失败不会让整个进程都用空 profile）
+_PROFILE_TEMPLATE_RETRY_AT = 0.0
+_PROFILE_TEMPLATE_RETRY_SECONDS = 300.0
+_FICLONE = 0x40049409
 
 
 def _find_soffice() -> str:
@@ -21,7 +45,202 @@ def _find_soffice() -> str:
     return shutil.which('soffice') or shutil.which('libreoffice') or ''
 
 
-def convert_to_pdf(input_path: str) -> str:
+def _work_root() -> str:
+    return os.path.join(tempfile.gettempdir(), 'labprinter')
+
+
+def _headless_env() -> dict:
+    # 某些环境（例如 SSH 开启 X11 转发但本机无 X Server）会因 DISPLAY 存在而触发 X11 相关提示。
+    # 强制清理 DISPLAY / WAYLAND_DISPLAY，确保 LibreOffice 真正以 headless 运行。
+    env = os.environ.copy()
+    env.pop('DISPLAY', None)
+    env.pop('WAYLAND_DISPLAY', None)
+    env.pop('XAUTHORITY', None)
+    return env
+
+
+def _convert_concurrency() -> int:
+    try:
+        n = int(getattr(config, 'CONVERT_CONCURRENCY', 1) or 1)
+    except (TypeError, ValueError):
+        n = 1
+    return max(1, n)
+
+
+@contextlib.contextmanager
+def _convert_lane():
+    """占用一条转换通道（CONVERT_CONCURRENCY 条），返回通道编号。"""
+    global _CONVERT_LANES
+    with _CONVERT_LANES_LOCK:
+        if _CONVERT_LANES is None:
+            _CONVERT_LANES = queue.Queue()
+            for i in range(_convert_concurrency()):
+                _CONVERT_LANES.put(i)
+        lanes = _CONVERT_LANES
+    lane = lanes.get()
+    try:
+        yield lane
+    finally:
+        lanes.put(lane)
+
+
+def _unique_output_path(stem: str) -> str:
+    out_dir = _work_root()
+    os.makedirs(out_dir, exist_ok=True)
+    return os.path.abspath(os.path.join(out_dir, f'{stem}-{uuid.uuid4().hex[:8]}.pdf'))
+
+
+def _fresh_dir(path: str) -> str:
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _converter_version(soffice: str) -> str:
+    """转换器版本（进程内只探测一次），作为转换缓存 key 的一部分：升级 LibreOffice 后旧缓存自动失效。"""
+    global _CONVERTER_VERSION
+    with _CONVERTER_VERSION_LOCK:
+        if _CONVERTER_VERSION is None:
+            version = ''
+            try:
+                result = run_tool('soffice', [soffice, '--headless', '--version'], env=_headless_env(), timeout=30, role='soffice')
+                if result.returncode == 0:
+                    version = result.stdout.strip()
+            except Exception:
+                version = ''
+            if not version:
+                try:
+                    st = os.stat(os.path.realpath(soffice))
+                    version = f'{os.path.realpath(soffice)}:{st.st_size}:{int(st.st_mtime)}'
+                except OSError:
+                    version = soffice
+            _CONVERTER_VERSION = version
+        return _CONVERTER_VERSION
+
+
+def _reflink_or_copy(src: str, dst: str):
+    # 优先使用 FICLONE（btrfs/xfs 等支持 reflink 的文件系统上为写时复制，几乎零成本），否则普通复制
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return dst
+    except OSError:
+        return shutil.copy2(src, dst)
+
+
+def prepare_profile_template() -> Optional[str]:
+    """构建一次已完成首启初始化的 LibreOffice profile 模板，之后每次转换克隆它。
+
+    模板按转换器版本标记，升级 LibreOffice 后自动重建；构建失败返回 None（退回空 profile），
+    _PROFILE_TEMPLATE_RETRY_SECONDS 秒后再尝试构建。
+    """
+    global _PROFILE_TEMPLATE, _PROFILE_TEMPLATE_RETRY_AT
+    soffice = _find_soffice()
+    if not soffice:
+        return None
+    with _PROFILE_TEMPLATE_LOCK:
+        if _PROFILE_TEMPLATE is not None:
+            return _PROFILE_TEMPLATE or None
+        if time.monotonic() < _PROFILE_TEMPLATE_RETRY_AT:
+            return None
+
+        template_dir = os.path.join(_work_root(), 'lo_profile', 'template')
+        marker = os.path.join(template_dir, '.labprinter-template')
+        version = _converter_version(soffice)
+        try:
+            with open(marker, 'r', encoding='utf-8') as f:
+                if f.read() == version:
+                    _PROFILE_TEMPLATE = template_dir
+                    return template_dir
+        except OSError:
+            pass
+
+        _fresh_dir(template_dir)
+        try:
+            result = run_tool(
+                'soffice',
+                [
+                    soffice,
+                    '--headless',
+                    '--nologo',
+                    '--nofirststartwizard',
+                    '--norestore',
+                    '--terminate_after_init',
+                    f'-env:UserInstallation={Path(template_dir).as_uri()}',
+                ],
+                env=_headless_env(),
+                timeout=config.CONVERT_TIMEOUT,
+                progress_paths=[template_dir],
+                role='soffice',
+            )
+            ok = result.returncode == 0
+        except Exception:
+            ok = False
+        if not ok:
+            shutil.rmtree(template_dir, ignore_errors=True)
+            _PROFILE_TEMPLATE_RETRY_AT = time.monotonic() + _PROFILE_TEMPLATE_RETRY_SECONDS
+            return None
+        with open(marker, 'w', encoding='utf-8') as f:
+            f.write(version)
+        _PROFILE_TEMPLATE = template_dir
+        return template_dir
+
+
+def seed_profile(profile_dir: str):
+    """准备一个全新的 profile 目录：有模板时克隆模板，否则为空目录。"""
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    template = prepare_profile_template()
+    if template:
+        try:
+            shutil.copytree(template, profile_dir, symlinks=True, copy_function=_reflink_or_copy)
+            return
+        except (OSError, shutil.Error):
+            shutil.rmtree(profile_dir, ignore_errors=True)
+    os.makedirs(profile_dir, exist_ok=True)
+
+
+def get_convert_cache() -> FileCache:
+    global _CONVERT_CACHE
+    with _CONVERT_CACHE_LOCK:
+        if _CONVERT_CACHE is None:
+            cache_dir = getattr(config, 'CONVERT_CACHE_DIR', '') or os.path.join(
+                tempfile.gettempdir(), 'labprinter', 'cache', 'convert'
+            )
+            max_mb = int(getattr(config, 'CONVERT_CACHE_MAX_MB', 0) or 0)
+            _CONVERT_CACHE = FileCache(cache_dir, max_mb * 1024 * 1024)
+        return _CONVERT_CACHE
+
+
+def get_convert_stats() -> dict:
+    return {
+        'cache': get_convert_cache().stats(),
+        'pool': get_office_pool_stats(),
+        'concurrency': _convert_concurrency(),
+        'batch': _CONVERT_BATCHER.stats() if _CONVERT_BATCHER is not None else None,
+    }
+
+
+def supports_page_range_export() -> bool:
+    """LibreOffice 7.4+ 支持在 --convert-to 中以 JSON 传入 PDF 导出参数（PageRange）。"""
+    if not getattr(config, 'CONVERT_EXPORT_PAGE_RANGE', True):
+        return False
+    soffice = _find_soffice()
+    if not soffice:
+        return False
+    m = re.search(r'(\d+)\.(\d+)', _converter_version(soffice))
+    return bool(m) and (int(m.group(1)), int(m.group(2))) >= (7, 4)
+
+
+def _pdf_convert_target(page_range: str) -> str:
+    if not page_range:
+        return 'pdf'
+    options = {'PageRange': {'type': 'string', 'value': page_range}}
+    return 'pdf:writer_pdf_Export:' + json.dumps(options, separators=(',', ':'))
+
+
+def convert_to_pdf(input_path: str, *, page_range: str = '') -> str:
+    """转换为 PDF；传入 page_range 时只导出这些页（调用方需先确认 supports_page_range_export()）。"""
     abs_input = os.path.abspath(input_path)
     if not os.path.exists(abs_input):
         raise RuntimeError(f'文件不存在: {abs_input}')
@@ -30,47 +249,198 @@ def convert_to_pdf(input_path: str) -> str:
     if not soffice:
         raise RuntimeError('未找到 LibreOffice (soffice)，请安装 libreoffice-writer 或设置 SOFFICE_PATH')
 
-    out_dir = os.path.join(tempfile.gettempdir(), 'labprinter')
-    os.makedirs(out_dir, exist_ok=True)
+    target = _pdf_convert_target(page_range)
+    cache = get_convert_cache()
+    if not cache.enabled:
+        return _convert_uncached(abs_input, soffice, target)
+
+    # 同一份讲义被反复打印时直接复用已转换的 PDF；相同内容并发提交只转换一次
+    key = sha256_file(abs_input, extra=(target, _converter_version(soffice)))
+    dest = _unique_output_path(Path(abs_input).stem)
+    return cache.get_or_create(key, lambda: _convert_uncached(abs_input, soffice, target), dest)
+
 
+def _convert_uncached(abs_input: str, soffice: str, target: str = 'pdf') -> str:
     stem = Path(abs_input).stem
-    abs_output = os.path.abspath(os.path.join(out_dir, f'{stem}.pdf'))
+    convert_root = os.path.join(_work_root(), 'convert')
+    os.makedirs(convert_root, exist_ok=True)
 
-    profile_dir = os.path.join(tempfile.gettempdir(), 'labprinter', 'lo_profile', uuid.uuid4().hex)
-    os.makedirs(profile_dir, exist_ok=True)
-    user_install = Path(profile_dir).as_uri()
-
-    cmd = [
-        soffice,
-        '--headless',
-        '--nologo',
-        '--nofirststartwizard',
-        '--norestore',
-        f'-env:UserInstallation={user_install}',
-        '--convert-to', 'pdf',
-        '--outdir', out_dir,
-        abs_input
-    ]
+    pool = get_office_pool()
+    if pool is not None:
+        out_dir = tempfile.mkdtemp(prefix='pool-', dir=convert_root)
+        try:
+            converted = pool.convert(abs_input, out_dir, timeout=config.CONVERT_TIMEOUT, target=target)
+            abs_output = _unique_output_path(stem)
+            os.replace(converted, abs_output)
+            return abs_output
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
 
-    try:
-        with _CONVERT_LOCK:
-            # 某些环境（例如 SSH 开启 X11 转发但本机无 X Server）会因 DISPLAY 存在而触发 X11 相关提示。
-            # 强制清理 DISPLAY / WAYLAND_DISPLAY，确保 LibreOffice 真正以 headless 运行。
-            env = os.environ.copy()
-            env.pop('DISPLAY', None)
-            env.pop('WAYLAND_DISPLAY', None)
-            env.pop('XAUTHORITY', None)
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                env=env,
-                timeout=config.CONVERT_TIMEOUT
-            )
-        if result.returncode != 0:
-            raise RuntimeError((result.stderr or result.stdout or '').strip() or f'LibreOffice 转换失败，返回码 {result.returncode}')
-        if not os.path.exists(abs_output):
-            raise RuntimeError('转换后的PDF文件未找到')
-        return abs_output
-    finally:
-        shutil.rmtree(profile_dir, ignore_errors=True)
+    batcher = _get_batcher()
+    if batcher is not None:
+        return batcher.convert(abs_input, soffice, target)
+
+    outputs, error = _soffice_convert(soffice, target, [abs_input], config.CONVERT_TIMEOUT)
+    if error:
+        raise RuntimeError(error)
+    if not outputs[abs_input]:
+        raise RuntimeError('转换后的PDF文件未找到')
+    return outputs[abs_input]
+
+
+def _soffice_convert(soffice: str, target: str, inputs: List[str], timeout: float) -> Tuple[Dict[str, Optional[str]], str]:
+    """在一条转换通道内用一次 soffice 调用转换 inputs。
+
+    返回 ({输入路径: 输出PDF路径或None}, 错误信息)；输入的文件名主干必须互不相同。
+    """
+    convert_root = os.path.join(_work_root(), 'convert')
+    # 每条通道独占自己的 profile 与输出目录：多通道并行转换互不干扰，同名文件也不会互相覆盖
+    with _convert_lane() as lane:
+        lane_dir = os.path.join(convert_root, f'lane-{lane}')
+        out_dir = _fresh_dir(os.path.join(lane_dir, 'out'))
+        profile_dir = os.path.join(lane_dir, 'profile')
+        seed_profile(profile_dir)
+
+        cmd = [
+            soffice,
+            '--headless',
+            '--nologo',
+            '--nofirststartwizard',
+            '--norestore',
+            f'-env:UserInstallation={Path(profile_dir).as_uri()}',
+            '--convert-to', target,
+            '--outdir', out_dir,
+            *inputs
+        ]
+
+        error = ''
+        try:
+            try:
+                result = run_tool('soffice', cmd, env=_headless_env(), timeout=timeout, progress_paths=[out_dir], role='soffice')
+                if result.returncode != 0:
+                    error = (result.stderr or result.stdout or '').strip() or f'LibreOffice 转换失败，返回码 {result.returncode}'
+            except subprocess.TimeoutExpired:
+                error = f'LibreOffice 转换超时({int(timeout)}秒)'
+            except (ToolStalled, ToolLimitExceeded) as e:
+                error = str(e)
+
+            outputs: Dict[str, Optional[str]] = {}
+            for abs_input in inputs:
+                stem = Path(abs_input).stem
+                converted = os.path.join(out_dir, f'{stem}.pdf')
+                if os.path.exists(converted):
+                    abs_output = _unique_output_path(stem)
+                    os.replace(converted, abs_output)
+                    outputs[abs_input] = abs_output
+                else:
+                    outputs[abs_input] = None
+            return outputs, error
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+class _BatchRequest:
+    def __init__(self, abs_input: str):
+        self.abs_input = abs_input
+        self.event = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class _ConvertBatcher:
+    """在一个短时间窗口内把同一导出参数的转换请求合并成一次 soffice 调用，分摊 LibreOffice 启动开销。"""
+
+    def __init__(self, window_seconds: float, max_batch: int):
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._pending: Dict[str, List[_BatchRequest]] = {}
+        self._stats = {'batches': 0, 'documents': 0, 'retries': 0}
+
+    def convert(self, abs_input: str, soffice: str, target: str) -> str:
+        req = _BatchRequest(abs_input)
+        with self._cond:
+            group = self._pending.setdefault(target, [])
+            group.append(req)
+            if len(group) == 1:
+                threading.Thread(
+                    target=self._collect, args=(soffice, target), name='ConvertBatch', daemon=True
+                ).start()
+            elif len(group) >= self.max_batch:
+                self._cond.notify_all()
+        req.event.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _collect(self, soffice: str, target: str):
+        deadline = time.monotonic() + self.window_seconds
+        with self._cond:
+            while len(self._pending.get(target, ())) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending.pop(target, [])
+        try:
+            self._run(soffice, target, batch)
+        finally:
+            for req in batch:
+                if req.result is None and req.error is None:
+                    req.error = RuntimeError('转换后的PDF文件未找到')
+                req.event.set()
+
+    def _run(self, soffice: str, target: str, batch: List[_BatchRequest]):
+        # 同一次调用的输出按文件名主干区分，主干重复的请求拆到后续调用
+        rounds: List[List[_BatchRequest]] = []
+        for req in batch:
+            stem = Path(req.abs_input).stem
+            for chunk in rounds:
+                if all(Path(r.abs_input).stem != stem for r in chunk):
+                    chunk.append(req)
+                    break
+            else:
+                rounds.append([req])
+
+        for chunk in rounds:
+            inputs = [r.abs_input for r in chunk]
+            with self._cond:
+                self._stats['batches'] += 1
+                self._stats['documents'] += len(inputs)
+            try:
+                outputs, error = _soffice_convert(soffice, target, inputs, config.CONVERT_TIMEOUT * len(inputs))
+            except Exception as e:
+                for r in chunk:
+                    r.error = e
+                continue
+            for r in chunk:
+                output = outputs.get(r.abs_input)
+                if output:
+                    r.result = output
+                elif error and len(chunk) > 1:
+                    # 整批崩溃/超时：没有产出的文件单独重试，坏文件只会让它自己的任务失败
+                    with self._cond:
+                        self._stats['retries'] += 1
+                    single, single_error = _soffice_convert(soffice, target, [r.abs_input], config.CONVERT_TIMEOUT)
+                    if single.get(r.abs_input):
+                        r.result = single[r.abs_input]
+                    else:
+                        r.error = RuntimeError(single_error or '转换后的PDF文件未找到')
+                else:
+                    r.error = RuntimeError(error or '转换后的PDF文件未找到')
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return dict(self._stats)
+
+
+def _get_batcher() -> Optional[_ConvertBatcher]:
+    global _CONVERT_BATCHER
+    window_ms = int(getattr(config, 'CONVERT_BATCH_WINDOW_MS', 0) or 0)
+    if window_ms <= 0:
+        return None
+    with _CONVERT_BATCHER_LOCK:
+        if _CONVERT_BATCHER is None:
+            _CONVERT_BATCHER = _ConvertBatcher(window_ms / 1000.0, int(getattr(config, 'CONVERT_BATCH_MAX', 8) or 8))
+        return _CONVERT_BATCHER
@@ -0,0 +1,151 @@
+"""已上传待打印文档 - Linux版本
+
+两阶段打印：上传后立即在后台转换/统计页数（推测执行），用户填写打印选项期间转换已在进行；
+提交打印时直接使用已转换好的 PDF。图片/文本按 A4 推测排版，提交时选了其它纸张则改由打印任务按所选纸张重新转换。
+长时间未提交打印的文档按 TTL 过期清理。
+"""
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+
+class DocumentState(Enum):
+    PROCESSING = "PROCESSING"
+    READY = "READY"
+    FAILURE = "FAILURE"
+
+
+@dataclass
+class Document:
+    id: str
+    filepath: str
+    original_filename: str = ""
+    state: DocumentState = DocumentState.PROCESSING
+    page_count: Optional[int] = None
+    pdf_path: Optional[str] = None
+    paper_size: Optional[str] = None  # 推测转换排版所用纸张；None 表示结果与纸张无关
+    error: str = ""
+    committed: bool = False
+    created_at: float = field(default_factory=time.monotonic)
+
+
+def _remove_quietly(path: Optional[str]):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class DocumentStore:
+    def __init__(self):
+        self._docs: Dict[str, Document] = {}
+        self._lock = threading.Lock()
+        limit = int(getattr(config, 'DOCUMENT_PREPARE_CONCURRENCY', 0) or 0) or config.MAX_CONCURRENT_JOBS
+        self._prepare_slots = threading.BoundedSemaphore(max(1, limit))
+
+    def create(self, filepath: str, original_filename: str = "") -> Document:
+        max_docs = int(getattr(config, 'MAX_PENDING_DOCUMENTS', 0) or 0)
+        doc = Document(id=uuid.uuid4().hex, filepath=filepath, original_filename=original_filename)
+        with self._lock:
+            if max_docs and len(self._docs) >= max_docs:
+                raise RuntimeError("待打印文档过多，请稍后再试")
+            self._docs[doc.id] = doc
+        threading.Thread(target=self._prepare, args=(doc,), name=f"DocPrepare-{doc.id[:8]}", daemon=True).start()
+        return doc
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        with self._lock:
+            return self._docs.get(doc_id)
+
+    def _prepare(self, doc: Document):
+        from .converter import convert_to_pdf
+        from .fast_convert import convert_fast, supports as fast_convert_supports
+        from .printer import _get_pdf_total_pages
+
+        pdf_path = None
+        paper_size = None
+        try:
+            with self._prepare_slots:
+                ext = os.path.splitext(doc.filepath)[1].lower()
+                if ext == '.pdf':
+                    page_count = _get_pdf_total_pages(doc.filepath)
+                elif fast_convert_supports(ext):
+                    paper_size = 'A4'
+                    pdf_path = convert_fast(doc.filepath, paper_size=paper_size)
+                    page_count = _get_pdf_total_pages(pdf_path)
+                else:
+                    pdf_path = convert_to_pdf(doc.filepath)
+                    page_count = _get_pdf_total_pages(pdf_path)
+        except Exception as e:
+            _remove_quietly(pdf_path)
+            with self._lock:
+                doc.state = DocumentState.FAILURE
+                doc.error = str(e)
+            return
+
+        with self._lock:
+            if doc.committed or doc.id not in self._docs:
+                # 已按原文件提交打印或已过期：推测转换结果作废
+                discard = pdf_path
+            else:
+                discard = None
+                doc.pdf_path = pdf_path
+                doc.paper_size = paper_size
+                doc.page_count = page_count
+                doc.state = DocumentState.READY
+        _remove_quietly(discard)
+
+    def commit(self, doc_id: str, paper_size: str = 'A4') -> Optional[Tuple[Document, str]]:
+        """取出文档用于打印，返回 (文档, 应提交打印的文件路径)；文档不存在时返回 None。
+
+        已转换完成时提交 PDF 并删除原文件；仍在转换时提交原文件（由打印任务自行转换，
+        启用转换缓存时会与推测转换合并为一次）。推测排版的纸张与 paper_size 不同时同样提交原文件。
+        """
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                return None
+            doc.committed = True
+            ready = doc.state == DocumentState.READY and doc.pdf_path
+            stale = ready and not self.layout_matches(doc, paper_size)
+        if stale:
+            _remove_quietly(doc.pdf_path)
+            return doc, doc.filepath
+        if ready:
+            _remove_quietly(doc.filepath)
+            return doc, doc.pdf_path
+        return doc, doc.filepath
+
+    @staticmethod
+    def layout_matches(doc: Document, paper_size: str) -> bool:
+        """推测转换的结果（含页数）是否适用于所选纸张。"""
+        return doc.paper_size is None or doc.paper_size == paper_size
+
+    def discard(self, doc_id: str) -> bool:
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        _remove_quietly(doc.filepath)
+        _remove_quietly(doc.pdf_path)
+        return True
+
+    def cleanup_expired(self, ttl_seconds: int):
+        now = time.monotonic()
+        with self._lock:
+            expired = [d.id for d in self._docs.values() if now - d.created_at > ttl_seconds]
+        for doc_id in expired:
+            self.discard(doc_id)
+
+
+document_store = DocumentStore()
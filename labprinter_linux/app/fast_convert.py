@@ -0,0 +1,367 @@
+"""图片/纯文本 → PDF 进程内快速转换 - Linux版本
+
+不经过 LibreOffice：
+- JPEG 以 DCTDecode 原样嵌入，非隔行且不含透明信息的灰度/RGB/调色板 PNG 以 FlateDecode + PNG 预测器原样嵌入，均不重新编码；
+  其它图片（带 alpha 通道或 tRNS 透明的 PNG、TIFF 等）需要 Pillow 解码后以无损 Flate 嵌入，多页 TIFF 每帧一页。
+- EXIF 方向（含镜像）对 JPEG 以页面 /Rotate 与镜像绘制实现，不重新编码。
+- 纯文本按等宽近似排版，中文使用 PDF 标准 CJK 字体 STSong-Light（不嵌入，由打印端字体替换渲染）。
+"""
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff'}
+TEXT_EXTENSIONS = {'.txt'}
+
+# 纸张尺寸（pt），与上传表单的 paper_size 选项对应
+PAPER_SIZES = {
+    'A4': (595.0, 842.0),
+    'A3': (842.0, 1191.0),
+    'Letter': (612.0, 792.0),
+}
+_MARGIN = 36.0
+
+_TEXT_FONT_SIZE = 10.5
+_TEXT_LEADING = 15.0
+_TEXT_MARGIN = 56.0
+
+
+def supports(ext: str) -> bool:
+    ext = (ext or '').lower()
+    return ext in IMAGE_EXTENSIONS or ext in TEXT_EXTENSIONS
+
+
+def convert_fast(input_path: str, *, paper_size: str = 'A4') -> str:
+    """把图片或文本文件转换为 PDF，返回输出路径（位于临时目录，由调用方删除）。"""
+    abs_input = os.path.abspath(input_path)
+    if not os.path.exists(abs_input):
+        raise RuntimeError(f'文件不存在: {abs_input}')
+    page = PAPER_SIZES.get(paper_size) or PAPER_SIZES['A4']
+    ext = os.path.splitext(abs_input)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        data = _image_pdf(abs_input, page)
+    elif ext in TEXT_EXTENSIONS:
+        data = _text_pdf(abs_input, page)
+    else:
+        raise RuntimeError(f'不支持的文件类型: {ext}')
+
+    from .converter import _unique_output_path
+
+    out_path = _unique_output_path(Path(abs_input).stem)
+    with open(out_path, 'wb') as f:
+        f.write(data)
+    return out_path
+
+
+class _PdfBuilder:
+    def __init__(self):
+        self._objects: List[bytes] = []
+
+    def reserve(self) -> int:
+        self._objects.append(b'')
+        return len(self._objects)
+
+    def set(self, num: int, body: bytes):
+        self._objects[num - 1] = body
+
+    def add(self, body: bytes) -> int:
+        self._objects.append(body)
+        return len(self._objects)
+
+    def add_stream(self, entries: bytes, data: bytes) -> int:
+        return self.add(b'<< ' + entries + b' /Length %d >>\nstream\n' % len(data) + data + b'\nendstream')
+
+    def build(self, root: int) -> bytes:
+        out = bytearray(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for i, body in enumerate(self._objects, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % i + body + b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(self._objects) + 1)
+        for off in offsets:
+            out += b'%010d 00000 n \n' % off
+        out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(self._objects) + 1, root, xref)
+        return bytes(out)
+
+
+def _pages_document(builder: _PdfBuilder, page_bodies: List[Tuple[bytes, bytes]], page: Tuple[float, float], rotate: int = 0,
+                    *, sizes: Optional[List[Tuple[float, float]]] = None) -> bytes:
+    """page_bodies: [(Resources 字典, 内容流)]；sizes 给出时按页指定页面尺寸。"""
+    pages_num = builder.reserve()
+    kids = []
+    for i, (resources, content) in enumerate(page_bodies):
+        page_w, page_h = sizes[i] if sizes else page
+        content_num = builder.add_stream(b'/Filter /FlateDecode', zlib.compress(content))
+        kids.append(builder.add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources %s /Contents %d 0 R%s >>'
+            % (pages_num, page_w, page_h, resources, content_num, b' /Rotate %d' % rotate if rotate else b'')
+        ))
+    builder.set(pages_num, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % k for k in kids), len(kids)))
+    root = builder.add(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_num)
+    return builder.build(root)
+
+
+# ---------- 图片 ----------
+
+def _jpeg_info(data: bytes) -> Tuple[int, int, int, int, bool]:
+    """返回 (宽, 高, 分量数, EXIF 方向, 是否带 Adobe APP14 标记)。"""
+    if data[:2] != b'\xff\xd8':
+        raise RuntimeError('JPEG 文件格式错误')
+    pos = 2
+    orientation = 1
+    adobe = False
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = data[pos + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            pos += 1 if marker == 0xFF else 2
+            continue
+        seg_len = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + seg_len]
+        if marker == 0xE1 and segment[:6] == b'Exif\x00\x00':
+            orientation = _exif_orientation(segment[6:]) or orientation
+        if marker == 0xEE and segment[:5] == b'Adobe':
+            adobe = True
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', segment[1:5])
+            return width, height, segment[5], orientation, adobe
+        pos += 2 + seg_len
+    raise RuntimeError('JPEG 文件缺少尺寸信息')
+
+
+def _exif_orientation(tiff: bytes) -> Optional[int]:
+    try:
+        endian = '<' if tiff[:2] == b'II' else '>'
+        ifd = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[ifd:ifd + 2])[0]
+        for i in range(count):
+            entry = tiff[ifd + 2 + i * 12: ifd + 14 + i * 12]
+            if struct.unpack(endian + 'H', entry[:2])[0] == 0x0112:
+                return struct.unpack(endian + 'H', entry[8:10])[0]
+    except (struct.error, IndexError):
+        return None
+    return None
+
+
+def _png_passthrough(data: bytes) -> Optional[Tuple[int, int, bytes, int, bytes, bytes]]:
+    """可原样嵌入时返回 (宽, 高, 色彩空间, 位深, DecodeParms, IDAT 数据)，否则返回 None。"""
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise RuntimeError('PNG 文件格式错误')
+    pos = 8
+    ihdr = None
+    palette = b''
+    idat = bytearray()
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if ctype == b'IHDR':
+            ihdr = struct.unpack('>IIBBBBB', chunk)
+        elif ctype == b'PLTE':
+            palette = chunk
+        elif ctype == b'tRNS':
+            return None  # 调色板/色键透明，交给 Pillow 合成到白底
+        elif ctype == b'IDAT':
+            idat += chunk
+        elif ctype == b'IEND':
+            break
+        pos += 12 + length
+    if ihdr is None:
+        raise RuntimeError('PNG 文件缺少 IHDR')
+    width, height, bit_depth, color_type, _, _, interlace = ihdr
+    if interlace != 0:
+        return None
+    if color_type == 0:
+        colors, colorspace = 1, b'/DeviceGray'
+    elif color_type == 2:
+        colors, colorspace = 3, b'/DeviceRGB'
+    elif color_type == 3 and palette:
+        colors = 1
+        colorspace = b'[/Indexed /DeviceRGB %d <%s>]' % (len(palette) // 3 - 1, palette.hex().encode())
+    else:
+        return None  # 带透明通道
+    parms = b'<< /Predictor 15 /Colors %d /BitsPerComponent %d /Columns %d >>' % (colors, bit_depth, width)
+    return width, height, colorspace, bit_depth, parms, bytes(idat)
+
+
+def _pillow_frames(path: str) -> List[Tuple[int, int, bytes, bytes]]:
+    """用 Pillow 解码图片，每一帧（多页 TIFF 的每一页）返回 (宽, 高, 色彩空间, Flate 数据)。
+
+    按 EXIF 方向（含镜像）转正，透明通道合成到白底上。
+    """
+    try:
+        from PIL import Image, ImageOps, ImageSequence  # type: ignore
+    except Exception as e:
+        raise RuntimeError('该图片需要 Pillow 解码，请在 Linux 端安装 requirements.txt') from e
+    try:
+        frames = []
+        with Image.open(path) as img:
+            for frame in ImageSequence.Iterator(img):
+                frame = ImageOps.exif_transpose(frame)
+                if frame.mode in ('RGBA', 'LA', 'PA') or (frame.mode == 'P' and 'transparency' in frame.info):
+                    rgba = frame.convert('RGBA')
+                    frame = Image.new('RGB', rgba.size, (255, 255, 255))
+                    frame.paste(rgba, mask=rgba.getchannel('A'))
+                elif frame.mode not in ('RGB', 'L'):
+                    frame = frame.convert('RGB')
+                colorspace = b'/DeviceGray' if frame.mode == 'L' else b'/DeviceRGB'
+                frames.append((frame.width, frame.height, colorspace, zlib.compress(frame.tobytes())))
+        return frames
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f'无法读取图片: {e}')
+
+
+# EXIF 方向 → (页面 /Rotate, 是否先水平镜像)；镜像在未旋转的坐标系中完成，再由 /Rotate 转正
+_ORIENTATION = {
+    2: (0, True),
+    3: (180, False),
+    4: (180, True),
+    5: (270, True),
+    6: (90, False),
+    7: (90, True),
+    8: (270, False),
+}
+
+
+def _image_page(builder: _PdfBuilder, width: int, height: int, entries: bytes, stream: bytes,
+                page: Tuple[float, float], rotate: int = 0, mirror: bool = False):
+    """放置一张图片，返回 ((Resources, 内容流), 页面尺寸)。"""
+    # 按显示方向选择纵向/横向页面，图片等比缩放居中
+    shown_w, shown_h = (height, width) if rotate in (90, 270) else (width, height)
+    page_w, page_h = page
+    if (shown_w > shown_h) != (page_w > page_h):
+        page_w, page_h = page_h, page_w
+    if rotate in (90, 270):
+        # /Rotate 作用于整页：在未旋转的坐标系中排版，页面尺寸随之交换
+        page_w, page_h = page_h, page_w
+    scale = min((page_w - 2 * _MARGIN) / width, (page_h - 2 * _MARGIN) / height)
+    draw_w, draw_h = width * scale, height * scale
+    x, y = (page_w - draw_w) / 2, (page_h - draw_h) / 2
+
+    image_num = builder.add_stream(b'/Type /XObject /Subtype /Image ' + entries, stream)
+    resources = b'<< /XObject << /Im0 %d 0 R >> >>' % image_num
+    if mirror:
+        content = b'q %.2f 0 0 %.2f %.2f %.2f cm /Im0 Do Q' % (-draw_w, draw_h, x + draw_w, y)
+    else:
+        content = b'q %.2f 0 0 %.2f %.2f %.2f cm /Im0 Do Q' % (draw_w, draw_h, x, y)
+    return (resources, content), (page_w, page_h)
+
+
+def _image_pdf(path: str, page: Tuple[float, float]) -> bytes:
+    with open(path, 'rb') as f:
+        data = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    builder = _PdfBuilder()
+    if ext in ('.jpg', '.jpeg'):
+        width, height, components, orientation, adobe = _jpeg_info(data)
+        colorspace = {1: b'/DeviceGray', 3: b'/DeviceRGB', 4: b'/DeviceCMYK'}.get(components)
+        if colorspace is None:
+            raise RuntimeError('不支持的 JPEG 颜色格式')
+        entries = b'/Width %d /Height %d /ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode' % (width, height, colorspace)
+        if components == 4 and adobe:
+            entries += b' /Decode [1 0 1 0 1 0 1 0]'  # Adobe 写出的 CMYK JPEG 为反相存储
+        rotate, mirror = _ORIENTATION.get(orientation, (0, False))
+        body, size = _image_page(builder, width, height, entries, data, page, rotate, mirror)
+        return _pages_document(builder, [body], size, rotate)
+
+    png = _png_passthrough(data) if ext == '.png' else None
+    if png is not None:
+        width, height, colorspace, bits, parms, stream = png
+        entries = (b'/Width %d /Height %d /ColorSpace %s /BitsPerComponent %d /Filter /FlateDecode /DecodeParms %s'
+                   % (width, height, colorspace, bits, parms))
+        body, size = _image_page(builder, width, height, entries, stream, page)
+        return _pages_document(builder, [body], size)
+
+    # 其它图片经 Pillow 解码；多页 TIFF 每一帧一页，横竖版各自选择页面方向
+    bodies, sizes = [], []
+    for width, height, colorspace, stream in _pillow_frames(path):
+        entries = b'/Width %d /Height %d /ColorSpace %s /BitsPerComponent 8 /Filter /FlateDecode' % (width, height, colorspace)
+        body, size = _image_page(builder, width, height, entries, stream, page)
+        bodies.append(body)
+        sizes.append(size)
+    return _pages_document(builder, bodies, sizes[0], sizes=sizes)
+
+
+# ---------- 纯文本 ----------
+
+def _decode_text(data: bytes) -> str:
+    for encoding in ('utf-8-sig', 'gb18030'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def _char_width(ch: str) -> float:
+    return 0.5 if ord(ch) < 0x80 else 1.0
+
+
+def _layout_lines(text: str, max_em: float) -> List[List[str]]:
+    """按宽度折行，返回按页分组前的行列表；换页符 \\f 产生分页标记 None。"""
+    lines: List = []
+    for raw in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        for part_index, part in enumerate(raw.split('\f')):
+            if part_index:
+                lines.append(None)
+            part = part.expandtabs(4)
+            line, width = [], 0.0
+            for ch in part:
+                if ch < ' ':
+                    continue
+                w = _char_width(ch)
+                if width + w > max_em and line:
+                    lines.append(''.join(line))
+                    line, width = [], 0.0
+                line.append(ch)
+                width += w
+            lines.append(''.join(line))
+    return lines
+
+
+def _text_pdf(path: str, page: Tuple[float, float]) -> bytes:
+    with open(path, 'rb') as f:
+        text = _decode_text(f.read())
+    page_w, page_h = page
+    max_em = (page_w - 2 * _TEXT_MARGIN) / _TEXT_FONT_SIZE
+    per_page = max(1, int((page_h - 2 * _TEXT_MARGIN) // _TEXT_LEADING))
+
+    pages: List[List[str]] = [[]]
+    for line in _layout_lines(text, max_em):
+        if line is None or len(pages[-1]) >= per_page:
+            pages.append([])
+            if line is None:
+                continue
+        pages[-1].append(line)
+
+    builder = _PdfBuilder()
+    descriptor = builder.add(
+        b'<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880] '
+        b'/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>'
+    )
+    cid_font = builder.add(
+        b'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light '
+        b'/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 4 >> '
+        b'/FontDescriptor %d 0 R /DW 1000 /W [1 95 500] >>' % descriptor
+    )
+    font = builder.add(
+        b'<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light-UniGB-UTF16-H '
+        b'/Encoding /UniGB-UTF16-H /DescendantFonts [%d 0 R] >>' % cid_font
+    )
+    resources = b'<< /Font << /F1 %d 0 R >> >>' % font
+
+    bodies = []
+    top = page_h - _TEXT_MARGIN - _TEXT_FONT_SIZE
+    for lines in pages:
+        content = bytearray(b'BT /F1 %.1f Tf %.1f TL %.2f %.2f Td\n' % (_TEXT_FONT_SIZE, _TEXT_LEADING, _TEXT_MARGIN, top))
+        for line in lines:
+            content += b'<%s> Tj T*\n' % line.encode('utf-16-be').hex().encode()
+        content += b'ET'
+        bodies.append((resources, bytes(content)))
+    return _pages_document(builder, bodies, page)
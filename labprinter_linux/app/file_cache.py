@@ -0,0 +1,187 @@
+"""按内容寻址的磁盘文件缓存 - Linux版本
+
+缓存条目以 key（通常是输入内容 SHA-256 加上影响结果的参数）命名，
+按总字节数做 LRU 淘汰；同一 key 的并发请求只会真正生成一次（single-flight），
+生成失败时正在等待的请求直接得到同一个错误，不会逐个重跑（失败本身不缓存）。
+"""
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, Optional
+
+
+def sha256_file(path: str, extra: Iterable[str] = ()) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    for part in extra:
+        h.update(b'\0')
+        h.update(str(part).encode('utf-8'))
+    return h.hexdigest()
+
+
+class _Flight:
+    """一次正在进行的生成；失败时记录异常供等待者共享。"""
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class FileCache:
+    def __init__(self, cache_dir: str, max_bytes: int, *, suffix: str = '.pdf'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes or 0))
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'shared_failures': 0, 'evictions': 0, 'errors': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}{self.suffix}')
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_or_create(self, key: str, producer: Callable[[], str], dest: str) -> str:
+        """命中则把缓存文件导出到 dest；未命中则调用 producer() 生成文件，发布进缓存后再导出。
+
+        dest 是调用方独占的路径（硬链接或复制），调用方删除它不会影响缓存。
+        """
+        if not self.enabled:
+            produced = producer()
+            if produced != dest:
+                shutil.move(produced, dest)
+            return dest
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = self._entry_path(key)
+        while True:
+            if self._export(entry, dest):
+                self._count('hits')
+                return dest
+
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self._inflight[key] = flight
+                else:
+                    self._stats['waits'] += 1
+
+            if not leader:
+                # 其它线程正在生成同一内容：等待其结果后重新查缓存；它失败时共享同一个错误
+                flight.done.wait()
+                if flight.error is not None:
+                    self._count('shared_failures')
+                    raise flight.error
+                continue
+
+            try:
+                if self._export(entry, dest):
+                    self._count('hits')
+                    return dest
+                self._count('misses')
+                produced = producer()
+                if os.path.getsize(produced) > self.max_bytes:
+                    # 单个结果超过整个缓存预算：不入缓存，直接交给调用方
+                    shutil.move(produced, dest)
+                    return dest
+                self._publish(produced, entry)
+                if not self._export(entry, dest):
+                    raise RuntimeError('缓存文件发布失败')
+                return dest
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight.done.set()
+
+    def _export(self, entry: str, dest: str) -> bool:
+        try:
+            os.utime(entry)  # 刷新 mtime 作为 LRU 访问时间
+            _link_or_copy(entry, dest)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError:
+            self._count('errors')
+            return False
+
+    def _publish(self, produced: str, entry: str):
+        tmp = os.path.join(self.cache_dir, f'.tmp-{uuid.uuid4().hex}{self.suffix}')
+        try:
+            shutil.move(produced, tmp)
+            os.replace(tmp, entry)  # 原子发布：读者要么看不到，要么看到完整文件
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict(keep=entry)
+
+    def _evict(self, keep: Optional[str] = None):
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    if e.name.startswith('.tmp-') or not e.name.endswith(self.suffix):
+                        continue
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, e.path, st.st_size))
+                    total += st.st_size
+        except FileNotFoundError:
+            return
+
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._count('evictions')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+        entries = 0
+        size = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    if e.name.endswith(self.suffix) and not e.name.startswith('.tmp-'):
+                        entries += 1
+                        try:
+                            size += e.stat().st_size
+                        except OSError:
+                            pass
+        except FileNotFoundError:
+            pass
+        data.update({'enabled': self.enabled, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes})
+        return data
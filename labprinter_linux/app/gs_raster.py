@@ -0,0 +1,178 @@
+"""Ghostscript 分块并行栅格化 - Linux版本
+
+gs-rasterize 单个 gs 进程逐页渲染，是最慢的打印路径。待处理的页数超过 PDF_RASTER_CHUNK_PAGES 时
+按页切成若干段，每段一个 gs 进程（-sPageList）并行栅格化。PDF_RASTER_WORKERS 是整个进程的名额：
+并发栅格化的多份文档共用这些名额，同时运行的 gs 进程不会超过该数目。
+最后由一次 gs pdfwrite 按页码顺序合并（逐页流式处理，内存占用与页数无关；图像原样传递或无损 Flate 编码、
+不降采样）。每段页数与耗时记入统计（GET /stats 的 raster），用于调整分段大小。
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    from labprinter_linux import config
+    from labprinter_linux.page_ranges import PageRanges
+except ImportError:
+    import config
+    from page_ranges import PageRanges
+
+_STATS_LOCK = threading.Lock()
+_STATS = {'runs': 0, 'parallel_runs': 0, 'chunks': 0, 'pages': 0, 'failures': 0, 'chunk_seconds': 0.0, 'merge_seconds': 0.0}
+_RECENT_CHUNKS = deque(maxlen=50)
+_SLOTS_LOCK = threading.Lock()
+_SLOTS: Optional[threading.BoundedSemaphore] = None
+
+
+def raster_workers() -> int:
+    """并行 gs 进程数上限；0 表示按 CPU 核数。"""
+    workers = int(getattr(config, 'PDF_RASTER_WORKERS', 1) or 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _slots() -> threading.BoundedSemaphore:
+    """进程级 gs 名额（PDF_RASTER_WORKERS 个）：每个栅格化/合并的 gs 进程运行期间占用一个。"""
+    global _SLOTS
+    with _SLOTS_LOCK:
+        if _SLOTS is None:
+            _SLOTS = threading.BoundedSemaphore(raster_workers())
+        return _SLOTS
+
+
+def plan_chunks(pages: PageRanges, workers: int, chunk_pages: int) -> List[PageRanges]:
+    """把页集合切成页数尽量相等的连续段，每段约 chunk_pages 页；不足两段时不拆分。"""
+    if workers <= 1 or chunk_pages <= 0 or len(pages) <= chunk_pages:
+        return [pages]
+    count = (len(pages) + chunk_pages - 1) // chunk_pages
+    base, extra = divmod(len(pages), count)
+    chunks, start = [], 0
+    for i in range(count):
+        size = base + (1 if i < extra else 0)
+        chunks.append(pages[start:start + size])
+        start += size
+    return chunks
+
+
+def _record(pages: int, seconds: float, ok: bool):
+    with _STATS_LOCK:
+        _STATS['chunks'] += 1
+        _STATS['pages'] += pages
+        _STATS['chunk_seconds'] += seconds
+        if not ok:
+            _STATS['failures'] += 1
+        _RECENT_CHUNKS.append({'pages': pages, 'seconds': round(seconds, 3), 'ok': ok})
+
+
+def _timed(run: Callable[[List[str], str], None], cmd: List[str], out_path: str, pages: int):
+    with _slots():
+        start = time.monotonic()
+        try:
+            run(cmd, out_path)
+        except BaseException:
+            _record(pages, time.monotonic() - start, False)
+            raise
+        _record(pages, time.monotonic() - start, True)
+
+
+def _merge(run: Callable[[List[str], str], None], gs: str, parts: List[str], out_path: str):
+    cmd = [
+        gs,
+        '-dSAFER',
+        '-dBATCH',
+        '-dNOPAUSE',
+        '-sDEVICE=pdfwrite',
+        '-dAutoRotatePages=/None',
+        # 各段已是栅格图像：合并时原样传递 JPEG，其余图像不降采样、不改用有损 JPEG 重新编码
+        '-dPassThroughJPEGImages=true',
+        '-dDownsampleColorImages=false',
+        '-dAutoFilterColorImages=false',
+        '-dColorImageFilter=/FlateEncode',
+        '-dDownsampleGrayImages=false',
+        '-dAutoFilterGrayImages=false',
+        '-dGrayImageFilter=/FlateEncode',
+        '-dDownsampleMonoImages=false',
+        f'-sOutputFile={out_path}',
+        *parts,
+    ]
+    with _slots():
+        start = time.monotonic()
+        run(cmd, out_path)
+        seconds = time.monotonic() - start
+    with _STATS_LOCK:
+        _STATS['merge_seconds'] += seconds
+
+
+def rasterize(
+    run: Callable[[List[str], str], None],
+    base_cmd: List[str],
+    pdf_path: str,
+    out_path: str,
+    pages: Optional[PageRanges] = None,
+    total_pages: Optional[int] = None,
+):
+    """栅格化 pdf_path 到 out_path；pages 为 None 表示全部页（total_pages 未知时不拆分）。
+
+    run(cmd, out_path) 执行一次 gs，失败时删除输出并抛出 RuntimeError。
+    """
+    workers = raster_workers()
+    target = pages if pages else (PageRanges.all(total_pages) if total_pages else None)
+    chunks = plan_chunks(target, workers, int(getattr(config, 'PDF_RASTER_CHUNK_PAGES', 20) or 0)) if target else []
+    with _STATS_LOCK:
+        _STATS['runs'] += 1
+        if len(chunks) > 1:
+            _STATS['parallel_runs'] += 1
+
+    if len(chunks) <= 1:
+        cmd = list(base_cmd)
+        if workers > 1:
+            # 不拆分时让单个 gs 用多线程渲染
+            cmd.append(f'-dNumRenderingThreads={workers}')
+        cmd.append(f'-sOutputFile={out_path}')
+        if pages:
+            cmd.append(f'-sPageList={pages}')
+        cmd.append(pdf_path)
+        _timed(run, cmd, out_path, len(target) if target else 0)
+        return
+
+    parts = [f'{os.path.splitext(out_path)[0]}.part{i}.pdf' for i in range(len(chunks))]
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks)), thread_name_prefix='GsRaster') as pool:
+            futures = [
+                pool.submit(_timed, run, base_cmd + [f'-sOutputFile={part}', f'-sPageList={chunk}', pdf_path], part, len(chunk))
+                for part, chunk in zip(parts, chunks)
+            ]
+            error = None
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    error = error or e
+                    # 一段失败后不再启动尚未开始的分段
+                    for other in futures:
+                        other.cancel()
+        if error is not None:
+            raise error
+        _merge(run, base_cmd[0], parts, out_path)
+    finally:
+        for part in parts:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+
+
+def get_raster_stats() -> Dict:
+    with _STATS_LOCK:
+        data = dict(_STATS)
+        data['chunk_seconds'] = round(data['chunk_seconds'], 3)
+        data['merge_seconds'] = round(data['merge_seconds'], 3)
+        data['seconds_per_page'] = round(_STATS['chunk_seconds'] / _STATS['pages'], 4) if _STATS['pages'] else None
+        data['recent_chunks'] = list(_RECENT_CHUNKS)
+    data['workers'] = raster_workers()
+    data['chunk_pages'] = int(getattr(config, 'PDF_RASTER_CHUNK_PAGES', 20) or 0)
+    return data
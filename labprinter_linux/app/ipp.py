@@ -0,0 +1,472 @@
+"""CUPS IPP 客户端 - Linux版本
+
+直接通过 IPP/1.1（HTTP POST application/ipp）与 cupsd 通信，替代 fork lpstat/lp 再解析随语言变化的文本输出。
+连接保持 keep-alive 并在线程间复用；属性按 IPP 值类型解码（enum/integer/keyword/name 等）；
+Print-Job 以 HTTP chunked 方式边读文件边发送，不把整个文档读入内存。
+"""
+import getpass
+import http.client
+import select
+import socket
+import struct
+import threading
+import urllib.parse
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+# 操作码
+PRINT_JOB = 0x0002
+CANCEL_JOB = 0x0008
+GET_JOBS = 0x000A
+GET_PRINTER_ATTRIBUTES = 0x000B
+CUPS_GET_DEFAULT = 0x4001
+CUPS_GET_PRINTERS = 0x4002
+
+# 属性组
+TAG_OPERATION = 0x01
+TAG_JOB = 0x02
+TAG_END = 0x03
+TAG_PRINTER = 0x04
+TAG_UNSUPPORTED_GROUP = 0x05
+
+# 值类型
+TAG_UNSUPPORTED = 0x10
+TAG_UNKNOWN = 0x12
+TAG_NO_VALUE = 0x13
+TAG_INTEGER = 0x21
+TAG_BOOLEAN = 0x22
+TAG_ENUM = 0x23
+TAG_OCTET_STRING = 0x30
+TAG_DATETIME = 0x31
+TAG_RESOLUTION = 0x32
+TAG_RANGE = 0x33
+TAG_BEGIN_COLLECTION = 0x34
+TAG_TEXT_LANG = 0x35
+TAG_NAME_LANG = 0x36
+TAG_END_COLLECTION = 0x37
+TAG_TEXT = 0x41
+TAG_NAME = 0x42
+TAG_KEYWORD = 0x44
+TAG_URI = 0x45
+TAG_CHARSET = 0x47
+TAG_LANGUAGE = 0x48
+TAG_MIME_TYPE = 0x49
+TAG_MEMBER_NAME = 0x4A
+
+# 状态码
+STATUS_OK = 0x0000
+STATUS_NOT_FOUND = 0x0406
+
+# printer-state 枚举值
+PRINTER_IDLE = 3
+PRINTER_PROCESSING = 4
+PRINTER_STOPPED = 5
+
+# printer-type 位：CUPS 默认打印机
+CUPS_PRINTER_DEFAULT = 0x00020000
+
+Attribute = Tuple[int, str, Any]  # (值类型, 名称, 值或值列表)
+
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class IppError(RuntimeError):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class IppMessage:
+    def __init__(self, version: Tuple[int, int], code: int, request_id: int,
+                 groups: List[Tuple[int, Dict[str, List[Any]]]], data: bytes = b''):
+        self.version = version
+        self.code = code  # 请求为操作码，响应为状态码
+        self.request_id = request_id
+        self.groups = groups
+        self.data = data
+
+    @property
+    def status_code(self) -> int:
+        return self.code
+
+    @property
+    def ok(self) -> bool:
+        return self.code < 0x0100
+
+    def group(self, tag: int) -> Dict[str, List[Any]]:
+        for group_tag, attrs in self.groups:
+            if group_tag == tag:
+                return attrs
+        return {}
+
+    def objects(self, tag: int) -> List[Dict[str, Any]]:
+        """同类属性组（如每台打印机一个 printer 组）转为字典列表；单值属性直接取值。"""
+        return [
+            {name: values[0] if len(values) == 1 else values for name, values in attrs.items()}
+            for group_tag, attrs in self.groups
+            if group_tag == tag
+        ]
+
+    @property
+    def status_message(self) -> str:
+        values = self.group(TAG_OPERATION).get('status-message') or ['']
+        return str(values[0])
+
+
+def _encode_value(value_tag: int, value: Any) -> bytes:
+    if value_tag in (TAG_INTEGER, TAG_ENUM):
+        return struct.pack('>i', int(value))
+    if value_tag == TAG_BOOLEAN:
+        return b'\x01' if value else b'\x00'
+    if value_tag == TAG_RANGE:
+        return struct.pack('>ii', int(value[0]), int(value[1]))
+    if value_tag in (TAG_NO_VALUE, TAG_UNKNOWN, TAG_UNSUPPORTED):
+        return b''
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
+
+def encode_message(code: int, request_id: int, groups: Sequence[Tuple[int, Sequence[Attribute]]],
+                   version: Tuple[int, int] = (1, 1)) -> bytes:
+    out = bytearray(struct.pack('>BBHI', version[0], version[1], code, request_id))
+    for group_tag, attributes in groups:
+        out.append(group_tag)
+        for value_tag, name, value in attributes:
+            multi = isinstance(value, list) or (isinstance(value, tuple) and value_tag != TAG_RANGE)
+            values = value if multi else [value]
+            for i, item in enumerate(values):
+                encoded_name = name.encode('utf-8') if i == 0 else b''
+                encoded = _encode_value(value_tag, item)
+                out += struct.pack('>BH', value_tag, len(encoded_name)) + encoded_name
+                out += struct.pack('>H', len(encoded)) + encoded
+    out.append(TAG_END)
+    return bytes(out)
+
+
+def _decode_value(value_tag: int, raw: bytes) -> Any:
+    if value_tag in (TAG_INTEGER, TAG_ENUM) and len(raw) == 4:
+        return struct.unpack('>i', raw)[0]
+    if value_tag == TAG_BOOLEAN and len(raw) == 1:
+        return raw != b'\x00'
+    if value_tag == TAG_RANGE and len(raw) == 8:
+        return struct.unpack('>ii', raw)
+    if value_tag == TAG_RESOLUTION and len(raw) == 9:
+        return struct.unpack('>iib', raw)
+    if value_tag in (TAG_TEXT_LANG, TAG_NAME_LANG) and len(raw) >= 4:
+        lang_len = struct.unpack('>H', raw[:2])[0]
+        text_len = struct.unpack('>H', raw[2 + lang_len:4 + lang_len])[0]
+        return raw[4 + lang_len:4 + lang_len + text_len].decode('utf-8', 'replace')
+    if value_tag in (TAG_NO_VALUE, TAG_UNKNOWN, TAG_UNSUPPORTED):
+        return None
+    if value_tag in (TAG_OCTET_STRING, TAG_DATETIME):
+        return raw
+    return raw.decode('utf-8', 'replace')
+
+
+def decode_message(data: bytes) -> IppMessage:
+    if len(data) < 9:
+        raise IppError('IPP 消息过短')
+    major, minor, code, request_id = struct.unpack('>BBHI', data[:8])
+    groups: List[Tuple[int, Dict[str, List[Any]]]] = []
+    current: Optional[Dict[str, List[Any]]] = None
+    last_name = ''
+    pos = 8
+    depth = 0  # 集合(collection)嵌套深度：集合成员只跳过，不展开
+    try:
+        while pos < len(data):
+            tag = data[pos]
+            pos += 1
+            if tag == TAG_END:
+                break
+            if tag < 0x10:
+                current = {}
+                groups.append((tag, current))
+                continue
+            name_len = struct.unpack('>H', data[pos:pos + 2])[0]
+            name = data[pos + 2:pos + 2 + name_len].decode('utf-8', 'replace')
+            pos += 2 + name_len
+            value_len = struct.unpack('>H', data[pos:pos + 2])[0]
+            raw = data[pos + 2:pos + 2 + value_len]
+            pos += 2 + value_len
+            if len(raw) != value_len:
+                raise IppError('IPP 消息被截断')
+
+            if tag == TAG_BEGIN_COLLECTION:
+                if depth == 0 and current is not None:
+                    last_name = name or last_name
+                    current.setdefault(last_name, []).append(None)
+                depth += 1
+                continue
+            if tag == TAG_END_COLLECTION:
+                depth = max(0, depth - 1)
+                continue
+            if depth or current is None:
+                continue
+            if name:
+                last_name = name
+            current.setdefault(last_name, []).append(_decode_value(tag, raw))
+    except struct.error:
+        raise IppError('IPP 消息格式错误')
+    return IppMessage((major, minor), code, request_id, groups, data[pos:])
+
+
+def _chain(header: bytes, chunks: Iterable[bytes]) -> Iterable[bytes]:
+    yield header
+    yield from chunks
+
+
+def _connection_dropped(conn: http.client.HTTPConnection) -> bool:
+    """空闲连接是否已被对端关闭：空闲时本不应有可读数据，可读即意味着 EOF（或协议错乱）。"""
+    sock = conn.sock
+    if sock is None:
+        return False  # 尚未建立，请求时会自动连接
+    try:
+        if sock.fileno() < 0:
+            return True
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self._socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._socket_path)
+        self.sock = sock
+
+
+class IppClient:
+    """cupsd 的 IPP 客户端；空闲连接保存在池中复用（HTTP/1.1 keep-alive）。"""
+
+    def __init__(self, server: str = 'localhost', port: int = 631, *, timeout: float = 10.0, max_idle: int = 4):
+        self.server = server
+        self.port = port
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._request_id = 0
+        self._stats = {'requests': 0, 'connections': 0, 'reused': 0, 'errors': 0}
+
+    @property
+    def host_header(self) -> str:
+        return 'localhost' if self.server.startswith('/') else self.server
+
+    def printer_uri(self, name: str = '') -> str:
+        base = f'ipp://{self.host_header}:{self.port}' if not self.server.startswith('/') else 'ipp://localhost'
+        return f'{base}{self.printer_path(name)}' if name else f'{base}/'
+
+    def job_uri(self, job_id: int) -> str:
+        return f'{self.printer_uri()}jobs/{job_id}'
+
+    @staticmethod
+    def printer_path(name: str) -> str:
+        # 队列名可能含空格、#、/ 等字符，需转义后才能放进 URI 路径
+        return f'/printers/{urllib.parse.quote(name, safe="")}'
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self._stats['connections'] += 1
+        if self.server.startswith('/'):
+            return _UnixHTTPConnection(self.server, self.timeout)
+        return http.client.HTTPConnection(self.server, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn = self._idle.pop()
+            if _connection_dropped(conn):
+                conn.close()  # cupsd 已关闭该空闲连接：丢弃，不拿它发请求
+                continue
+            with self._lock:
+                self._stats['reused'] += 1
+            return conn, True
+        return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _next_request_id(self) -> int:
+        with self._lock:
+            self._request_id = self._request_id % 0x7FFFFFFF + 1
+            self._stats['requests'] += 1
+            return self._request_id
+
+    def _operation_attributes(self, extra: Sequence[Attribute]) -> List[Attribute]:
+        try:
+            user = getpass.getuser()
+        except Exception:
+            user = 'labprinter'
+        return [
+            (TAG_CHARSET, 'attributes-charset', 'utf-8'),
+            (TAG_LANGUAGE, 'attributes-natural-language', 'en'),
+            *extra,
+            (TAG_NAME, 'requesting-user-name', user),
+        ]
+
+    def request(self, operation: int, attributes: Sequence[Attribute] = (), *, path: str = '/',
+                groups: Sequence[Tuple[int, Sequence[Attribute]]] = (), data: bytes = b'',
+                stream: Optional[Callable[[], Iterable[bytes]]] = None) -> IppMessage:
+        """发送一个 IPP 请求并返回响应；IPP 状态码表示失败时抛出 IppError。
+
+        stream 返回文档数据块的迭代器（重试时会再次调用），请求体以 chunked 编码边读边发。
+        复用的连接在发送阶段就失败时（请求未完整到达 cupsd）换新连接重试一次；请求已发出后的失败
+        一律不重试，以免同一请求被执行两次。Print-Job 任何情况下都不重试。
+        """
+        header = encode_message(
+            operation,
+            self._next_request_id(),
+            [(TAG_OPERATION, self._operation_attributes(attributes)), *groups],
+        )
+        headers = {'Content-Type': 'application/ipp', 'Host': self.host_header}
+
+        for attempt in range(2):
+            if stream is not None:
+                body = _chain(header, stream())  # 未指定 Content-Length：http.client 自动使用 chunked 编码
+            else:
+                body = header + data
+            conn, reused = self._acquire()
+            sent = False
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                sent = True
+                resp = conn.getresponse()
+                payload = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused and not sent and attempt == 0 and operation != PRINT_JOB:
+                    continue  # 池中的连接在发送时已失效：换新连接重试一次
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise IppError(f'无法连接 CUPS({self.server}): {e}')
+
+            if resp.status != 200:
+                conn.close()
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise IppError(f'CUPS 返回 HTTP {resp.status}')
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            message = decode_message(payload)
+            if not message.ok:
+                raise IppError(
+                    message.status_message or f'IPP 请求失败，状态码 0x{message.status_code:04x}',
+                    message.status_code,
+                )
+            return message
+        raise IppError(f'无法连接 CUPS({self.server})')
+
+    def get_printers(self, requested: Sequence[str]) -> List[Dict[str, Any]]:
+        try:
+            response = self.request(CUPS_GET_PRINTERS, [(TAG_KEYWORD, 'requested-attributes', list(requested))])
+        except IppError as e:
+            if e.status_code == STATUS_NOT_FOUND:
+                return []  # 尚未添加任何打印机
+            raise
+        return response.objects(TAG_PRINTER)
+
+    def get_default(self) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.request(CUPS_GET_DEFAULT, [(TAG_KEYWORD, 'requested-attributes', ['printer-name'])])
+        except IppError as e:
+            if e.status_code == STATUS_NOT_FOUND:
+                return None
+            raise
+        printers = response.objects(TAG_PRINTER)
+        return printers[0] if printers else None
+
+    def get_jobs(self, requested: Sequence[str], *, printer: str = '', which: str = 'not-completed') -> List[Dict[str, Any]]:
+        try:
+            response = self.request(GET_JOBS, [
+                (TAG_URI, 'printer-uri', self.printer_uri(printer)),
+                (TAG_KEYWORD, 'which-jobs', which),
+                (TAG_KEYWORD, 'requested-attributes', list(requested)),
+            ])
+        except IppError as e:
+            if e.status_code == STATUS_NOT_FOUND:
+                return []
+            raise
+        return response.objects(TAG_JOB)
+
+    def print_job(self, printer: str, path: str, *, job_name: str = '',
+                  job_attributes: Sequence[Attribute] = (), document_format: str = 'application/pdf') -> int:
+        """Print-Job：把文件流式提交到打印队列，返回 CUPS 分配的作业号。"""
+        def chunks():
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(_STREAM_CHUNK_SIZE), b''):
+                    yield chunk
+
+        response = self.request(
+            PRINT_JOB,
+            [
+                (TAG_URI, 'printer-uri', self.printer_uri(printer)),
+                (TAG_NAME, 'job-name', job_name or 'labprinter'),
+                (TAG_MIME_TYPE, 'document-format', document_format),
+            ],
+            path=self.printer_path(printer),
+            groups=[(TAG_JOB, list(job_attributes))] if job_attributes else (),
+            stream=chunks,
+        )
+        job_id = response.group(TAG_JOB).get('job-id') or [None]
+        if not isinstance(job_id[0], int):
+            raise IppError('CUPS 未返回作业号', response.status_code)
+        return job_id[0]
+
+    def cancel_job(self, job_id: int):
+        """Cancel-Job：取消指定作业号的作业。"""
+        self.request(CANCEL_JOB, [(TAG_URI, 'job-uri', self.job_uri(job_id))], path='/jobs/')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            data = dict(self._stats)
+            data['idle'] = len(self._idle)
+        return data
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_client_lock = threading.Lock()
+_client: Optional[IppClient] = None
+
+
+def get_ipp_client() -> IppClient:
+    """按 CUPS_SERVER / CUPS_PORT 创建全局 IPP 客户端（连接池在所有线程间共享）。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = IppClient(
+                getattr(config, 'CUPS_SERVER', '') or 'localhost',
+                int(getattr(config, 'CUPS_PORT', 631) or 631),
+                timeout=float(getattr(config, 'IPP_TIMEOUT', 10) or 10),
+            )
+        return _client
+
+
+def get_ipp_stats() -> Optional[Dict[str, int]]:
+    with _client_lock:
+        client = _client
+    return client.stats() if client is not None else None
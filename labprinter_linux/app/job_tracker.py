@@ -0,0 +1,225 @@
+"""CUPS 作业跟踪 - Linux版本
+
+打印任务提交到 CUPS 后并不代表已经打印出来：跟踪线程把任务 ID 与 CUPS 作业号对应起来，
+每个周期用一次批量查询刷新所有未结束作业，直到作业完成、被取消或被打印机中止。
+查不到最终状态的作业（lpstat 后端只知道它离开了队列）与跟踪超时的任务不会被当作打印成功。
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+from .task_queue import TaskQueue, TaskState
+
+
+_FINAL = ('completed', 'cancelled', 'aborted', 'left-queue')
+
+
+class _TrackedJob:
+    __slots__ = ('job_id', 'job_number', 'printer', 'page_range', 'copies', 'state', 'reasons')
+
+    def __init__(self, job_id: str, job_number: int, printer: Optional[str], page_range: str = '', copies: int = 0):
+        self.job_id = job_id
+        self.job_number = job_number
+        self.printer = printer
+        self.page_range = page_range
+        self.copies = copies
+        self.state = 'queued'
+        self.reasons = ''
+
+    def describe(self) -> Dict:
+        return {
+            'printer': self.printer,
+            'job_id': self.job_id,
+            'page_range': self.page_range,
+            'copies': self.copies,
+            'status': self.state,
+        }
+
+
+class _TrackedTask:
+    """一个任务对应的全部 CUPS 作业（分片打印时每台打印机一个作业）。"""
+    __slots__ = ('task_id', 'jobs', 'on_finish', 'started_at')
+
+    def __init__(self, task_id: str, jobs: List[_TrackedJob], on_finish: Optional[Callable]):
+        self.task_id = task_id
+        self.jobs = jobs
+        self.on_finish = on_finish
+        self.started_at = time.monotonic()
+
+    def result(self, status: str) -> Dict:
+        if len(self.jobs) == 1:
+            job = self.jobs[0]
+            return {'job_id': job.job_id, 'status': status, 'printer': job.printer}
+        return {
+            'job_id': ','.join(job.job_id for job in self.jobs),
+            'status': status,
+            'printer': ','.join(dict.fromkeys(job.printer or '' for job in self.jobs)),
+            'shards': [job.describe() for job in self.jobs],
+        }
+
+
+class JobTracker(threading.Thread):
+    def __init__(self, queue: TaskQueue, interval: float, timeout: float):
+        super().__init__(name='JobTracker', daemon=True)
+        self.queue = queue
+        self.interval = max(0.5, float(interval))
+        self.timeout = float(timeout)
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._stats = {'polls': 0, 'poll_errors': 0, 'completed': 0, 'cancelled': 0, 'aborted': 0, 'left-queue': 0, 'expired': 0}
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def track(self, task_id: str, job_id: str, job_number: int, *,
+              printer: Optional[str] = None, on_finish: Optional[Callable[[str], None]] = None):
+        """开始跟踪作业；作业结束（或停止跟踪）时以 task_id 调用 on_finish。"""
+        self.track_shards(task_id, [{'job_id': job_id, 'job_number': job_number, 'printer': printer}], on_finish=on_finish)
+
+    def track_shards(self, task_id: str, shards: List[Dict], *, on_finish: Optional[Callable[[str], None]] = None):
+        """以一个任务跟踪多个 CUPS 作业（job_id/job_number/printer/page_range/copies）；全部结束后任务才结束。"""
+        jobs = [
+            _TrackedJob(s['job_id'], s['job_number'], s.get('printer'), s.get('page_range') or '', s.get('copies') or 0)
+            for s in shards
+        ]
+        with self._lock:
+            self._tasks[task_id] = _TrackedTask(task_id, jobs, on_finish)
+        self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if not self.pending():
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            self._stop_event.wait(self.interval)
+            try:
+                self.poll_once()
+            except Exception:
+                pass
+
+    def poll_once(self):
+        from .printer import query_job_states
+
+        with self._lock:
+            tasks = list(self._tasks.values())
+        numbers = sorted({job.job_number for task in tasks for job in task.jobs if job.state not in _FINAL})
+        if not numbers:
+            return
+        with self._lock:
+            self._stats['polls'] += 1
+        try:
+            states = query_job_states(numbers)
+        except Exception:
+            # CUPS 暂时不可用：保持当前状态，下个周期再查
+            with self._lock:
+                self._stats['poll_errors'] += 1
+            return
+
+        now = time.monotonic()
+        for task in tasks:
+            changed = False
+            for job in task.jobs:
+                if job.state in _FINAL:
+                    continue
+                # 查询结果里没有该作业：只知道它离开了队列，不知道是完成、取消还是中止
+                state, reasons = states.get(job.job_number, ('left-queue', ''))
+                if state != job.state:
+                    job.state, job.reasons = state, reasons
+                    changed = True
+            self._settle(task, now, changed)
+
+    def _settle(self, task: _TrackedTask, now: float, changed: bool):
+        finals = [job.state for job in task.jobs]
+        if all(state in _FINAL for state in finals):
+            aborted = [job for job in task.jobs if job.state == 'aborted']
+            if aborted:
+                if len(task.jobs) == 1:
+                    detail = aborted[0].reasons
+                else:
+                    detail = '; '.join(f'{job.printer} {job.reasons}'.strip() for job in aborted)
+                message = '打印机中止了任务' + (f': {detail}' if detail else '')
+                self._finish(task, TaskState.ABORTED, message, 'aborted')
+            elif 'cancelled' in finals:
+                self._finish(task, TaskState.CANCELLED, '打印任务已取消', 'cancelled')
+            elif 'left-queue' in finals:
+                self._finish(task, TaskState.UNCONFIRMED, '作业已离开打印队列（无法确认是否打印成功，请到打印机确认）', 'left-queue')
+            else:
+                self._finish(task, TaskState.SUCCESS, '打印完成', 'completed')
+        elif self.timeout > 0 and now - task.started_at > self.timeout:
+            self._finish(task, TaskState.UNCONFIRMED, '长时间未完成，已停止跟踪（请到打印机确认）', 'expired')
+        elif changed:
+            self._report_active(task)
+
+    def _report_active(self, task: _TrackedTask):
+        done = sum(1 for job in task.jobs if job.state in _FINAL)
+        if any(job.state == 'printing' for job in task.jobs):
+            message = '正在打印...'
+            if len(task.jobs) > 1:
+                message = f'正在打印（{done}/{len(task.jobs)} 台打印机已完成）...'
+            self.queue.update_task(task.task_id, state=TaskState.PRINTING, message=message,
+                                   progress=95 if len(task.jobs) == 1 else 90 + 9 * done // len(task.jobs),
+                                   result=task.result('printing'))
+        else:
+            self.queue.update_task(task.task_id, state=TaskState.QUEUED, message='已提交，正在打印机队列中等待...',
+                                   progress=90, result=task.result('queued'))
+
+    def _finish(self, task: _TrackedTask, state: TaskState, message: str, outcome: str):
+        with self._lock:
+            self._tasks.pop(task.task_id, None)
+            self._stats[outcome] += 1
+        self.queue.update_task(
+            task.task_id,
+            state=state,
+            message=message,
+            progress=100 if state == TaskState.SUCCESS else 90,
+            result=task.result(outcome),
+        )
+        if task.on_finish is not None:
+            try:
+                task.on_finish(task.task_id)
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            data = dict(self._stats)
+            data['tracking'] = len(self._tasks)
+        return data
+
+
+_tracker_lock = threading.Lock()
+_tracker: Optional[JobTracker] = None
+
+
+def get_job_tracker(queue: Optional[TaskQueue] = None) -> Optional[JobTracker]:
+    """按 JOB_TRACK_INTERVAL 懒启动全局跟踪线程；0 表示关闭（提交即视为完成，与旧版一致）。"""
+    global _tracker
+    interval = float(getattr(config, 'JOB_TRACK_INTERVAL', 0) or 0)
+    if interval <= 0:
+        return None
+    with _tracker_lock:
+        if _tracker is None:
+            if queue is None:
+                from .task_queue import task_queue as queue
+            _tracker = JobTracker(queue, interval, float(getattr(config, 'JOB_TRACK_TIMEOUT', 0) or 0))
+            _tracker.start()
+        return _tracker
+
+
+def get_job_tracker_stats() -> Optional[Dict[str, int]]:
+    with _tracker_lock:
+        tracker = _tracker
+    return tracker.stats() if tracker is not None else None
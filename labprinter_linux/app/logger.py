@@ -15,7 +15,8 @@ file_handler = RotatingFileHandler(
     log_file,
     maxBytes=10 * 1024 * 1024,
     backupCount=30,
-    encoding='utf-8'
+    encoding='utf-8',
+    delay=True,  # 首次写日志时才创建文件
 )
 file_handler.setFormatter(logging.Formatter(
     '%(asctime)s | %(message)s',
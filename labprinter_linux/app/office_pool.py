@@ -0,0 +1,373 @@
+"""LibreOffice 常驻进程池 - Linux版本
+
+每个实例是一个使用独立 profile 的 `soffice --headless` 常驻进程，并在本机 UNO socket 上监听；
+Word 转换请求通过 UNO（python3-uno）分派给空闲实例执行，避免每个文档都冷启动一次 LibreOffice。
+"""
+import atexit
+import json
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+from .supervisor import apply_limits
+
+
+def _pick_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class OfficeInstance:
+    def __init__(self, index: int, port: int, profile_dir: str):
+        self.index = index
+        self.port = port
+        self.profile_dir = profile_dir
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+        self.conversions = 0
+        self.restarts = 0
+
+    @property
+    def accept_string(self) -> str:
+        return f'socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def is_healthy(self, timeout: float = 1.0) -> bool:
+        if not self.is_alive():
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', self.port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def kill(self):
+        proc = self.process
+        self.process = None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        # 实例在独立进程组中启动：一并清理 soffice.bin 等子进程
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _launch_soffice(instance: OfficeInstance) -> subprocess.Popen:
+    from .converter import _find_soffice, _headless_env
+
+    soffice = _find_soffice()
+    if not soffice:
+        raise RuntimeError('未找到 LibreOffice (soffice)，请安装 libreoffice-writer 或设置 SOFFICE_PATH')
+    cmd = [
+        soffice,
+        '--headless',
+        '--invisible',
+        '--nologo',
+        '--nodefault',
+        '--nofirststartwizard',
+        '--norestore',
+        '--nolockcheck',
+        f'-env:UserInstallation={Path(instance.profile_dir).as_uri()}',
+        f'--accept={instance.accept_string}',
+    ]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=_headless_env(),
+        start_new_session=True,
+    )
+    # 常驻实例的 CPU 时间会持续累积，只限制内存
+    apply_limits(proc.pid, 'soffice', cpu=False)
+    return proc
+
+
+def _dispatch_uno(instance: OfficeInstance, input_path: str, output_path: str, page_range: str = ''):
+    import uno  # type: ignore
+    from com.sun.star.beans import PropertyValue  # type: ignore
+
+    def prop(name, value):
+        p = PropertyValue()
+        p.Name = name
+        p.Value = value
+        return p
+
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+    ctx = resolver.resolve(f'uno:{instance.accept_string}')
+    desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+    doc = desktop.loadComponentFromURL(uno.systemPathToFileUrl(input_path), '_blank', 0, (prop('Hidden', True),))
+    if doc is None:
+        raise RuntimeError('LibreOffice 无法打开文档')
+    store_args = [prop('FilterName', 'writer_pdf_Export')]
+    if page_range:
+        store_args.append(prop('FilterData', uno.Any(
+            '[]com.sun.star.beans.PropertyValue', (prop('PageRange', page_range),)
+        )))
+    try:
+        uno.invoke(doc, 'storeToURL', (uno.systemPathToFileUrl(output_path), tuple(store_args)))
+    finally:
+        doc.close(True)
+
+
+def uno_available() -> bool:
+    """进程池通过 UNO 把转换交给常驻实例，需要 python3-uno。"""
+    try:
+        import uno  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _dispatch_soffice(instance: OfficeInstance, input_path: str, out_dir: str, timeout: float, target: str = 'pdf') -> str:
+    """通过 UNO 把转换请求交给常驻实例执行并返回输出 PDF 路径（超时由 OfficePool.convert 控制）。"""
+    output_path = os.path.join(out_dir, f'{Path(input_path).stem}.pdf')
+    page_range = ''
+    if target != 'pdf':
+        page_range = json.loads(target.split(':', 2)[2])['PageRange']['value']
+    _dispatch_uno(instance, input_path, output_path, page_range)
+    if not os.path.exists(output_path):
+        raise RuntimeError('转换后的PDF文件未找到')
+    return output_path
+
+
+class OfficePool:
+    def __init__(
+        self,
+        size: int,
+        *,
+        root_dir: Optional[str] = None,
+        base_port: int = 0,
+        launcher: Optional[Callable[[OfficeInstance], subprocess.Popen]] = None,
+        dispatcher: Optional[Callable[[OfficeInstance, str, str, float, str], str]] = None,
+        profile_seeder: Optional[Callable[[str], None]] = None,
+        startup_timeout: float = 60.0,
+        health_interval: float = 15.0,
+    ):
+        if size < 1:
+            raise ValueError('进程池大小必须大于等于1')
+        self.size = size
+        self.root_dir = root_dir or os.path.join(tempfile.gettempdir(), 'labprinter', 'lo_pool')
+        self.base_port = base_port
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+        self._launcher = launcher or _launch_soffice
+        self._dispatcher = dispatcher or _dispatch_soffice
+        self._profile_seeder = profile_seeder
+        self._instances: List[OfficeInstance] = []
+        self._idle: "queue.Queue[OfficeInstance]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {'conversions': 0, 'failures': 0, 'timeouts': 0, 'restarts': 0, 'health_checks': 0}
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        os.makedirs(self.root_dir, exist_ok=True)
+        for i in range(self.size):
+            port = self.base_port + i if self.base_port else _pick_free_port()
+            inst = OfficeInstance(i, port, os.path.join(self.root_dir, f'instance-{i}'))
+            self._instances.append(inst)
+            try:
+                self._spawn(inst)
+            except Exception:
+                # 启动失败的实例在首次使用或健康检查时重启
+                inst.kill()
+            self._idle.put(inst)
+        self._started = True
+        if self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, name='OfficePoolHealth', daemon=True)
+            self._health_thread.start()
+
+    def _spawn(self, inst: OfficeInstance):
+        inst.kill()
+        if self._profile_seeder is not None:
+            self._profile_seeder(inst.profile_dir)
+        else:
+            shutil.rmtree(inst.profile_dir, ignore_errors=True)
+            os.makedirs(inst.profile_dir, exist_ok=True)
+        inst.process = self._launcher(inst)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if not inst.is_alive():
+                raise RuntimeError(f'LibreOffice 实例 {inst.index} 启动后立即退出')
+            if inst.is_healthy(timeout=0.5):
+                return
+            time.sleep(0.05)
+        inst.kill()
+        raise RuntimeError(f'LibreOffice 实例 {inst.index} 启动超时')
+
+    def _restart(self, inst: OfficeInstance):
+        inst.restarts += 1
+        with self._stats_lock:
+            self._stats['restarts'] += 1
+        self._spawn(inst)
+
+    def convert(self, input_path: str, out_dir: str, timeout: float, target: str = 'pdf') -> str:
+        """转换一个文档；等待空闲实例、重启实例与分派共用同一个 timeout 预算。"""
+        deadline = time.monotonic() + timeout
+        try:
+            inst = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError('LibreOffice 进程池繁忙，等待超时')
+        try:
+            with inst.lock:
+                if not inst.is_healthy():
+                    self._restart(inst)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._stats_lock:
+                        self._stats['timeouts'] += 1
+                    raise RuntimeError(f'LibreOffice 转换超时（{timeout} 秒）')
+                try:
+                    output = self._dispatch(inst, input_path, out_dir, remaining, target)
+                except Exception:
+                    with self._stats_lock:
+                        self._stats['failures'] += 1
+                    if not inst.is_healthy():
+                        try:
+                            self._restart(inst)
+                        except Exception:
+                            inst.kill()
+                    raise
+                inst.conversions += 1
+                with self._stats_lock:
+                    self._stats['conversions'] += 1
+                return output
+        finally:
+            self._idle.put(inst)
+
+    def _dispatch(self, inst: OfficeInstance, input_path: str, out_dir: str, timeout: float, target: str) -> str:
+        """在独立线程中分派转换并等待至多 timeout 秒（调用方剩余的预算）；UNO 调用本身没有超时，超时后杀掉实例以中断它。"""
+        outcome = {}
+
+        def run():
+            try:
+                outcome['output'] = self._dispatcher(inst, input_path, out_dir, timeout, target)
+            except BaseException as e:
+                outcome['error'] = e
+
+        worker = threading.Thread(target=run, name=f'OfficeDispatch-{inst.index}', daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            with self._stats_lock:
+                self._stats['timeouts'] += 1
+            inst.kill()  # 调用方随后按不健康实例重启
+            worker.join(5)
+            raise RuntimeError(f'LibreOffice 转换超时（{timeout:.0f} 秒）')
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['output']
+
+    def health_check(self) -> int:
+        """检查空闲实例，重启已退出/不响应的实例；返回本次重启数。"""
+        restarted = 0
+        for inst in list(self._instances):
+            if not inst.lock.acquire(blocking=False):
+                continue  # 正在转换，跳过
+            try:
+                with self._stats_lock:
+                    self._stats['health_checks'] += 1
+                if inst.is_healthy():
+                    continue
+                try:
+                    self._restart(inst)
+                    restarted += 1
+                except Exception:
+                    inst.kill()
+            finally:
+                inst.lock.release()
+        return restarted
+
+    def _health_loop(self):
+        while not self._stop_event.wait(self.health_interval):
+            try:
+                self.health_check()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            data = dict(self._stats)
+        data['size'] = self.size
+        data['idle'] = self._idle.qsize()
+        data['instances'] = [
+            {
+                'index': inst.index,
+                'port': inst.port,
+                'alive': inst.is_alive(),
+                'conversions': inst.conversions,
+                'restarts': inst.restarts,
+            }
+            for inst in self._instances
+        ]
+        return data
+
+    def shutdown(self):
+        self._stop_event.set()
+        for inst in self._instances:
+            inst.kill()
+            shutil.rmtree(inst.profile_dir, ignore_errors=True)
+        self._started = False
+
+
+_pool_lock = threading.Lock()
+_pool: Optional[OfficePool] = None
+
+
+def get_office_pool() -> Optional[OfficePool]:
+    """按 CONVERT_POOL_SIZE 懒启动全局进程池；未启用时返回 None。"""
+    global _pool
+    size = int(getattr(config, 'CONVERT_POOL_SIZE', 0) or 0)
+    if size < 1 or not uno_available():
+        # 没有 python3-uno 时无法把转换交给常驻实例，退回每次冷启动 soffice
+        return None
+    with _pool_lock:
+        if _pool is None:
+            from .converter import seed_profile
+
+            pool = OfficePool(
+                size,
+                base_port=int(getattr(config, 'CONVERT_POOL_BASE_PORT', 0) or 0),
+                health_interval=float(getattr(config, 'CONVERT_POOL_HEALTH_INTERVAL', 15) or 0),
+                profile_seeder=seed_profile,
+            )
+            pool.start()
+            atexit.register(pool.shutdown)
+            _pool = pool
+        return _pool
+
+
+def get_office_pool_stats() -> Optional[Dict]:
+    """进程池统计；池尚未启动时返回 None（不会因查询统计而启动 soffice）。"""
+    with _pool_lock:
+        pool = _pool
+    return pool.stats() if pool is not None else None
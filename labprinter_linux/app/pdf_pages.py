@@ -0,0 +1,402 @@
+"""PDF 页数快速统计 - Linux版本
+
+只为取页数而用 pypdf 解析整个文件代价很高（大扫描件需要数秒、数百 MB 内存）。这里把文件
+mmap 进来，从 startxref 沿交叉引用链（传统 xref 表、xref 流、对象流、增量更新的 /Prev）
+只定位 /Root → /Pages 两个对象，读取 /Count；只有结构损坏的文件才退回 pypdf。
+结果按文件内容 SHA-256 缓存，同一文件（路径/大小/mtime 不变）重复查询时连哈希也省掉。
+"""
+import hashlib
+import mmap
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+_CACHE_MAX_ENTRIES = 1024
+_TAIL_BYTES = 4096
+_OBJECT_WINDOW = 1 << 20  # 单个字典对象的最大查找范围
+_MAX_SECTIONS = 256  # 防止 /Prev 成环
+
+_WS = b' \t\r\n\f\x00'
+_RE_STARTXREF = re.compile(rb'startxref\s+(\d+)')
+_RE_OBJ_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+_RE_SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)[ \t]*\r?\n?')
+_RE_ROOT = re.compile(rb'/Root\s+(\d+)\s+\d+\s+R')
+_RE_PREV = re.compile(rb'/Prev\s+(\d+)')
+_RE_XREFSTM = re.compile(rb'/XRefStm\s+(\d+)')
+_RE_PAGES = re.compile(rb'/Pages\s+(\d+)\s+\d+\s+R')
+_RE_COUNT = re.compile(rb'/Count\s+(\d+)(?:\s+(\d+)\s+R)?')
+_RE_W = re.compile(rb'/W\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]')
+_RE_INDEX = re.compile(rb'/Index\s*\[([\d\s]*)\]')
+_RE_SIZE = re.compile(rb'/Size\s+(\d+)')
+_RE_FILTER = re.compile(rb'/Filter\s*\[?\s*/(\w+)')
+_RE_PREDICTOR = re.compile(rb'/Predictor\s+(\d+)')
+_RE_COLUMNS = re.compile(rb'/Columns\s+(\d+)')
+_RE_N = re.compile(rb'/N\s+(\d+)')
+_RE_FIRST = re.compile(rb'/First\s+(\d+)')
+_RE_INT = re.compile(rb'\s*(\d+)')
+
+_cache_lock = threading.Lock()
+_by_digest: 'OrderedDict[str, int]' = OrderedDict()
+_by_stat: 'OrderedDict[tuple, str]' = OrderedDict()
+_stats = {'hits': 0, 'fast': 0, 'fallback': 0}
+
+
+class _Unsupported(Exception):
+    """结构超出快速解析的范围（或文件损坏），改用 pypdf。"""
+
+
+def _skip_ws(buf, pos: int) -> int:
+    while pos < len(buf) and buf[pos] in _WS:
+        pos += 1
+    return pos
+
+
+def _unpredict(data: bytes, columns: int) -> bytes:
+    """还原 PNG 预测（xref 流每个字节一个分量）。"""
+    row_len = columns + 1
+    if len(data) % row_len:
+        raise _Unsupported('PNG 预测数据长度不符')
+    out = bytearray()
+    prev = bytearray(columns)
+    low = int.from_bytes(b'\x7f' * columns, 'big')
+    high = int.from_bytes(b'\x80' * columns, 'big')
+    for start in range(0, len(data), row_len):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_len])
+        if kind == 2:
+            # Up（xref 流最常见）：按字节无进位相加，整行一次完成
+            a, b = int.from_bytes(row, 'big'), int.from_bytes(prev, 'big')
+            row = bytearray((((a & low) + (b & low)) ^ ((a ^ b) & high)).to_bytes(columns, 'big'))
+        elif kind == 1:
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xff
+        elif kind == 3:
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xff
+        elif kind == 4:
+            for i in range(columns):
+                a = row[i - 1] if i else 0
+                b = prev[i]
+                c = prev[i - 1] if i else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                row[i] = (row[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 0xff
+        elif kind != 0:
+            raise _Unsupported(f'未知 PNG 预测类型 {kind}')
+        out += row
+        prev = row
+    return bytes(out)
+
+
+def _read_stream(buf, offset: int) -> Tuple[bytes, bytes]:
+    """读取 offset 处的流对象，返回 (字典字节, 解码后的数据)。"""
+    m = _RE_OBJ_HEADER.match(buf, offset)
+    if not m:
+        raise _Unsupported('对象头无效')
+    start = buf.find(b'stream', m.end(), m.end() + _OBJECT_WINDOW)
+    if start < 0:
+        raise _Unsupported('不是流对象')
+    head = bytes(buf[m.end():start])
+    data_start = start + 6
+    if buf[data_start:data_start + 2] == b'\r\n':
+        data_start += 2
+    elif buf[data_start:data_start + 1] in (b'\n', b'\r'):
+        data_start += 1
+    end = buf.find(b'endstream', data_start)
+    if end < 0:
+        raise _Unsupported('流未结束')
+    raw = bytes(buf[data_start:end])
+
+    f = _RE_FILTER.search(head)
+    if f is None:
+        data = raw
+    elif f.group(1) == b'FlateDecode':
+        try:
+            data = zlib.decompressobj().decompress(raw)
+        except zlib.error as e:
+            raise _Unsupported(f'流解压失败: {e}')
+    else:
+        raise _Unsupported(f'不支持的过滤器 {f.group(1)!r}')
+    predictor = _RE_PREDICTOR.search(head)
+    if predictor and int(predictor.group(1)) >= 10:
+        columns = _RE_COLUMNS.search(head)
+        data = _unpredict(data, int(columns.group(1)) if columns else 1)
+    return head, data
+
+
+class _Section:
+    """交叉引用链中的一节：传统 xref 表（可带混合式 /XRefStm）或 xref 流。"""
+
+    def __init__(self, buf, offset: int):
+        self.buf = buf
+        self.subsections: List[Tuple[int, int, int]] = []  # (起始对象号, 数量, 条目起始位置)
+        self.stream_entries: Optional[Tuple[bytes, List[int], List[Tuple[int, int]]]] = None
+        self.hybrid: Optional['_Section'] = None
+        pos = _skip_ws(buf, offset)
+        if buf[pos:pos + 4] == b'xref':
+            self.trailer = self._parse_table(pos + 4)
+            stm = _RE_XREFSTM.search(self.trailer)
+            if stm:
+                self.hybrid = _Section(buf, int(stm.group(1)))
+        else:
+            self.trailer = self._parse_stream(pos)
+        prev = _RE_PREV.search(self.trailer)
+        self.prev = int(prev.group(1)) if prev else None
+        root = _RE_ROOT.search(self.trailer)
+        self.root = int(root.group(1)) if root else None
+
+    def _parse_table(self, pos: int) -> bytes:
+        buf = self.buf
+        while True:
+            pos = _skip_ws(buf, pos)
+            if buf[pos:pos + 7] == b'trailer':
+                end = buf.find(b'startxref', pos, pos + _OBJECT_WINDOW)
+                return bytes(buf[pos + 7:end if end > 0 else pos + _TAIL_BYTES])
+            m = _RE_SUBSECTION.match(buf, pos)
+            if not m:
+                raise _Unsupported('xref 子节头无效')
+            start, count = int(m.group(1)), int(m.group(2))
+            self.subsections.append((start, count, m.end()))
+            pos = m.end() + count * 20
+
+    def _parse_stream(self, pos: int) -> bytes:
+        head, data = _read_stream(self.buf, pos)
+        if b'/XRef' not in head:
+            raise _Unsupported('startxref 未指向 xref 表或 xref 流')
+        w = _RE_W.search(head)
+        if not w:
+            raise _Unsupported('xref 流缺少 /W')
+        widths = [int(x) for x in w.groups()]
+        index = _RE_INDEX.search(head)
+        if index:
+            numbers = [int(x) for x in index.group(1).split()]
+        else:
+            size = _RE_SIZE.search(head)
+            numbers = [0, int(size.group(1)) if size else 0]
+        entry_len = sum(widths)
+        if len(data) < entry_len * sum(numbers[1::2]):
+            raise _Unsupported('xref 流数据不足')
+        # 条目按需解码：只有 /Root、/Pages 等少数对象会被查到
+        self.stream_entries = (data, widths, list(zip(numbers[0::2], numbers[1::2])))
+        return head
+
+    def _stream_entry(self, num: int) -> Optional[Tuple[int, int, int]]:
+        data, widths, ranges = self.stream_entries
+        entry_len = sum(widths)
+        position = 0
+        for start, count in ranges:
+            if start <= num < start + count:
+                offset = (position + num - start) * entry_len
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(data[offset:offset + width], 'big') if width else None)
+                    offset += width
+                return (1 if fields[0] is None else fields[0], fields[1] or 0, fields[2] or 0)
+            position += count
+        return None
+
+    def lookup(self, num: int):
+        """返回 ('offset', 位置) / ('objstm', 流对象号, 序号) / ('free',)；本节没有该对象时返回 None。"""
+        if self.stream_entries is not None:
+            entry = self._stream_entry(num)
+            if entry is None:
+                return None
+            kind, a, b = entry
+            if kind == 1:
+                return ('offset', a)
+            if kind == 2:
+                return ('objstm', a, b)
+            return ('free',)
+        for start, count, pos in self.subsections:
+            if start <= num < start + count:
+                entry = bytes(self.buf[pos + (num - start) * 20:pos + (num - start) * 20 + 18])
+                parts = entry.split()
+                if len(parts) != 3 or parts[2] not in (b'n', b'f'):
+                    raise _Unsupported('xref 条目无效')
+                if parts[2] == b'n':
+                    return ('offset', int(parts[0]))
+                break
+        if self.hybrid is not None:
+            return self.hybrid.lookup(num)
+        return None
+
+
+class _Document:
+    def __init__(self, buf):
+        self.buf = buf
+        tail_start = max(0, len(buf) - _TAIL_BYTES)
+        idx = buf.rfind(b'startxref', tail_start)
+        m = _RE_STARTXREF.match(buf, idx) if idx >= 0 else None
+        if not m:
+            raise _Unsupported('找不到 startxref')
+        self.sections: List[_Section] = []
+        offset: Optional[int] = int(m.group(1))
+        seen = set()
+        while offset is not None and offset not in seen and len(self.sections) < _MAX_SECTIONS:
+            if offset >= len(buf):
+                raise _Unsupported('xref 偏移越界')
+            seen.add(offset)
+            section = _Section(buf, offset)
+            self.sections.append(section)
+            offset = section.prev
+        self.root = next((s.root for s in self.sections if s.root is not None), None)
+        if self.root is None:
+            raise _Unsupported('trailer 缺少 /Root')
+        self._objstm: Dict[int, Tuple[bytes, List[int]]] = {}
+
+    def _locate(self, num: int):
+        for section in self.sections:  # 最新的一节优先（增量更新覆盖旧对象）
+            found = section.lookup(num)
+            if found is not None:
+                return found
+        raise _Unsupported(f'xref 中没有对象 {num}')
+
+    def object_body(self, num: int) -> bytes:
+        found = self._locate(num)
+        if found[0] == 'offset':
+            m = _RE_OBJ_HEADER.match(self.buf, found[1])
+            if not m or int(m.group(1)) != num:
+                raise _Unsupported(f'对象 {num} 的偏移无效')
+            end = self.buf.find(b'endobj', m.end(), m.end() + _OBJECT_WINDOW)
+            if end < 0:
+                raise _Unsupported(f'对象 {num} 未结束')
+            return bytes(self.buf[m.end():end])
+        if found[0] == 'objstm':
+            return self._from_object_stream(found[1], num)
+        raise _Unsupported(f'对象 {num} 已被删除')
+
+    def _from_object_stream(self, stream_num: int, num: int) -> bytes:
+        if stream_num not in self._objstm:
+            found = self._locate(stream_num)
+            if found[0] != 'offset':
+                raise _Unsupported('对象流位置无效')
+            head, data = _read_stream(self.buf, found[1])
+            n, first = _RE_N.search(head), _RE_FIRST.search(head)
+            if not n or not first:
+                raise _Unsupported('对象流缺少 /N 或 /First')
+            header = [int(x) for x in data[:int(first.group(1))].split()]
+            if len(header) < 2 * int(n.group(1)):
+                raise _Unsupported('对象流头部不完整')
+            self._objstm[stream_num] = (data[int(first.group(1)):], header)
+        data, header = self._objstm[stream_num]
+        for i in range(0, len(header), 2):
+            if header[i] == num:
+                end = header[i + 3] if i + 3 < len(header) else len(data)
+                return data[header[i + 1]:end]
+        raise _Unsupported(f'对象流中没有对象 {num}')
+
+    def page_count(self) -> int:
+        pages = _RE_PAGES.search(self.object_body(self.root))
+        if not pages:
+            raise _Unsupported('/Root 缺少 /Pages')
+        body = self.object_body(int(pages.group(1)))
+        count = _RE_COUNT.search(body)
+        if not count:
+            raise _Unsupported('/Pages 缺少 /Count')
+        if count.group(2) is not None:
+            value = _RE_INT.match(self.object_body(int(count.group(1))))
+            if not value:
+                raise _Unsupported('/Count 引用无效')
+            return int(value.group(1))
+        return int(count.group(1))
+
+
+def _count_with_pypdf(path: str) -> int:
+    try:
+        from pypdf import PdfReader  # type: ignore
+    except Exception as e:
+        raise RuntimeError('缺少依赖 pypdf，请在 Linux 端安装 requirements.txt') from e
+
+    try:
+        reader = PdfReader(path)
+        return len(reader.pages)
+    except Exception as e:
+        raise RuntimeError(f'无法读取PDF页数: {e}')
+
+
+def _remember(table: OrderedDict, key, value):
+    table[key] = value
+    table.move_to_end(key)
+    while len(table) > _CACHE_MAX_ENTRIES:
+        table.popitem(last=False)
+
+
+def count_pages(path: str) -> int:
+    """返回 PDF 页数；结构损坏时退回 pypdf（仍失败则抛 RuntimeError）。"""
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        raise RuntimeError(f'无法读取PDF页数: {e}')
+    stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    with _cache_lock:
+        digest = _by_stat.get(stat_key)
+        if digest is not None and digest in _by_digest:
+            _stats['hits'] += 1
+            _by_digest.move_to_end(digest)
+            return _by_digest[digest]
+
+    count = None
+    digest = None
+    if st.st_size > 0:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            digest = hashlib.sha256(buf).hexdigest()
+            with _cache_lock:
+                if digest in _by_digest:
+                    _stats['hits'] += 1
+                    _remember(_by_stat, stat_key, digest)
+                    return _by_digest[digest]
+            try:
+                count = _Document(buf).page_count()
+            except (_Unsupported, ValueError, IndexError):
+                count = None
+
+    if count is None:
+        count = _count_with_pypdf(path)
+        outcome = 'fallback'
+    else:
+        outcome = 'fast'
+    with _cache_lock:
+        _stats[outcome] += 1
+        if digest is not None:
+            _remember(_by_digest, digest, count)
+            _remember(_by_stat, stat_key, digest)
+    return count
+
+
+def content_digest(path: str) -> str:
+    """文件内容的 SHA-256；与页数缓存共用 路径/大小/mtime → 摘要 的映射，统计过页数的文件不再重新哈希。"""
+    st = os.stat(path)
+    stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    with _cache_lock:
+        digest = _by_stat.get(stat_key)
+        if digest is not None:
+            _by_stat.move_to_end(stat_key)
+            return digest
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _cache_lock:
+        _remember(_by_stat, stat_key, digest)
+    return digest
+
+
+def get_page_count_stats() -> Dict[str, int]:
+    with _cache_lock:
+        data = dict(_stats)
+        data['entries'] = len(_by_digest)
+    return data
+
+
+def clear_cache():
+    """清空缓存与计数（测试/基准用）。"""
+    with _cache_lock:
+        _by_digest.clear()
+        _by_stat.clear()
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,156 @@
+"""打印机池路由 - Linux版本
+
+同一房间的几台相同打印机可以配置成一个池（PRINTER_POOLS），用户在页面上选择池名；
+真正发送前由路由器挑选未完成工作量最小的成员：CUPS 队列中的作业数、本服务已分派但尚未
+打印完的页数以及打印机状态，跳过停用/离线的成员。大任务（页数×份数达到 POOL_SHARD_MIN_PAGES）
+按份数或页段拆成多个分片，同时发往池中多台打印机。
+"""
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+
+def _parse_pools(value) -> Dict[str, List[str]]:
+    """解析 "Room101=HP1|HP2|HP3;Lab2=A|B" 形式的池配置；也接受 dict。"""
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = []
+        for part in str(value or '').split(';'):
+            name, sep, members = part.partition('=')
+            if sep:
+                items.append((name, members.split('|')))
+    pools = {}
+    for name, members in items:
+        name = str(name).strip()
+        members = [m.strip() for m in members if m and m.strip()]
+        if name and members:
+            pools[name] = members
+    return pools
+
+
+def get_pools() -> Dict[str, List[str]]:
+    return _parse_pools(getattr(config, 'PRINTER_POOLS', None))
+
+
+def is_pool(name: Optional[str]) -> bool:
+    return bool(name) and name in get_pools()
+
+
+class PoolRouter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Dict[str, int]] = {}  # 打印机 -> {task_id: 页数}
+        self._stats = {'routed': 0, 'no_member': 0}
+
+    def choose(self, pool: str, task_id: str, pages: int) -> str:
+        """为任务挑选池中负载最小的可用成员，并把它的页数计入该成员的在途工作量。"""
+        return self.choose_many(pool, task_id, [pages])[0]
+
+    def choose_many(self, pool: str, task_id: str, shard_pages: List[int]) -> List[str]:
+        """为每个分片挑选一台不同的成员（负载从小到大），返回与 shard_pages 一一对应的打印机。"""
+        from .circuit_breaker import circuit_breaker
+        from .printer import get_printer_snapshot
+
+        members = get_pools().get(pool)
+        if not members:
+            raise RuntimeError(f'打印机池不存在: {pool}')
+        states = {state.name: state for state in get_printer_snapshot().printers}
+        avg_pages = max(1, int(getattr(config, 'POOL_PAGES_PER_JOB', 10) or 1))
+
+        with self._lock:
+            ranked = []
+            for index, name in enumerate(members):
+                state = states.get(name)
+                if state is None or state.status == 'offline' or not circuit_breaker.admits(name):
+                    continue
+                if config.ALLOWED_PRINTERS is not None and name not in config.ALLOWED_PRINTERS:
+                    continue
+                ours = self._inflight.get(name, {})
+                # CUPS 队列中不是本服务在途的作业按平均页数估算
+                load = sum(ours.values()) + max(0, state.jobs - len(ours)) * avg_pages
+                ranked.append(((load, state.status != 'ready', index), name))
+            if len(ranked) < len(shard_pages):
+                self._stats['no_member'] += 1
+                if not ranked:
+                    raise RuntimeError(f'打印机池 {pool} 中没有可用的打印机')
+                raise RuntimeError(f'打印机池 {pool} 中可用的打印机不足 {len(shard_pages)} 台')
+            ranked.sort()
+            # 正在恢复（半开）的成员经 acquire 每个冷却周期只接一个试探任务，不会一下子接走全部积压
+            chosen = []
+            for _, name in ranked:
+                if len(chosen) == len(shard_pages):
+                    break
+                if circuit_breaker.acquire(name):
+                    chosen.append(name)
+            if len(chosen) < len(shard_pages):
+                self._stats['no_member'] += 1
+                raise RuntimeError(f'打印机池 {pool} 中没有可用的打印机')
+            # 大分片分给最空闲的成员
+            order = sorted(range(len(shard_pages)), key=lambda i: -shard_pages[i])
+            printers: List[str] = [''] * len(shard_pages)
+            for name, i in zip(chosen, order):
+                printers[i] = name
+                self._inflight.setdefault(name, {})[task_id] = max(1, int(shard_pages[i]))
+            self._stats['routed'] += 1
+        return printers
+
+    def available_members(self, pool: str) -> int:
+        from .circuit_breaker import circuit_breaker
+        from .printer import get_printer_snapshot
+
+        states = {state.name: state for state in get_printer_snapshot().printers}
+        return sum(
+            1 for name in get_pools().get(pool, [])
+            if name in states and states[name].status != 'offline' and circuit_breaker.admits(name)
+            and (config.ALLOWED_PRINTERS is None or name in config.ALLOWED_PRINTERS)
+        )
+
+    def release(self, task_id: str):
+        with self._lock:
+            for printer, tasks in list(self._inflight.items()):
+                if tasks.pop(task_id, None) is not None and not tasks:
+                    del self._inflight[printer]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data['inflight_pages'] = {name: sum(tasks.values()) for name, tasks in self._inflight.items()}
+        return data
+
+
+def plan_shards(pages: Sequence[int], copies: int, members: int, *, duplex: bool = False) -> List[Tuple[Sequence[int], int]]:
+    """把 (页序列, 份数) 拆成最多 members 个分片，返回 [(页序列, 份数)]。
+
+    pages 可以是列表或 PageRanges（按序号切片，不展开页码）。
+
+    多份时按份数拆分（每台打印机打印完整的若干份）；只有一份时按连续页段拆分，
+    双面打印时页段按偶数页切分，保证同一张纸的正反面落在同一台打印机上。
+    """
+    copies = max(1, int(copies))
+    if members <= 1 or not pages:
+        return [(pages, copies)]
+    if copies > 1:
+        count = min(members, copies)
+        base, extra = divmod(copies, count)
+        return [(pages, base + (1 if i < extra else 0)) for i in range(count)]
+
+    unit = 2 if duplex else 1
+    units = (len(pages) + unit - 1) // unit
+    count = min(members, units)
+    if count <= 1:
+        return [(pages, copies)]
+    base, extra = divmod(units, count)
+    shards, start = [], 0
+    for i in range(count):
+        size = (base + (1 if i < extra else 0)) * unit
+        shards.append((pages[start:start + size], copies))
+        start += size
+    return shards
+
+
+pool_router = PoolRouter()
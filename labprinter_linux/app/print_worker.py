@@ -2,9 +2,27 @@
 import os
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
 from .task_queue import TaskQueue, TaskState
-from .converter import convert_to_pdf
-from .printer import print_file
+from .converter import convert_to_pdf, supports_page_range_export
+from .fast_convert import convert_fast, supports as fast_convert_supports
+from .printer import (
+    cancel_job,
+    print_file,
+    parse_job_number,
+    _count_range_pages,
+    _get_pdf_total_pages,
+    _parse_page_ranges,
+    PageRanges,
+)
+from .job_tracker import get_job_tracker
+from .pool_router import get_pools, is_pool, plan_shards, pool_router
+from .circuit_breaker import circuit_breaker, is_printer_failure
 from .logger import log_print_result
 
 
@@ -23,15 +41,22 @@ class PrintWorker(threading.Thread):
             if task_id is None:
                 continue
 
-            task = self.queue.get_task(task_id)
-            if task is None:
-                continue
+            try:
+                task = self.queue.get_task(task_id)
+                if task is None:
+                    continue
 
-            self._process_task(task_id, task.filepath, task.options, task.original_filename)
+                self._process_task(task_id, task.filepath, task.options, task.original_filename)
+            finally:
+                self.queue.task_done(task_id)
 
     def _process_task(self, task_id: str, filepath: str, options: dict, original_filename: str):
         temp_pdf = None
+        routed = False
         try:
+            # 目标打印机仍在熔断（暂停超时才会走到这里）：不做转换直接失败
+            self._check_circuit(options.get('printer'))
+
             self.queue.update_task(
                 task_id,
                 state=TaskState.PROGRESS,
@@ -41,6 +66,7 @@ class PrintWorker(threading.Thread):
 
             ext = os.path.splitext(filepath)[1].lower()
             print_path = filepath
+            print_options = options
 
             if ext in ('.doc', '.docx'):
                 self.queue.update_task(
@@ -48,16 +74,42 @@ class PrintWorker(threading.Thread):
                     message="正在转换Word文档...",
                     progress=30
                 )
-                temp_pdf = convert_to_pdf(filepath)
+                page_range = (options.get('page_range') or '').strip()
+                if page_range and supports_page_range_export():
+                    # 只导出所选页：长文档只打几页时转换耗时/体积按实际页数缩小
+                    temp_pdf = convert_to_pdf(filepath, page_range=page_range)
+                    print_options = self._remap_exported_range(temp_pdf, options, page_range)
+                    self.queue.update_task(task_id, options=print_options)
+                else:
+                    temp_pdf = convert_to_pdf(filepath)
+                print_path = temp_pdf
+            elif fast_convert_supports(ext):
+                # 图片/纯文本在进程内直接生成 PDF，不经过 LibreOffice
+                self.queue.update_task(
+                    task_id,
+                    message="正在转换文件...",
+                    progress=30
+                )
+                temp_pdf = convert_fast(filepath, paper_size=options.get('paper_size') or 'A4')
                 print_path = temp_pdf
 
+            shards = [print_options]
+            if is_pool(print_options.get('printer')):
+                # 打印机池：发送前才挑选成员，此时已知实际页数；大任务拆分到多台打印机
+                shards = self._route_pool(task_id, print_path, print_options)
+                routed = True
+                if len(shards) == 1:
+                    print_options = shards[0]
+                    self.queue.update_task(task_id, options=print_options)
+
             self.queue.update_task(
                 task_id,
-                message="正在发送到打印机...",
+                message="正在发送到打印机..." if len(shards) == 1 else f"正在发送到 {len(shards)} 台打印机...",
                 progress=70
             )
 
-            job_id = print_file(print_path, options)
+            job_ids = self._submit_shards(print_path, shards)
+            job_id = ','.join(job_ids)
 
             self.queue.update_task(
                 task_id,
@@ -66,13 +118,46 @@ class PrintWorker(threading.Thread):
             )
             self._cleanup_files(filepath, temp_pdf)
 
-            self.queue.update_task(
-                task_id,
-                state=TaskState.SUCCESS,
-                message="打印完成",
-                progress=100,
-                result={'job_id': job_id, 'status': 'completed'}
-            )
+            tracked = [
+                {
+                    'job_id': jid,
+                    'job_number': parse_job_number(jid),
+                    'printer': shard.get('printer') or None,
+                    'page_range': shard.get('page_range') or '',
+                    'copies': shard.get('copies') or 1,
+                }
+                for jid, shard in zip(job_ids, shards)
+            ]
+            result = self._shard_result(tracked)
+            tracker = get_job_tracker(self.queue)
+            if tracker is not None and all(t['job_number'] is not None for t in tracked):
+                # 提交成功只代表进入 CUPS 队列：由跟踪线程推进到完成/取消/中止
+                self.queue.update_task(
+                    task_id,
+                    state=TaskState.QUEUED,
+                    message="已提交，正在打印机队列中等待...",
+                    progress=90,
+                    result=dict(result, status='queued')
+                )
+                tracker.track_shards(task_id, tracked, on_finish=pool_router.release if routed else None)
+                routed = False  # 由跟踪线程在作业结束时释放在途页数
+            elif tracker is not None:
+                # 作业号无法识别时无从跟踪：只知道已进入 CUPS 队列，不能报成功
+                self.queue.update_task(
+                    task_id,
+                    state=TaskState.UNCONFIRMED,
+                    message="已提交到打印队列，但无法识别作业号，未能跟踪（请到打印机确认）",
+                    progress=90,
+                    result=dict(result, status='untracked')
+                )
+            else:
+                self.queue.update_task(
+                    task_id,
+                    state=TaskState.SUCCESS,
+                    message="打印完成",
+                    progress=100,
+                    result=dict(result, status='completed')
+                )
             log_print_result(task_id, original_filename, True, f"任务ID: {job_id}", options=options)
 
         except Exception as e:
@@ -85,6 +170,124 @@ class PrintWorker(threading.Thread):
                 error=traceback.format_exc()
             )
             log_print_result(task_id, original_filename, False, error_msg, options=options)
+        finally:
+            if routed:
+                pool_router.release(task_id)
+
+    @staticmethod
+    def _job_page_list(pdf_path: str, options: dict) -> Optional[PageRanges]:
+        try:
+            total = _get_pdf_total_pages(pdf_path)
+        except RuntimeError:
+            return None
+        return _parse_page_ranges(options.get('page_range') or '', total)
+
+    def _route_pool(self, task_id: str, pdf_path: str, options: dict) -> List[dict]:
+        pool = options['printer']
+        copies = max(1, int(options.get('copies') or 1))
+        pages = self._job_page_list(pdf_path, options)
+        if pages is None:
+            # 读不出页数时不拆分，按页面范围（或 1 页）估算工作量
+            page_range = (options.get('page_range') or '').strip()
+            weight = (_count_range_pages(page_range) if page_range else 1) * copies
+            return [dict(options, printer=pool_router.choose(pool, task_id, weight))]
+
+        plan = [(pages, copies)]
+        min_pages = int(getattr(config, 'POOL_SHARD_MIN_PAGES', 0) or 0)
+        if min_pages > 0 and len(pages) * copies >= min_pages:
+            members = pool_router.available_members(pool)
+            max_shards = int(getattr(config, 'POOL_SHARD_MAX', 0) or 0)
+            if max_shards > 0:
+                members = min(members, max_shards)
+            plan = plan_shards(pages, copies, members, duplex=(options.get('duplex') or 'one-sided') != 'one-sided')
+
+        printers = pool_router.choose_many(pool, task_id, [max(1, len(p)) * c for p, c in plan])
+        if len(plan) == 1:
+            return [dict(options, printer=printers[0])]
+        return [
+            dict(options, printer=printer, copies=shard_copies, page_range=str(shard_pages))
+            for printer, (shard_pages, shard_copies) in zip(printers, plan)
+        ]
+
+    @staticmethod
+    def _check_circuit(printer: Optional[str]):
+        members = get_pools().get(printer) if printer else None
+        if members:
+            if not any(circuit_breaker.admits(member) for member in members):
+                raise RuntimeError(f'打印机池 {printer} 中的打印机均不可用')
+            return
+        reason = circuit_breaker.reason(printer)
+        if reason:
+            raise RuntimeError(reason)
+
+    @staticmethod
+    def _submit_one(print_path: str, options: dict) -> str:
+        try:
+            job_id = print_file(print_path, options)
+        except Exception as e:
+            if is_printer_failure(e):
+                circuit_breaker.record_failure(options.get('printer'), str(e))
+            raise
+        circuit_breaker.record_success(options.get('printer'))
+        return job_id
+
+    @classmethod
+    def _submit_shards(cls, print_path: str, shards: list) -> list:
+        if len(shards) == 1:
+            return [cls._submit_one(print_path, shards[0])]
+        # 各分片并行提交（各自的 PDF 预处理/上传互不等待）
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix='ShardSubmit') as pool:
+            futures = [pool.submit(cls._submit_one, print_path, shard) for shard in shards]
+        job_ids, errors = [], []
+        for shard, future in zip(shards, futures):
+            try:
+                job_ids.append(future.result())
+            except Exception as e:
+                errors.append(f"{shard.get('printer')}: {e}")
+        if errors:
+            raise RuntimeError('部分分片提交失败: ' + '; '.join(errors) + cls._cancel_submitted(job_ids))
+        return job_ids
+
+    @staticmethod
+    def _cancel_submitted(job_ids: list) -> str:
+        """撤回已提交的分片，使任务失败时纸面上不会只打出一部分；返回附加到错误信息的说明。"""
+        cancelled, leftover = [], []
+        for job_id in job_ids:
+            try:
+                cancel_job(job_id)
+                cancelled.append(job_id)
+            except Exception as e:
+                leftover.append(f'{job_id}（{e}）')
+        note = ''
+        if cancelled:
+            note += f"；已取消已提交的分片: {', '.join(cancelled)}"
+        if leftover:
+            note += f"；以下分片取消失败，可能仍会打印: {', '.join(leftover)}"
+        return note
+
+    @staticmethod
+    def _shard_result(tracked: list) -> dict:
+        if len(tracked) == 1:
+            return {'job_id': tracked[0]['job_id'], 'printer': tracked[0]['printer']}
+        return {
+            'job_id': ','.join(t['job_id'] for t in tracked),
+            'printer': ','.join(dict.fromkeys(t['printer'] or '' for t in tracked)),
+            'shards': [
+                {'printer': t['printer'], 'job_id': t['job_id'], 'page_range': t['page_range'],
+                 'copies': t['copies'], 'status': 'queued'}
+                for t in tracked
+            ],
+        }
+
+    def _remap_exported_range(self, pdf_path: str, options: dict, page_range: str) -> dict:
+        expected = _count_range_pages(page_range)
+        exported = _get_pdf_total_pages(pdf_path)
+        if exported != expected:
+            # LibreOffice 会静默跳过不存在的页；页数对不上说明所选页码超出文档范围
+            raise RuntimeError(f'页码超出范围: {page_range}')
+        remapped = dict(options)
+        remapped['page_range'] = f'1-{exported}' if exported > 1 else '1'
+        return remapped
 
     def _cleanup_files(self, *files):
         for f in files:
@@ -1,4 +1,5 @@
 """打印机操作封装 - Linux版本 (CUPS lp/lpstat)"""
+import hashlib
 import os
 import re
 import shutil
@@ -7,22 +8,48 @@ import tempfile
 import threading
 import time
 import uuid
-from typing import Dict, List, Optional
+from dataclasses import dataclass, replace
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
 try:
     from labprinter_linux import config
 except ImportError:
     import config
 
+try:
+    from labprinter_linux import page_ranges
+    from labprinter_linux.page_ranges import PageRangeError, PageRanges
+except ImportError:
+    import page_ranges
+    from page_ranges import PageRangeError, PageRanges
+
+from .file_cache import FileCache
+from .gs_raster import rasterize, raster_workers
+from .pdf_pages import content_digest, count_pages as count_pdf_pages
+from .supervisor import run_tool
+from .ttl_cache import SingleFlightCache
+
 _CACHE_LOCK = threading.Lock()
 _CACHE_TTL_SECONDS = 5.0
-_DEFAULT_PRINTER_CACHE = None  # (ts_monotonic, value)
-_PRINTER_NAMES_CACHE = None  # (ts_monotonic, frozenset[str])
-_JOBS_COUNT_CACHE = None  # (ts_monotonic, dict[str, int])
+_SNAPSHOT_KEY = 'snapshot'
+# 查询失败的空快照同样缓存一个 TTL：CUPS 异常期间不会每个请求都 fork 一次 lpstat
+_SNAPSHOT_CACHE = SingleFlightCache(_CACHE_TTL_SECONDS, negative_ttl=_CACHE_TTL_SECONDS, is_failure=lambda s: not s.ok)
+_REFRESHER = None  # PrinterRefresher
+_PREPROCESS_CACHE_LOCK = threading.Lock()
+_PREPROCESS_CACHE: Optional[FileCache] = None
+_GS_VERSION_LOCK = threading.Lock()
+_GS_VERSION: Optional[str] = None
+
 
+_CUPS_TOOLS = frozenset({'lp', 'lpstat', 'cancel'})
 
-def _run_cmd(cmd: List[str], timeout: int) -> subprocess.CompletedProcess:
-    return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+
+def _run_cmd(cmd: List[str], timeout: int, *, progress_paths=(), role: Optional[str] = None) -> subprocess.CompletedProcess:
+    """role='gs' 时按 GS_* 应用资源限制并以 'gs' 计数；lp/lpstat/cancel 不传 role，不受 TOOL_* 限制。"""
+    tool = role or os.path.basename(cmd[0])
+    # lp/lpstat/cancel 等待缓慢的 cupsd 时既不占 CPU 也不写文件：不做卡死判定，只按超时
+    cups = tool in _CUPS_TOOLS or cmd[0] in (config.LP_COMMAND, config.LPSTAT_COMMAND, config.CANCEL_COMMAND)
+    return run_tool(tool, cmd, timeout=timeout, progress_paths=progress_paths, stall_timeout=0 if cups else None, role=role)
 
 
 def _find_gs() -> Optional[str]:
@@ -32,7 +59,12 @@ def _find_gs() -> Optional[str]:
     return shutil.which(gs)
 
 
-def _preprocess_pdf_for_print(pdf_path: str) -> str:
+def _preprocess_pdf_for_print(pdf_path: str, pages: Optional[PageRanges] = None) -> str:
+    """按 PDF_PREPROCESS 用 Ghostscript 重写/栅格化 PDF，返回新文件路径（未启用时原样返回）。
+
+    给出 pages 时只处理这些页（-sPageList），输出文件按页码顺序只包含所选页。
+    结果按 (输入内容, 模式, DPI, 所选页, gs 版本) 缓存，重复打印同一份文件不再调用 gs。
+    """
     mode = (getattr(config, 'PDF_PREPROCESS', 'none') or 'none').strip().lower()
     if mode in {'', '0', 'false', 'none'}:
         return pdf_path
@@ -40,11 +72,34 @@ def _preprocess_pdf_for_print(pdf_path: str) -> str:
     gs = _find_gs()
     if not gs:
         raise RuntimeError('未找到 Ghostscript(gs)，请安装 ghostscript 或设置 GS_COMMAND')
+    if mode not in {'gs-pdfwrite', 'gs-rasterize'}:
+        return pdf_path
+
+    dpi = 0
+    if mode == 'gs-rasterize':
+        dpi = int(getattr(config, 'PDF_RASTER_DPI', 200) or 200)
+        if dpi < 72 or dpi > 600:
+            raise RuntimeError('PDF_RASTER_DPI 超出范围(72-600)')
 
     out_dir = os.path.join(tempfile.gettempdir(), 'labprinter', 'preprocessed')
     os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, f'{uuid.uuid4().hex}.pdf')
 
+    def produce() -> str:
+        out_path = os.path.join(out_dir, f'{uuid.uuid4().hex}.pdf')
+        _run_preprocess(gs, mode, dpi, pdf_path, out_path, pages)
+        return out_path
+
+    cache = get_preprocess_cache()
+    if not cache.enabled:
+        return produce()
+    digest = hashlib.sha256('\0'.join(
+        [content_digest(pdf_path), mode, str(dpi), str(pages or ''), _gs_version(gs)]
+    ).encode('utf-8')).hexdigest()
+    # dest 由调用方独占（打印后删除），缓存条目不受影响；相同请求并发时只跑一次 gs
+    return cache.get_or_create(digest, produce, os.path.join(out_dir, f'{uuid.uuid4().hex}.pdf'))
+
+
+def _run_preprocess(gs: str, mode: str, dpi: int, pdf_path: str, out_path: str, pages: Optional[PageRanges]):
     if mode == 'gs-pdfwrite':
         cmd = [
             gs,
@@ -58,26 +113,81 @@ def _preprocess_pdf_for_print(pdf_path: str) -> str:
             '-dSubsetFonts=true',
             '-dAutoRotatePages=/None',
             f'-sOutputFile={out_path}',
-            pdf_path,
         ]
-    elif mode == 'gs-rasterize':
-        dpi = int(getattr(config, 'PDF_RASTER_DPI', 200) or 200)
-        if dpi < 72 or dpi > 600:
-            raise RuntimeError('PDF_RASTER_DPI 超出范围(72-600)')
-        cmd = [
-            gs,
-            '-dSAFER',
-            '-dBATCH',
-            '-dNOPAUSE',
-            '-sDEVICE=pdfimage24',
-            f'-r{dpi}',
-            f'-sOutputFile={out_path}',
-            pdf_path,
-        ]
-    else:
-        return pdf_path
-
-    result = _run_cmd(cmd, timeout=int(getattr(config, 'PDF_PREPROCESS_TIMEOUT', 180) or 180))
+        if pages:
+            cmd.append(f'-sPageList={pages}')
+        cmd.append(pdf_path)
+        _run_gs(cmd, out_path)
+        return
+
+    cmd = [
+        gs,
+        '-dSAFER',
+        '-dBATCH',
+        '-dNOPAUSE',
+        '-sDEVICE=pdfimage24',
+        f'-r{dpi}',
+    ]
+    total_pages = None
+    if not pages and raster_workers() > 1:
+        try:
+            total_pages = _get_pdf_total_pages(pdf_path)
+        except RuntimeError:
+            pass  # 读不出页数时交给 gs 整份处理，不拆分
+    rasterize(_run_gs, cmd, pdf_path, out_path, pages, total_pages)
+
+
+def get_preprocess_cache() -> FileCache:
+    global _PREPROCESS_CACHE
+    with _PREPROCESS_CACHE_LOCK:
+        if _PREPROCESS_CACHE is None:
+            cache_dir = getattr(config, 'PREPROCESS_CACHE_DIR', '') or os.path.join(
+                tempfile.gettempdir(), 'labprinter', 'cache', 'preprocess'
+            )
+            max_mb = int(getattr(config, 'PREPROCESS_CACHE_MAX_MB', 0) or 0)
+            _PREPROCESS_CACHE = FileCache(cache_dir, max_mb * 1024 * 1024)
+        return _PREPROCESS_CACHE
+
+
+def get_preprocess_stats() -> Dict:
+    return get_preprocess_cache().stats()
+
+
+def _gs_version(gs: str) -> str:
+    """Ghostscript 版本（进程内只探测一次），作为预处理缓存 key 的一部分：升级 gs 后旧缓存自动失效。"""
+    global _GS_VERSION
+    with _GS_VERSION_LOCK:
+        if _GS_VERSION is None:
+            version = ''
+            try:
+                result = _run_cmd([gs, '--version'], timeout=30, role='gs')
+                if result.returncode == 0:
+                    version = result.stdout.strip()
+            except Exception:
+                version = ''
+            if not version:
+                try:
+                    st = os.stat(os.path.realpath(gs))
+                    version = f'{os.path.realpath(gs)}:{st.st_size}:{int(st.st_mtime)}'
+                except OSError:
+                    version = gs
+            _GS_VERSION = version
+        return _GS_VERSION
+
+
+def _run_gs(cmd: List[str], out_path: str):
+    """执行一次 gs，失败或超时时删除不完整的输出并抛出 RuntimeError。"""
+    try:
+        result = _run_cmd(
+            cmd,
+            timeout=int(getattr(config, 'PDF_PREPROCESS_TIMEOUT', 180) or 180),
+            progress_paths=[out_path],
+            role='gs',
+        )
+    except Exception:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
     if result.returncode != 0 or not os.path.exists(out_path):
         msg = (result.stderr or result.stdout or '').strip() or f'PDF 预处理失败，返回码 {result.returncode}'
         try:
@@ -86,140 +196,268 @@ def _preprocess_pdf_for_print(pdf_path: str) -> str:
             pass
         raise RuntimeError(msg)
 
-    return out_path
 
+def _remap_preprocessed_range(processed_pdf: str, options: dict, selected: PageRanges, total_pages: int) -> dict:
+    """按页预处理后的输出只含所选页，改为整份打印；不支持 -sPageList 的旧版 gs 会输出全部页，此时保留原范围。"""
+    processed_pages = _get_pdf_total_pages(processed_pdf)
+    if processed_pages == len(selected):
+        return dict(options, page_range='')
+    if processed_pages == total_pages:
+        return options
+    raise RuntimeError(f'PDF 预处理后页数异常: {processed_pages}（应为 {len(selected)}）')
 
-def _parse_default_printer(lpstat_output: str) -> Optional[str]:
-    m = re.search(r'system default destination:\s*(.+)\s*$', (lpstat_output or '').strip())
-    return m.group(1).strip() if m else None
 
+def _use_ipp() -> bool:
+    return (getattr(config, 'PRINTER_BACKEND', 'lpstat') or 'lpstat').strip().lower() == 'ipp'
 
-def get_default_printer() -> Optional[str]:
-    global _DEFAULT_PRINTER_CACHE
-    now = time.monotonic()
-    with _CACHE_LOCK:
-        cached = _DEFAULT_PRINTER_CACHE
-        if cached and (now - cached[0]) < _CACHE_TTL_SECONDS:
-            return cached[1]
 
-    value: Optional[str] = None
-    try:
-        result = _run_cmd([config.LPSTAT_COMMAND, '-d'], timeout=10)
-        if result.returncode != 0:
-            value = None
-        else:
-            value = _parse_default_printer(result.stdout)
-    except Exception:
-        value = None
+def _ipp_client():
+    from .ipp import get_ipp_client
+    return get_ipp_client()
 
-    with _CACHE_LOCK:
-        _DEFAULT_PRINTER_CACHE = (now, value)
-    return value
 
+@dataclass(frozen=True)
+class PrinterState:
+    name: str
+    status: str = 'ready'  # ready / busy / offline
+    status_text: str = '就绪'
+    description: str = ''
+    jobs: int = 0
 
-def _get_jobs_count_map() -> Dict[str, int]:
-    global _JOBS_COUNT_CACHE
-    now = time.monotonic()
-    with _CACHE_LOCK:
-        cached = _JOBS_COUNT_CACHE
-        if cached and (now - cached[0]) < _CACHE_TTL_SECONDS:
-            return dict(cached[1])
 
-    counts: Dict[str, int] = {}
-    try:
-        # 一次性取回所有队列作业，避免每台打印机都 fork/subprocess
-        result = _run_cmd([config.LPSTAT_COMMAND, '-o'], timeout=10)
-        if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                first = line.split(None, 1)[0]  # e.g. "HP-123"
-                if '-' not in first:
-                    continue
-                dest, jobid = first.rsplit('-', 1)
-                if not jobid.isdigit():
-                    continue
-                counts[dest] = counts.get(dest, 0) + 1
-    except Exception:
-        counts = {}
-
-    with _CACHE_LOCK:
-        _JOBS_COUNT_CACHE = (now, dict(counts))
-    return counts
+@dataclass(frozen=True)
+class PrinterSnapshot:
+    """某一时刻 CUPS 中全部打印机的一致视图：列表、校验与提交打印都读同一份快照。"""
+    printers: Tuple[PrinterState, ...] = ()
+    default: Optional[str] = None
+    taken_at: float = 0.0  # time.monotonic()
+    ok: bool = True  # False 表示查询失败（空快照，同样缓存一个 TTL，避免 CUPS 异常时反复 fork）
 
+    @property
+    def names(self) -> FrozenSet[str]:
+        return frozenset(p.name for p in self.printers)
 
-def get_printers() -> List[Dict]:
-    default_printer = config.DEFAULT_PRINTER or get_default_printer()
-    try:
-        result = _run_cmd([config.LPSTAT_COMMAND, '-p'], timeout=10)
-        if result.returncode != 0:
-            return []
+    @property
+    def jobs(self) -> Dict[str, int]:
+        return {p.name: p.jobs for p in self.printers}
 
-        jobs_map = _get_jobs_count_map()
-        printers: List[Dict] = []
-        for line in result.stdout.splitlines():
-            line = line.strip()
-            if not line.startswith('printer '):
-                continue
 
+def _parse_default_printer(lpstat_output: str) -> Optional[str]:
+    for line in (lpstat_output or '').splitlines():
+        m = re.match(r'\s*system default destination:\s*(.+?)\s*$', line)
+        if m:
+            return m.group(1)
+    return None
+
+
+def _parse_lpstat_snapshot(output: str) -> PrinterSnapshot:
+    """解析 `lpstat -d -p -o` 的合并输出。"""
+    printers: List[PrinterState] = []
+    jobs: Dict[str, int] = {}
+    for raw in (output or '').splitlines():
+        if not raw.strip() or raw[0].isspace():
+            continue  # 打印机状态的续行（告警/描述）
+        line = raw.strip()
+        if line.startswith('printer '):
             parts = line.split()
             if len(parts) < 2:
                 continue
-
-            name = parts[1]
-            if config.ALLOWED_PRINTERS is not None and name not in config.ALLOWED_PRINTERS:
-                continue
-            status = 'ready'
-            status_text = '就绪'
+            status, status_text = 'ready', '就绪'
             if 'disabled' in line:
-                status = 'offline'
-                status_text = '已禁用/离线'
+                status, status_text = 'offline', '已禁用/离线'
             elif 'printing' in line:
-                status = 'busy'
-                status_text = '打印中'
-
-            printers.append({
-                'name': name,
-                'description': '',
-                'is_default': (name == default_printer),
-                'status': status,
-                'status_text': status_text,
-                'jobs': jobs_map.get(name, 0)
-            })
-
-        return printers
+                status, status_text = 'busy', '打印中'
+            printers.append(PrinterState(parts[1], status, status_text))
+            continue
+        first = line.split(None, 1)[0]  # 作业行，如 "HP-123 user 1024 ..."
+        if '-' not in first:
+            continue
+        dest, jobid = first.rsplit('-', 1)
+        if jobid.isdigit():
+            jobs[dest] = jobs.get(dest, 0) + 1
+
+    printers = [replace(p, jobs=jobs.get(p.name, 0)) for p in printers]
+    return PrinterSnapshot(tuple(printers), _parse_default_printer(output), time.monotonic())
+
+
+def _lpstat_snapshot() -> PrinterSnapshot:
+    # 默认打印机、打印机状态与队列作业一次 lpstat 取回
+    result = _run_cmd([config.LPSTAT_COMMAND, '-d', '-p', '-o'], timeout=10)
+    snapshot = _parse_lpstat_snapshot(result.stdout)
+    if result.returncode != 0 and not snapshot.printers:
+        return PrinterSnapshot(taken_at=time.monotonic(), ok=False)
+    return snapshot
+
+
+def _ipp_printer_status(attrs: Dict) -> tuple:
+    from .ipp import PRINTER_PROCESSING, PRINTER_STOPPED
+
+    reasons = attrs.get('printer-state-reasons') or []
+    if isinstance(reasons, str):
+        reasons = [reasons]
+    state = attrs.get('printer-state')
+    if state == PRINTER_STOPPED or any(r.startswith('offline') for r in reasons):
+        return 'offline', '已禁用/离线'
+    if state == PRINTER_PROCESSING:
+        return 'busy', '打印中'
+    return 'ready', '就绪'
+
+
+def _ipp_snapshot() -> PrinterSnapshot:
+    from .ipp import CUPS_PRINTER_DEFAULT
+
+    # 一次 CUPS-Get-Printers 同时取回状态、排队作业数与默认打印机标记
+    entries = _ipp_client().get_printers([
+        'printer-name', 'printer-info', 'printer-state', 'printer-state-reasons',
+        'printer-type', 'queued-job-count',
+    ])
+    printers: List[PrinterState] = []
+    default = None
+    for attrs in entries:
+        name = attrs.get('printer-name')
+        if not name:
+            continue
+        if default is None and int(attrs.get('printer-type') or 0) & CUPS_PRINTER_DEFAULT:
+            default = name
+        status, status_text = _ipp_printer_status(attrs)
+        printers.append(PrinterState(
+            name,
+            status,
+            status_text,
+            description=attrs.get('printer-info') or '',
+            jobs=int(attrs.get('queued-job-count') or 0),
+        ))
+    return PrinterSnapshot(tuple(printers), default, time.monotonic())
+
+
+def _query_snapshot() -> PrinterSnapshot:
+    try:
+        return _ipp_snapshot() if _use_ipp() else _lpstat_snapshot()
     except Exception:
-        return []
+        return PrinterSnapshot(taken_at=time.monotonic(), ok=False)
 
 
-def get_printer_names() -> set[str]:
-    global _PRINTER_NAMES_CACHE
-    now = time.monotonic()
+def get_printer_snapshot() -> PrinterSnapshot:
     with _CACHE_LOCK:
-        cached = _PRINTER_NAMES_CACHE
-        if cached and (now - cached[0]) < _CACHE_TTL_SECONDS:
-            return set(cached[1])
+        refresher = _REFRESHER
+    if refresher is not None:
+        # 后台刷新线程在运行时直接返回最近一次成功的快照，请求线程从不等待 CUPS
+        cached = _SNAPSHOT_CACHE.peek(_SNAPSHOT_KEY, allow_expired=True)
+        if cached is not None:
+            return cached
+    # 缓存过期时只有一个请求线程查询 CUPS，其它并发请求等待同一结果
+    return _SNAPSHOT_CACHE.get(_SNAPSHOT_KEY, _query_snapshot)
+
+
+def peek_printer_snapshot() -> Optional[PrinterSnapshot]:
+    """返回最近一次缓存的快照（可能已过期），从不查询 CUPS；尚无快照时返回 None。"""
+    return _SNAPSHOT_CACHE.peek(_SNAPSHOT_KEY, allow_expired=True)
+
+
+def refresh_printer_snapshot() -> bool:
+    """重新查询 CUPS；成功时替换缓存的快照，失败时保留上一次成功的快照。"""
+    snapshot = _query_snapshot()
+    if snapshot.ok or _SNAPSHOT_CACHE.peek(_SNAPSHOT_KEY, allow_expired=True) is None:
+        _SNAPSHOT_CACHE.put(_SNAPSHOT_KEY, snapshot)
+    return snapshot.ok
+
+
+def get_printer_cache_stats() -> Dict[str, int]:
+    return _SNAPSHOT_CACHE.stats()
+
+
+class PrinterRefresher(threading.Thread):
+    """按固定间隔在后台刷新打印机快照；CUPS 无响应时按指数退避延长间隔。"""
+
+    def __init__(self, interval: float, max_backoff: float):
+        super().__init__(name='PrinterRefresher', daemon=True)
+        self.interval = max(1.0, float(interval))
+        self.max_backoff = max(self.interval, float(max_backoff))
+        self.delay = self.interval
+        self.failures = 0
+        self.refreshes = 0
+        self.last_success_at: Optional[float] = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.refresh_once()
+            self._stop_event.wait(self.delay)
+
+    def refresh_once(self) -> bool:
+        self.refreshes += 1
+        if refresh_printer_snapshot():
+            self.failures = 0
+            self.delay = self.interval
+            self.last_success_at = time.monotonic()
+            return True
+        self.failures += 1
+        self.delay = min(self.max_backoff, self.interval * (2 ** self.failures))
+        return False
 
-    names: set[str] = set()
-    try:
-        result = _run_cmd([config.LPSTAT_COMMAND, '-p'], timeout=10)
-        if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                line = line.strip()
-                if not line.startswith('printer '):
-                    continue
-                parts = line.split()
-                if len(parts) >= 2:
-                    names.add(parts[1])
-    except Exception:
-        names = set()
+    def stats(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'next_delay': self.delay,
+            'consecutive_failures': self.failures,
+            'refreshes': self.refreshes,
+        }
+
+
+def start_printer_refresher() -> Optional[PrinterRefresher]:
+    """按 PRINTER_REFRESH_INTERVAL 启动后台刷新线程（0=关闭，按 TTL 在请求中同步刷新）。"""
+    global _REFRESHER
+    interval = float(getattr(config, 'PRINTER_REFRESH_INTERVAL', 0) or 0)
+    if interval <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _REFRESHER is not None:
+            return _REFRESHER
+        refresher = PrinterRefresher(interval, float(getattr(config, 'PRINTER_REFRESH_MAX_BACKOFF', 120) or 0))
+        _REFRESHER = refresher
+    refresher.start()
+    return refresher
 
-    if config.ALLOWED_PRINTERS is not None:
-        names = {n for n in names if n in config.ALLOWED_PRINTERS}
 
+def get_printer_refresher_stats() -> Optional[Dict]:
     with _CACHE_LOCK:
-        _PRINTER_NAMES_CACHE = (now, frozenset(names))
+        refresher = _REFRESHER
+    return refresher.stats() if refresher is not None else None
+
+
+def get_default_printer() -> Optional[str]:
+    return get_printer_snapshot().default
+
+
+def _get_jobs_count_map() -> Dict[str, int]:
+    return get_printer_snapshot().jobs
+
+
+def get_printers(snapshot: Optional[PrinterSnapshot] = None) -> List[Dict]:
+    snapshot = snapshot or get_printer_snapshot()
+    default_printer = config.DEFAULT_PRINTER or snapshot.default
+    printers: List[Dict] = []
+    for state in snapshot.printers:
+        if config.ALLOWED_PRINTERS is not None and state.name not in config.ALLOWED_PRINTERS:
+            continue
+        printers.append({
+            'name': state.name,
+            'description': state.description,
+            'is_default': (state.name == default_printer),
+            'status': state.status,
+            'status_text': state.status_text,
+            'jobs': state.jobs,
+        })
+    return printers
+
+
+def get_printer_names() -> set[str]:
+    names = set(get_printer_snapshot().names)
+    if config.ALLOWED_PRINTERS is not None:
+        names = {n for n in names if n in config.ALLOWED_PRINTERS}
     return names
 
 
@@ -243,108 +481,39 @@ def validate_printer_name(printer_name: str) -> bool:
 
 
 def _normalize_page_range(page_range: str) -> str:
-    page_range = (page_range or '').strip()
-    if not page_range:
-        return ''
-    page_range = page_range.replace(' ', '')
-    if len(page_range) > 200:
-        raise RuntimeError('页面范围过长')
-    if not re.fullmatch(r'\d+(-\d+)?(,\d+(-\d+)?)*', page_range):
-        raise RuntimeError('页面范围格式错误')
-
-    for part in page_range.split(','):
-        if not part:
-            continue
-        if '-' in part:
-            start_s, end_s = part.split('-', 1)
-            start, end = int(start_s), int(end_s)
-            if start < 1 or end < 1:
-                raise RuntimeError('页码必须大于等于1')
-            if start > end:
-                raise RuntimeError('起始页不能大于结束页')
-        else:
-            page = int(part)
-            if page < 1:
-                raise RuntimeError('页码必须大于等于1')
-    return page_range
-
-
-def _get_pdf_total_pages(pdf_path: str) -> int:
+    """校验并规范化页面范围（排序、合并重叠区间），空范围返回空字符串。"""
     try:
-        from pypdf import PdfReader  # type: ignore
-    except Exception as e:
-        raise RuntimeError('缺少依赖 pypdf，请在 Linux 端安装 requirements.txt') from e
+        return page_ranges.normalize(page_range)
+    except PageRangeError as e:
+        raise RuntimeError(str(e))
 
-    try:
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
-    except Exception as e:
-        raise RuntimeError(f'无法读取PDF页数: {e}')
-
-
-def _parse_page_range_to_pages(page_range: str, total_pages: int) -> List[int]:
-    if total_pages < 1:
-        raise RuntimeError('PDF页数无效')
-    page_range = _normalize_page_range(page_range)
-    if not page_range:
-        return list(range(1, total_pages + 1))
-
-    pages = set()
-    parts = page_range.split(',')
-    for part in parts:
-        if not part:
-            continue
-        if '-' in part:
-            start_s, end_s = part.split('-', 1)
-            start, end = int(start_s), int(end_s)
-            if start > end:
-                raise RuntimeError('起始页不能大于结束页')
-            if start < 1 or end > total_pages:
-                raise RuntimeError(f'页码超出范围(1-{total_pages}): {part}')
-            pages.update(range(start, end + 1))
-        else:
-            page = int(part)
-            if page < 1 or page > total_pages:
-                raise RuntimeError(f'页码超出范围(1-{total_pages}): {page}')
-            pages.add(page)
 
-    return sorted(pages)
+def _count_range_pages(page_range: str) -> int:
+    """页面范围内不重复的页数（按区间合并计算，不展开页码）。"""
+    try:
+        return page_ranges.count(page_range)
+    except PageRangeError as e:
+        raise RuntimeError(str(e))
 
 
-def _pages_to_range_string(pages: List[int]) -> str:
-    pages = sorted(set(pages))
-    if not pages:
-        return ''
+def _get_pdf_total_pages(pdf_path: str) -> int:
+    # 只读交叉引用与页树根节点，结构损坏时才退回 pypdf 全量解析
+    return count_pdf_pages(pdf_path)
 
-    ranges = []
-    start = prev = pages[0]
-    for p in pages[1:]:
-        if p == prev + 1:
-            prev = p
-            continue
-        ranges.append(f'{start}-{prev}' if start != prev else f'{start}')
-        start = prev = p
-    ranges.append(f'{start}-{prev}' if start != prev else f'{start}')
-    return ','.join(ranges)
 
+def _parse_page_ranges(page_range: str, total_pages: int) -> PageRanges:
+    """按总页数校验页面范围，返回区间表示的页集合；空范围表示全部页。"""
+    try:
+        return PageRanges.parse(page_range, total_pages)
+    except PageRangeError as e:
+        raise RuntimeError(str(e))
 
-def build_lp_command(filepath: str, options: dict, *, printer_name: Optional[str]) -> List[str]:
-    cmd: List[str] = [config.LP_COMMAND]
-
-    if printer_name:
-        if printer_name.startswith('-'):
-            raise RuntimeError('打印机名称无效')
-        cmd.extend(['-d', printer_name])
 
+def _job_settings(options: dict) -> Dict:
+    """校验并规范化打印选项，lp 与 IPP 两种提交方式共用。"""
     copies = int(options.get('copies', 1))
     if copies < 1 or copies > 99:
         raise RuntimeError('份数超出范围(1-99)')
-    if copies > 1:
-        cmd.extend(['-n', str(copies)])
-
-    page_range = _normalize_page_range(options.get('page_range', ''))
-    if page_range:
-        cmd.extend(['-o', f'page-ranges={page_range}'])
 
     duplex = (options.get('duplex') or 'one-sided').strip()
     sides_map = {
@@ -352,29 +521,186 @@ def build_lp_command(filepath: str, options: dict, *, printer_name: Optional[str
         'two-sided-long-edge': 'two-sided-long-edge',
         'two-sided-short-edge': 'two-sided-short-edge',
     }
-    if duplex in sides_map:
-        cmd.extend(['-o', f'sides={sides_map[duplex]}'])
 
     paper_size = (options.get('paper_size') or 'A4').strip() or 'A4'
     if not re.fullmatch(r'[A-Za-z0-9_.-]{1,32}', paper_size):
         raise RuntimeError('纸张格式错误')
-    cmd.extend(['-o', f'media={paper_size}'])
 
     color = (options.get('color') or 'color').strip()
-    if color == 'grayscale':
-        cmd.extend(['-o', 'print-color-mode=monochrome'])
-    else:
-        cmd.extend(['-o', 'print-color-mode=color'])
+    return {
+        'copies': copies,
+        'page_range': _normalize_page_range(options.get('page_range', '')),
+        'sides': sides_map.get(duplex),
+        'media': paper_size,
+        'color_mode': 'monochrome' if color == 'grayscale' else 'color',
+    }
+
+
+def build_lp_command(filepath: str, options: dict, *, printer_name: Optional[str]) -> List[str]:
+    cmd: List[str] = [config.LP_COMMAND]
+
+    if printer_name:
+        if printer_name.startswith('-'):
+            raise RuntimeError('打印机名称无效')
+        cmd.extend(['-d', printer_name])
+
+    settings = _job_settings(options)
+    if settings['copies'] > 1:
+        cmd.extend(['-n', str(settings['copies'])])
+    if settings['page_range']:
+        cmd.extend(['-o', f"page-ranges={settings['page_range']}"])
+    if settings['sides']:
+        cmd.extend(['-o', f"sides={settings['sides']}"])
+    cmd.extend(['-o', f"media={settings['media']}"])
+    cmd.extend(['-o', f"print-color-mode={settings['color_mode']}"])
 
     cmd.append(filepath)
     return cmd
 
 
+def build_ipp_job_attributes(options: dict) -> List[tuple]:
+    """打印选项转为 Print-Job 的 job 组属性 [(值类型, 名称, 值)]。"""
+    from . import ipp
+
+    settings = _job_settings(options)
+    attributes = [(ipp.TAG_INTEGER, 'copies', settings['copies'])]
+    if settings['page_range']:
+        ranges = []
+        for part in settings['page_range'].split(','):
+            start, _, end = part.partition('-')
+            ranges.append((int(start), int(end or start)))
+        attributes.append((ipp.TAG_RANGE, 'page-ranges', ranges))
+    if settings['sides']:
+        attributes.append((ipp.TAG_KEYWORD, 'sides', settings['sides']))
+    attributes.append((ipp.TAG_KEYWORD, 'media', settings['media']))
+    attributes.append((ipp.TAG_KEYWORD, 'print-color-mode', settings['color_mode']))
+    return attributes
+
+
 def _parse_lp_job_id(output: str) -> Optional[str]:
-    m = re.search(r'request id is\\s+(\\S+)\\s', output or '')
+    # lp 输出形如 "request id is HP-123 (1 file(s))"
+    m = re.search(r'request id is\s+(\S+)', output or '')
     return m.group(1) if m else None
 
 
+def parse_job_number(job_id: str) -> Optional[int]:
+    """CUPS 作业号：lp 返回 "HP-123"，IPP 返回 "123"；无法识别时返回 None。"""
+    tail = str(job_id or '').rsplit('-', 1)[-1]
+    return int(tail) if tail.isdigit() else None
+
+
+# IPP job-state 枚举值 → 作业跟踪状态
+_IPP_JOB_STATES = {
+    3: 'queued',      # pending
+    4: 'queued',      # pending-held
+    5: 'printing',    # processing
+    6: 'printing',    # processing-stopped
+    7: 'cancelled',
+    8: 'aborted',
+    9: 'completed',
+}
+
+
+def _reasons_text(reasons) -> str:
+    if isinstance(reasons, str):
+        reasons = [reasons]
+    return ', '.join(r for r in (reasons or []) if r and r != 'none')
+
+
+_IPP_JOB_ATTRIBUTES = ['job-id', 'job-state', 'job-state-reasons']
+
+
+def _ipp_finished_states(job_numbers: List[int]) -> Dict[int, Tuple[str, str]]:
+    """IPP Get-Jobs which-jobs=completed：取回已离开队列作业的最终状态（completed/cancelled/aborted）。"""
+    states: Dict[int, Tuple[str, str]] = {}
+    for job in _ipp_client().get_jobs(_IPP_JOB_ATTRIBUTES, which='completed'):
+        if job.get('job-id') in job_numbers:
+            states[job['job-id']] = (_IPP_JOB_STATES.get(job.get('job-state'), 'completed'), _reasons_text(job.get('job-state-reasons')))
+    return states
+
+
+def _ipp_job_states(job_numbers: List[int]) -> Dict[int, Tuple[str, str]]:
+    states: Dict[int, Tuple[str, str]] = {}
+    for job in _ipp_client().get_jobs(_IPP_JOB_ATTRIBUTES, which='not-completed'):
+        if job.get('job-id') in job_numbers:
+            states[job['job-id']] = (_IPP_JOB_STATES.get(job.get('job-state'), 'queued'), _reasons_text(job.get('job-state-reasons')))
+    left = [n for n in job_numbers if n not in states]
+    if left:
+        # 只在有作业离开队列时才查询已结束作业
+        states.update(_ipp_finished_states(left))
+    return states
+
+
+def _lpstat_job_states(job_numbers: List[int]) -> Dict[int, Tuple[str, str]]:
+    result = _run_cmd([config.LPSTAT_COMMAND, '-p', '-W', 'not-completed', '-o'], timeout=10)
+    if result.returncode != 0 and not (result.stdout or '').strip():
+        raise RuntimeError((result.stderr or '').strip() or f'lpstat 失败，返回码 {result.returncode}')
+    printing = set()
+    queued = set()
+    for raw in (result.stdout or '').splitlines():
+        line = raw.strip()
+        if not line or raw[0].isspace():
+            continue
+        if line.startswith('printer '):
+            m = re.search(r'now printing (\S+?)\.?(\s|$)', line)
+            if m and parse_job_number(m.group(1)) is not None:
+                printing.add(parse_job_number(m.group(1)))
+            continue
+        number = parse_job_number(line.split(None, 1)[0])
+        if number is not None:
+            queued.add(number)
+    states: Dict[int, Tuple[str, str]] = {}
+    left = []
+    for number in job_numbers:
+        if number in printing:
+            states[number] = ('printing', '')
+        elif number in queued:
+            states[number] = ('queued', '')
+        else:
+            left.append(number)
+    if left:
+        # lpstat -W completed 不区分完成/取消/中止：最终状态向 cupsd 的 IPP 接口查询（不依赖 PRINTER_BACKEND），
+        # 查询失败或 cupsd 已不保留该作业时如实报告为离开队列
+        try:
+            finished = _ipp_finished_states(left)
+        except Exception:
+            finished = {}
+        for number in left:
+            states[number] = finished.get(number, ('left-queue', ''))
+    return states
+
+
+def query_job_states(job_numbers: List[int]) -> Dict[int, Tuple[str, str]]:
+    """批量查询作业状态，返回 {作业号: (状态, 原因)}。
+
+    状态为 queued/printing/completed/cancelled/aborted；已离开队列但查不到最终状态的作业为 left-queue。
+
+    无论跟踪多少个作业，每次只发起一次批量查询（有作业结束时再补一次 IPP 已结束作业查询，两种后端相同）；
+    查询失败时抛出异常，调用方保持原状态下次再试。
+    """
+    job_numbers = list(job_numbers)
+    if not job_numbers:
+        return {}
+    return _ipp_job_states(job_numbers) if _use_ipp() else _lpstat_job_states(job_numbers)
+
+
+def cancel_job(job_id: str):
+    """取消已提交的 CUPS 作业（IPP Cancel-Job 或 cancel 命令）；失败时抛出 RuntimeError。"""
+    if _use_ipp():
+        number = parse_job_number(job_id)
+        if number is None:
+            raise RuntimeError(f'无法识别的作业号: {job_id}')
+        _ipp_client().cancel_job(number)
+        return
+    result = _run_cmd([config.CANCEL_COMMAND, job_id], timeout=10)
+    if result.returncode != 0:
+        raise RuntimeError((result.stderr or '').strip() or f'cancel 失败，返回码 {result.returncode}')
+
+
+class PrintSubmitError(RuntimeError):
+    """lp 提交失败（打印机/CUPS 拒绝或无响应），区别于文件预处理等本地错误。"""
+
+
 def print_file(filepath: str, options: dict) -> str:
     abs_path = os.path.abspath(filepath)
     if not os.path.exists(abs_path):
@@ -394,30 +720,53 @@ def print_file(filepath: str, options: dict) -> str:
     processed_pdf: Optional[str] = None
     print_path = abs_path
     try:
-        # 预处理 PDF（可选）：用于处理复杂字体/排版导致的打印失败或缺字问题
-        if os.path.splitext(abs_path)[1].lower() == '.pdf':
-            processed = _preprocess_pdf_for_print(abs_path)
-            if processed != abs_path:
-                processed_pdf = processed
-                print_path = processed_pdf
-
         # 校验/规范化页面范围（对齐 Windows 的行为：非法或越界会直接报错）
         page_range = (options.get('page_range') or '').strip()
+        is_pdf = os.path.splitext(abs_path)[1].lower() == '.pdf'
+        selected: Optional[PageRanges] = None
         if page_range:
-            if os.path.splitext(print_path)[1].lower() != '.pdf':
+            if not is_pdf:
                 # 非 PDF 无法可靠获取总页数，这里仅做格式校验
                 normalized = _normalize_page_range(page_range)
             else:
-                total_pages = _get_pdf_total_pages(print_path)
-                pages = _parse_page_range_to_pages(page_range, total_pages)
-                normalized = _pages_to_range_string(pages)
+                total_pages = _get_pdf_total_pages(abs_path)
+                selected = _parse_page_ranges(page_range, total_pages)
+                if len(selected) == total_pages:
+                    selected = None
+                normalized = str(selected) if selected is not None else ''
             options = dict(options)
             options['page_range'] = normalized
 
+        # 预处理 PDF（可选）：用于处理复杂字体/排版导致的打印失败或缺字问题。
+        # 只选了部分页时只处理这些页，不再重写/栅格化整份文档后由 lp 丢弃其余页
+        if is_pdf:
+            processed = _preprocess_pdf_for_print(abs_path, selected)
+            if processed != abs_path:
+                processed_pdf = processed
+                print_path = processed_pdf
+                if selected is not None:
+                    options = _remap_preprocessed_range(processed_pdf, options, selected, total_pages)
+
+        if _use_ipp():
+            # 直接以 IPP Print-Job 流式提交：不 fork lp，失败时 IppError 带 IPP 状态码
+            if printer_name.startswith('-'):
+                raise RuntimeError('打印机名称无效')
+            job_id = _ipp_client().print_job(
+                printer_name,
+                print_path,
+                job_name=os.path.basename(abs_path),
+                job_attributes=build_ipp_job_attributes(options),
+                document_format='application/pdf' if print_path.lower().endswith('.pdf') else 'application/octet-stream',
+            )
+            return str(job_id)
+
         cmd = build_lp_command(print_path, options, printer_name=printer_name)
-        result = _run_cmd(cmd, timeout=config.LP_TIMEOUT)
+        try:
+            result = _run_cmd(cmd, timeout=config.LP_TIMEOUT)
+        except subprocess.TimeoutExpired as e:
+            raise PrintSubmitError(f'lp 超时（{config.LP_TIMEOUT} 秒）') from e
         if result.returncode != 0:
-            raise RuntimeError((result.stderr or result.stdout or '').strip() or f'lp 失败，返回码 {result.returncode}')
+            raise PrintSubmitError((result.stderr or result.stdout or '').strip() or f'lp 失败，返回码 {result.returncode}')
 
         job_id = _parse_lp_job_id(result.stdout)
         return job_id or f"lp-job-{os.path.basename(print_path)}"
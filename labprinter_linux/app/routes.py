@@ -1,5 +1,6 @@
 """Web路由 - Linux版本"""
 import os
+import time
 import uuid
 import re
 from flask import Blueprint, request, jsonify, render_template, Response
@@ -9,7 +10,10 @@ try:
 except ImportError:
     import config
 from .task_queue import task_queue, TaskState
+from .documents import document_store, DocumentState
 from .logger import log_print_request
+from .pool_router import get_pools, is_pool, pool_router
+from .circuit_breaker import circuit_breaker
 
 bp = Blueprint('main', __name__)
 
@@ -29,50 +33,40 @@ def favicon():
     return Response(status=204)
 
 
-@bp.route('/upload', methods=['POST'])
-def upload():
-    if 'file' not in request.files:
-        return jsonify({'error': '未选择文件'}), 400
-
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': '未选择文件'}), 400
-
-    if not allowed_file(file.filename):
-        return jsonify({'error': f'不支持的文件类型，仅支持: {", ".join(config.ALLOWED_EXTENSIONS)}'}), 400
-
+def _parse_print_options(form):
+    """解析并校验打印选项，返回 (options, 错误信息)。"""
     try:
-        copies = int(request.form.get('copies', 1))
+        copies = int(form.get('copies', 1))
     except (TypeError, ValueError):
-        return jsonify({'error': '份数格式错误'}), 400
+        return None, '份数格式错误'
     if copies < 1 or copies > 99:
-        return jsonify({'error': '份数超出范围(1-99)'}), 400
+        return None, '份数超出范围(1-99)'
 
-    duplex = (request.form.get('duplex') or 'one-sided').strip() or 'one-sided'
+    duplex = (form.get('duplex') or 'one-sided').strip() or 'one-sided'
     if duplex not in {'one-sided', 'two-sided-long-edge', 'two-sided-short-edge'}:
         duplex = 'one-sided'
 
-    color = (request.form.get('color') or 'color').strip() or 'color'
+    color = (form.get('color') or 'color').strip() or 'color'
     if color not in {'color', 'grayscale'}:
         color = 'color'
 
-    paper_size = (request.form.get('paper_size') or 'A4').strip() or 'A4'
+    paper_size = (form.get('paper_size') or 'A4').strip() or 'A4'
     if paper_size not in {'A4', 'A3', 'Letter'}:
         paper_size = 'A4'
 
-    raw_printer = (request.form.get('printer') or '').strip()
-    if raw_printer:
+    raw_printer = (form.get('printer') or '').strip()
+    if raw_printer and not is_pool(raw_printer):
         from .printer import validate_printer_name
         if not validate_printer_name(raw_printer):
-            return jsonify({'error': '无效的打印机'}), 400
+            return None, '无效的打印机'
     printer = raw_printer or config.DEFAULT_PRINTER
 
     page_range = ''
-    if request.form.get('page_range_type') == 'custom':
-        page_range = (request.form.get('page_range') or '').strip()
+    if form.get('page_range_type') == 'custom':
+        page_range = (form.get('page_range') or '').strip()
         if page_range:
             if not re.fullmatch(r'\d+(-\d+)?(,\d+(-\d+)?)*', page_range.replace(' ', '')):
-                return jsonify({'error': '页面范围格式错误'}), 400
+                return None, '页面范围格式错误'
 
     options = {
         'copies': copies,
@@ -82,7 +76,10 @@ def upload():
         'printer': printer,
         'page_range': page_range,
     }
+    return options, None
 
+
+def _save_upload(file) -> tuple:
     # 生成唯一文件名并落盘（放到最后，避免参数校验失败时留下垃圾文件）
     name_root, ext = os.path.splitext(file.filename)
     ext = ext.lower()
@@ -92,14 +89,45 @@ def upload():
     unique_name = f"{uuid.uuid4().hex}_{filename}"
     filepath = os.path.join(config.UPLOAD_FOLDER, unique_name)
     file.save(filepath)
+    return filepath, filename
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _get_upload_file():
+    if 'file' not in request.files:
+        return None, '未选择文件'
+
+    file = request.files['file']
+    if file.filename == '':
+        return None, '未选择文件'
+
+    if not allowed_file(file.filename):
+        return None, f'不支持的文件类型，仅支持: {", ".join(config.ALLOWED_EXTENSIONS)}'
+    return file, None
+
+
+@bp.route('/upload', methods=['POST'])
+def upload():
+    file, error = _get_upload_file()
+    if error:
+        return jsonify({'error': error}), 400
+
+    options, error = _parse_print_options(request.form)
+    if error:
+        return jsonify({'error': error}), 400
+
+    filepath, filename = _save_upload(file)
 
     try:
         task_id = task_queue.submit(filepath, options, filename)
     except RuntimeError as e:
-        try:
-            os.remove(filepath)
-        except OSError:
-            pass
+        _remove_quietly(filepath)
         return jsonify({'error': str(e)}), 429
 
     client_ip = request.remote_addr
@@ -108,6 +136,81 @@ def upload():
     return jsonify({'task_id': task_id, 'filename': filename, 'message': '打印任务已提交'})
 
 
+def _document_json(doc):
+    return {
+        'document_id': doc.id,
+        'filename': doc.original_filename,
+        'state': doc.state.value,
+        'page_count': doc.page_count,
+        'error': doc.error or None,
+    }
+
+
+@bp.route('/documents', methods=['POST'])
+def create_document():
+    file, error = _get_upload_file()
+    if error:
+        return jsonify({'error': error}), 400
+
+    filepath, filename = _save_upload(file)
+    try:
+        doc = document_store.create(filepath, filename)
+    except RuntimeError as e:
+        _remove_quietly(filepath)
+        return jsonify({'error': str(e)}), 429
+    return jsonify(_document_json(doc)), 201
+
+
+@bp.route('/documents/<doc_id>')
+def document_status(doc_id: str):
+    doc = document_store.get(doc_id)
+    if doc is None:
+        return jsonify({'error': '文档不存在或已过期'}), 404
+    return jsonify(_document_json(doc))
+
+
+@bp.route('/documents/<doc_id>', methods=['DELETE'])
+def delete_document(doc_id: str):
+    if not document_store.discard(doc_id):
+        return jsonify({'error': '文档不存在或已过期'}), 404
+    return Response(status=204)
+
+
+@bp.route('/documents/<doc_id>/print', methods=['POST'])
+def print_document(doc_id: str):
+    doc = document_store.get(doc_id)
+    if doc is None:
+        return jsonify({'error': '文档不存在或已过期'}), 404
+    if doc.state == DocumentState.FAILURE:
+        document_store.discard(doc_id)
+        return jsonify({'error': f'文档处理失败: {doc.error}'}), 400
+
+    options, error = _parse_print_options(request.form)
+    if error:
+        return jsonify({'error': error}), 400
+    # 页数按推测排版的纸张统计：换了纸张的文本文档由打印任务重新转换后再校验
+    if options['page_range'] and doc.page_count and document_store.layout_matches(doc, options['paper_size']):
+        from .printer import _parse_page_ranges
+        try:
+            _parse_page_ranges(options['page_range'], doc.page_count)
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 400
+
+    committed = document_store.commit(doc_id, options['paper_size'])
+    if committed is None:
+        return jsonify({'error': '文档不存在或已过期'}), 404
+    doc, print_path = committed
+
+    try:
+        task_id = task_queue.submit(print_path, options, doc.original_filename)
+    except RuntimeError as e:
+        _remove_quietly(print_path)
+        return jsonify({'error': str(e)}), 429
+
+    log_print_request(task_id, request.remote_addr, doc.original_filename, options)
+    return jsonify({'task_id': task_id, 'filename': doc.original_filename, 'message': '打印任务已提交'})
+
+
 @bp.route('/status/<task_id>')
 def task_status(task_id: str):
     task = task_queue.get_task(task_id)
@@ -121,7 +224,8 @@ def task_status(task_id: str):
         'progress': task.progress
     }
 
-    if task.state == TaskState.SUCCESS:
+    if task.state in (TaskState.QUEUED, TaskState.PRINTING, TaskState.SUCCESS, TaskState.CANCELLED, TaskState.ABORTED,
+                      TaskState.UNCONFIRMED):
         response['result'] = task.result
     elif task.state == TaskState.FAILURE and config.DEBUG:
         response['error'] = task.error
@@ -131,6 +235,37 @@ def task_status(task_id: str):
 
 @bp.route('/printers')
 def list_printers():
-    from .printer import get_printers
-    printers = get_printers()
-    return jsonify({'printers': printers})
+    from .printer import get_printer_snapshot, get_printers
+    snapshot = get_printer_snapshot()
+    printers = get_printers(snapshot)
+    return jsonify({
+        'printers': printers,
+        'pools': [{'name': name, 'members': members} for name, members in get_pools().items()],
+        'age_seconds': round(max(0.0, time.monotonic() - snapshot.taken_at), 1),
+        'ok': snapshot.ok,
+    })
+
+
+@bp.route('/stats')
+def stats():
+    from .converter import get_convert_stats
+    from .gs_raster import get_raster_stats
+    from .ipp import get_ipp_stats
+    from .job_tracker import get_job_tracker_stats
+    from .pdf_pages import get_page_count_stats
+    from .printer import get_preprocess_stats, get_printer_cache_stats, get_printer_refresher_stats
+    from .supervisor import get_tool_stats
+    return jsonify({
+        'convert': get_convert_stats(),
+        'tools': get_tool_stats(),
+        'ipp': get_ipp_stats(),
+        'printer_cache': get_printer_cache_stats(),
+        'printer_refresher': get_printer_refresher_stats(),
+        'job_tracker': get_job_tracker_stats(),
+        'lanes': task_queue.lane_stats(),
+        'pools': pool_router.stats(),
+        'breaker': circuit_breaker.stats(),
+        'page_count': get_page_count_stats(),
+        'raster': get_raster_stats(),
+        'preprocess_cache': get_preprocess_stats(),
+    })
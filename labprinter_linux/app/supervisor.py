@@ -0,0 +1,385 @@
+"""外部工具进程监管 - Linux版本
+
+soffice / gs 等外部工具在独立进程组中启动；除了整体超时，还按 CPU 时间与输出文件大小判断是否仍在推进，
+长时间无进展即判定卡死并整组 SIGKILL（包括 soffice.bin 等子进程），尽快释放工作线程。
+
+可按工具配置内存/CPU 时间上限（RLIMIT_AS / RLIMIT_CPU，或 cgroup v2 的 memory.max），
+防止单个异常文档占满内存把整台机器拖进 swap；超限失败的任务给出明确原因。
+"""
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from labprinter_linux import config
+except ImportError:
+    import config
+
+_POLL_INTERVAL_SECONDS = 0.5
+
+
+class ToolStalled(RuntimeError):
+    pass
+
+
+class ToolLimitExceeded(RuntimeError):
+    pass
+
+
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Dict[str, int]] = {}
+
+
+def _count(tool: str, name: str, n: int = 1):
+    with _STATS_LOCK:
+        stats = _tool_stats(tool)
+        stats[name] = stats.get(name, 0) + n
+
+
+def _tool_stats(tool: str) -> Dict[str, int]:
+    return _STATS.setdefault(tool, {
+        'runs': 0, 'stalls': 0, 'timeouts': 0, 'kills': 0, 'orphans': 0,
+        'memory_limits': 0, 'cpu_limits': 0, 'peak_rss_bytes': 0,
+    })
+
+
+def _record_peak_rss(tool: str, rss_bytes: int):
+    with _STATS_LOCK:
+        stats = _tool_stats(tool)
+        stats['peak_rss_bytes'] = max(stats['peak_rss_bytes'], rss_bytes)
+
+
+def get_tool_stats() -> Dict[str, Dict[str, int]]:
+    with _STATS_LOCK:
+        return {tool: dict(stats) for tool, stats in _STATS.items()}
+
+
+def _group_members(pgid: int) -> List[int]:
+    """进程组内仍存活（非僵尸）的进程 pid 列表。"""
+    pids = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid and fields[0] != b'Z':
+            pids.append(int(entry))
+    return pids
+
+
+def _group_cpu_ticks(pids: Iterable[int]) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                fields = f.read().rsplit(b')', 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def _group_rss(pids: Iterable[int]) -> int:
+    """进程组 RSS 合计，单位字节。"""
+    rss = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm', 'rb') as f:
+                rss += int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss
+
+
+def _paths_size(paths: Iterable[str]) -> int:
+    total = 0
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                with os.scandir(path) as it:
+                    for e in it:
+                        try:
+                            total += e.stat().st_size
+                        except OSError:
+                            pass
+            else:
+                total += os.path.getsize(path)
+        except OSError:
+            continue
+    return total
+
+
+def _kill_group(pgid: int):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _stall_timeout() -> float:
+    try:
+        return float(getattr(config, 'TOOL_STALL_TIMEOUT', 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _tool_limit(role: str, name: str) -> int:
+    """按工具角色读取资源限制：优先 <ROLE>_<name>（如 SOFFICE_MEMORY_LIMIT_MB），否则 TOOL_<name>；0=不限制。"""
+    for key in (f'{role.upper()}_{name}', f'TOOL_{name}'):
+        try:
+            value = int(getattr(config, key, 0) or 0)
+        except (TypeError, ValueError):
+            value = 0
+        if value > 0:
+            return value
+    return 0
+
+
+def tool_limits(role: Optional[str]) -> Tuple[int, int]:
+    """返回转换工具角色（'gs' / 'soffice'）的 (内存上限字节, CPU 时间上限秒)，0 表示不限制。
+
+    role 为 None（lp/lpstat/cancel 等非转换工具）时不限制。按角色而非可执行文件名取值，
+    自定义 GS_COMMAND（如 gs-10）同样使用 GS_* 限制。
+    """
+    if not role:
+        return 0, 0
+    return _tool_limit(role, 'MEMORY_LIMIT_MB') * 1024 * 1024, _tool_limit(role, 'CPU_LIMIT_SECONDS')
+
+
+def _apply_limits(pid: int, memory_bytes: int, cpu_seconds: int, cgroup_dir: Optional[str] = None):
+    """在父进程中对已启动的子进程施加资源限制（cgroup 迁移 + prlimit）。
+
+    不使用 preexec_fn：服务是多线程的，fork 后、exec 前在子进程里运行 Python 代码可能死锁。
+    代价是子进程启动后到限制生效前有极短的窗口，这段时间内它还来不及申请大量内存或 CPU。
+    """
+    in_cgroup = False
+    if cgroup_dir:
+        try:
+            with open(os.path.join(cgroup_dir, 'cgroup.procs'), 'w') as f:
+                f.write(str(pid))
+            in_cgroup = True
+        except OSError:
+            pass
+    try:
+        if memory_bytes and not in_cgroup:
+            resource.prlimit(pid, resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        if cpu_seconds:
+            # 软限制先发 SIGXCPU，若进程忽略该信号，硬限制再 SIGKILL
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+    except (ProcessLookupError, PermissionError):
+        pass  # 进程已退出
+
+
+def apply_limits(pid: int, role: str, *, cpu: bool = True):
+    """供直接 Popen 的场景（如常驻 soffice 实例）在启动后应用同样的资源限制。
+
+    常驻进程的 CPU 时间会一直累积，这类调用应传 cpu=False，只限制内存。
+    """
+    memory_bytes, cpu_seconds = tool_limits(role)
+    _apply_limits(pid, memory_bytes, cpu_seconds if cpu else 0)
+
+
+def _create_cgroup(tool: str, memory_bytes: int) -> Optional[str]:
+    """在 TOOL_CGROUP_ROOT（服务可写的 cgroup v2 子树）下为本次运行建立带 memory.max 的子 cgroup。"""
+    root = getattr(config, 'TOOL_CGROUP_ROOT', '') or ''
+    if not root or not memory_bytes or not os.path.isdir(root):
+        return None
+    try:
+        with open(os.path.join(root, 'cgroup.subtree_control'), 'w') as f:
+            f.write('+memory')
+    except OSError:
+        pass
+    path = os.path.join(root, f'{tool}-{uuid.uuid4().hex[:8]}')
+    try:
+        os.mkdir(path)
+        with open(os.path.join(path, 'memory.max'), 'w') as f:
+            f.write(str(memory_bytes))
+    except OSError:
+        _remove_cgroup(path)
+        return None
+    try:
+        with open(os.path.join(path, 'memory.swap.max'), 'w') as f:
+            f.write('0')
+    except OSError:
+        pass
+    return path
+
+
+def _read_cgroup_value(path: str, name: str) -> Dict[str, int]:
+    values = {}
+    try:
+        with open(os.path.join(path, name)) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 1:
+                    values[''] = int(parts[0])
+                elif len(parts) == 2:
+                    values[parts[0]] = int(parts[1])
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def _remove_cgroup(path: str):
+    for _ in range(20):
+        try:
+            os.rmdir(path)
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            time.sleep(0.05)  # 组内进程尚未被内核回收
+
+
+_MEMORY_ERROR_MARKERS = ('bad_alloc', 'VMerror', 'MemoryError', 'out of memory', 'Cannot allocate memory')
+
+
+def _limit_failure(tool: str, returncode: int, stderr: str, memory_bytes: int, cpu_seconds: int,
+                   oom_killed: bool) -> Optional[str]:
+    """仅在有确切证据时判定为资源限制导致的失败，返回面向用户的原因；否则返回 None。
+
+    证据：SIGXCPU（RLIMIT_CPU 软限制）、cgroup memory.events 中 oom_kill 计数增加、
+    或 stderr 中出现内存申请失败的提示（RLIMIT_AS 下的 bad_alloc/VMerror 等）。
+    """
+    if returncode == 0:
+        return None
+    if oom_killed:
+        _count(tool, 'memory_limits')
+        return f'{tool} 超出内存限制({memory_bytes // (1024 * 1024)}MB)，已被终止'
+    if cpu_seconds and returncode == -signal.SIGXCPU:
+        _count(tool, 'cpu_limits')
+        return f'{tool} 超出 CPU 时间限制({cpu_seconds}秒)，已被终止'
+    if memory_bytes and any(marker in (stderr or '') for marker in _MEMORY_ERROR_MARKERS):
+        _count(tool, 'memory_limits')
+        return f'{tool} 超出内存限制({memory_bytes // (1024 * 1024)}MB)，已被终止'
+    return None
+
+
+def _signal_name(returncode: int) -> str:
+    try:
+        return signal.Signals(-returncode).name
+    except ValueError:
+        return str(-returncode)
+
+
+def run_tool(
+    tool: str,
+    cmd: List[str],
+    *,
+    timeout: float,
+    env: Optional[dict] = None,
+    progress_paths: Iterable[str] = (),
+    stall_timeout: Optional[float] = None,
+    role: Optional[str] = None,
+) -> subprocess.CompletedProcess:
+    """在独立进程组中运行外部工具，返回值与 subprocess.run(capture_output=True, text=True) 一致。
+
+    超过 timeout 抛出 subprocess.TimeoutExpired；CPU 与 progress_paths 大小在 stall_timeout 秒内
+    均无变化时整组终止并抛出 ToolStalled；因内存/CPU 时间限制失败时抛出 ToolLimitExceeded。
+    无论如何退出，残留在进程组中的子进程都会被清理。
+    role 为转换工具角色（'gs' / 'soffice'），只对其应用内存/CPU 时间限制；tool 只用于统计计数。
+    """
+    if stall_timeout is None:
+        stall_timeout = _stall_timeout()
+    progress_paths = list(progress_paths)
+    memory_bytes, cpu_seconds = tool_limits(role)
+    cgroup_dir = _create_cgroup(tool, memory_bytes)
+    _count(tool, 'runs')
+
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            start_new_session=True,
+        )
+    except Exception:
+        if cgroup_dir:
+            _remove_cgroup(cgroup_dir)
+        raise
+    oom_kills_before = _read_cgroup_value(cgroup_dir, 'memory.events').get('oom_kill', 0) if cgroup_dir else 0
+    _apply_limits(proc.pid, memory_bytes, cpu_seconds, cgroup_dir)
+    pgid = proc.pid
+    start = time.monotonic()
+    last_progress_at = start
+    last_sample = None
+    peak_rss = 0
+    group_killed = False
+    try:
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=_POLL_INTERVAL_SECONDS)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            members = _group_members(pgid)
+            if proc.poll() is not None and members:
+                # 主进程已退出但输出管道仍被同组子进程占用：直接清理残留子进程
+                _count(tool, 'orphans')
+                _kill_group(pgid)
+
+            peak_rss = max(peak_rss, _group_rss(members))
+
+            now = time.monotonic()
+            if now - start > timeout:
+                _count(tool, 'timeouts')
+                _count(tool, 'kills')
+                group_killed = True
+                _kill_group(pgid)
+                proc.communicate()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+            if stall_timeout > 0:
+                sample = (_group_cpu_ticks(members), _paths_size(progress_paths))
+                if sample != last_sample:
+                    last_sample = sample
+                    last_progress_at = now
+                elif now - last_progress_at > stall_timeout:
+                    _count(tool, 'stalls')
+                    _count(tool, 'kills')
+                    group_killed = True
+                    _kill_group(pgid)
+                    proc.communicate()
+                    raise ToolStalled(f'{tool} 已 {int(stall_timeout)} 秒无进展，判定为卡死并已终止')
+    finally:
+        if proc.poll() is None:
+            group_killed = True
+            _kill_group(pgid)
+            proc.wait()
+        # 主进程已退出，但同组子进程（如 soffice.bin）可能仍残留
+        if not group_killed and _group_members(pgid):
+            _count(tool, 'orphans')
+            _kill_group(pgid)
+        oom_killed = False
+        if cgroup_dir:
+            peak_rss = max(peak_rss, _read_cgroup_value(cgroup_dir, 'memory.peak').get('', 0))
+            oom_killed = _read_cgroup_value(cgroup_dir, 'memory.events').get('oom_kill', 0) > oom_kills_before
+            _remove_cgroup(cgroup_dir)
+        _record_peak_rss(tool, peak_rss)
+
+    cause = _limit_failure(tool, proc.returncode, stderr, memory_bytes, cpu_seconds, oom_killed)
+    if cause:
+        raise ToolLimitExceeded(cause)
+    if proc.returncode < 0:
+        # 被信号终止且无资源限制证据：如实报告原始信号
+        stderr = f'{stderr}\n{tool} 被信号 {_signal_name(proc.returncode)} 终止'.lstrip('\n')
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
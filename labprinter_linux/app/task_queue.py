@@ -1,11 +1,11 @@
 """任务队列 - Linux版本（线程队列，无需外部组件）"""
 import threading
-import queue
 import uuid
 import time
+from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Deque, Dict, Optional
 from datetime import datetime
 try:
     from labprinter_linux import config
@@ -16,8 +16,17 @@ except ImportError:
 class TaskState(Enum):
     PENDING = "PENDING"
     PROGRESS = "PROGRESS"
+    QUEUED = "QUEUED"  # 已提交到 CUPS，在打印机队列中等待
+    PRINTING = "PRINTING"  # 打印机正在处理该作业
+    HELD = "HELD"  # 目标打印机熔断中，任务暂停（尚未转换），恢复后自动继续
     SUCCESS = "SUCCESS"
     FAILURE = "FAILURE"
+    CANCELLED = "CANCELLED"  # 作业在 CUPS 中被取消
+    ABORTED = "ABORTED"  # 作业被打印机/过滤器中止
+    UNCONFIRMED = "UNCONFIRMED"  # 作业已离开跟踪范围但无法确认是否打印成功（lpstat 后端或跟踪超时）
+
+
+FINISHED_STATES = (TaskState.SUCCESS, TaskState.FAILURE, TaskState.CANCELLED, TaskState.ABORTED, TaskState.UNCONFIRMED)
 
 
 @dataclass
@@ -34,7 +43,40 @@ class Task:
     created_at: datetime = field(default_factory=datetime.now)
 
 
+DEFAULT_LANE = ''  # 未指定打印机（使用 CUPS 默认打印机）的任务
+
+
+def _parse_lane_limits(value) -> Dict[str, int]:
+    """解析 "Plotter=1,HP=2" 形式的按打印机并发上限；也接受 dict。"""
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = []
+        for part in str(value or '').split(','):
+            name, sep, limit = part.rpartition('=')
+            if sep and name.strip():
+                items.append((name.strip(), limit.strip()))
+    limits = {}
+    for name, limit in items:
+        try:
+            limits[name] = max(1, int(limit))
+        except (TypeError, ValueError):
+            continue
+    return limits
+
+
+class _Lane:
+    __slots__ = ('pending', 'running')
+
+    def __init__(self):
+        self.pending: Deque[str] = deque()
+        self.running = 0
+
+
 class TaskQueue:
+    """按目标打印机分通道排队：每台打印机一个 FIFO 通道并有各自的并发上限，
+    工作线程轮询挑选"有任务且未达上限"的通道，慢打印机的大任务不会占满所有工作线程。"""
+
     def __init__(self):
         max_queue_size = getattr(config, "MAX_QUEUE_SIZE", 0) or 0
         try:
@@ -43,23 +85,50 @@ class TaskQueue:
             max_queue_size = 0
         if max_queue_size < 0:
             max_queue_size = 0
-        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._max_queue_size = max_queue_size
+        self._lanes: Dict[str, _Lane] = {}
+        self._claimed: Dict[str, str] = {}  # task_id -> 通道（已被工作线程取走、尚未 task_done）
+        self._held: Dict[str, float] = {}  # task_id -> 开始暂停的时间（目标打印机熔断中）
+        self._queued = 0
+        self._next_lane = 0
+        self._cond = threading.Condition()
         self._tasks: dict[str, Task] = {}
         self._tasks_lock = threading.Lock()
 
+    @staticmethod
+    def lane_for(options: dict) -> str:
+        return (options or {}).get('printer') or getattr(config, 'DEFAULT_PRINTER', None) or DEFAULT_LANE
+
+    def lane_limit(self, lane: str) -> int:
+        limits = _parse_lane_limits(getattr(config, 'PRINTER_LANE_LIMITS', None))
+        if lane in limits:
+            return limits[lane]
+        limit = int(getattr(config, 'PRINTER_LANE_CONCURRENCY', 0) or 0)
+        if limit <= 0:
+            # 自动：单台打印机可用满全部工作线程；只有其它打印机有任务在排队时才给它们留出一个
+            limit = int(getattr(config, 'MAX_CONCURRENT_JOBS', 1) or 1)
+            if any(other.pending for name, other in self._lanes.items() if name != lane):
+                limit -= 1
+        from .pool_router import get_pools
+        members = get_pools().get(lane)
+        if members:
+            # 打印机池按成员数放大：池内各成员分担任务
+            limit *= len(members)
+        return max(1, limit)
+
     def submit(self, filepath: str, options: dict, original_filename: str = "") -> str:
         task_id = uuid.uuid4().hex
         task = Task(id=task_id, filepath=filepath, options=options, original_filename=original_filename)
+        lane = self.lane_for(options)
 
-        with self._tasks_lock:
-            self._tasks[task_id] = task
-
-        try:
-            self._queue.put_nowait(task_id)
-        except queue.Full:
+        with self._cond:
+            if self._max_queue_size and self._queued >= self._max_queue_size:
+                raise RuntimeError("任务队列已满，请稍后再试")
             with self._tasks_lock:
-                self._tasks.pop(task_id, None)
-            raise RuntimeError("任务队列已满，请稍后再试")
+                self._tasks[task_id] = task
+            self._lanes.setdefault(lane, _Lane()).pending.append(task_id)
+            self._queued += 1
+            self._cond.notify()
         return task_id
 
     def get_task(self, task_id: str) -> Optional[Task]:
@@ -76,10 +145,91 @@ class TaskQueue:
                     setattr(task, key, value)
 
     def get_next(self, timeout: float = 1.0) -> Optional[str]:
-        try:
-            return self._queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
+        """取出下一个可执行的任务；取到的任务处理完后必须调用 task_done() 归还通道名额。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                task_id = self._claim_locked()
+                if task_id is not None:
+                    return task_id
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def _claim_locked(self) -> Optional[str]:
+        names = list(self._lanes)
+        now = time.monotonic()
+        for offset in range(len(names)):
+            index = (self._next_lane + offset) % len(names)
+            name = names[index]
+            lane = self._lanes[name]
+            if not lane.pending or lane.running >= self.lane_limit(name):
+                continue
+            if not self._lane_open(name):
+                # 打印机熔断：任务留在通道里暂停，不做转换；暂停超时的任务交给工作线程直接判定失败
+                self._hold_locked(name, lane, now)
+                hold_seconds = float(getattr(config, 'PRINTER_HOLD_SECONDS', 600) or 0)
+                if now - self._held[lane.pending[0]] < hold_seconds:
+                    continue
+            task_id = lane.pending.popleft()
+            lane.running += 1
+            self._queued -= 1
+            self._claimed[task_id] = name
+            self._held.pop(task_id, None)
+            self._next_lane = index + 1
+            return task_id
+        return None
+
+    @staticmethod
+    def _lane_open(name: str) -> bool:
+        from .circuit_breaker import circuit_breaker
+        from .pool_router import get_pools
+
+        members = get_pools().get(name)
+        if members:
+            # 试探名额在路由选中该成员时才占用（PoolRouter.choose_many 调用 acquire）
+            return any(circuit_breaker.admits(member) for member in members)
+        return circuit_breaker.acquire(name or None)
+
+    def _hold_locked(self, name: str, lane: _Lane, now: float):
+        from .circuit_breaker import circuit_breaker
+
+        fresh = [task_id for task_id in lane.pending if task_id not in self._held]
+        if not fresh:
+            return
+        reason = circuit_breaker.reason(name or None) or f'打印机 {name or "(默认)"} 暂不可用'
+        with self._tasks_lock:
+            for task_id in fresh:
+                self._held[task_id] = now
+                task = self._tasks.get(task_id)
+                if task is not None:
+                    task.state = TaskState.HELD
+                    task.message = f'{reason}，任务已暂停，恢复后自动继续'
+
+    def task_done(self, task_id: str):
+        with self._cond:
+            name = self._claimed.pop(task_id, None)
+            if name is None:
+                return
+            lane = self._lanes.get(name)
+            if lane is not None:
+                lane.running -= 1
+                if not lane.pending and lane.running <= 0:
+                    del self._lanes[name]
+            self._cond.notify_all()
+
+    def lane_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            return {
+                name or '(default)': {
+                    'queued': len(lane.pending),
+                    'held': sum(1 for task_id in lane.pending if task_id in self._held),
+                    'running': lane.running,
+                    'limit': self.lane_limit(name),
+                }
+                for name, lane in self._lanes.items()
+            }
 
     def cleanup_old_tasks(self, max_age_seconds: int = 3600):
         now = datetime.now()
@@ -87,7 +237,7 @@ class TaskQueue:
             to_remove = [
                 tid for tid, task in self._tasks.items()
                 if (now - task.created_at).total_seconds() > max_age_seconds
-                and task.state in (TaskState.SUCCESS, TaskState.FAILURE)
+                and task.state in FINISHED_STATES
             ]
             for tid in to_remove:
                 del self._tasks[tid]
@@ -112,12 +262,27 @@ def start_worker():
             worker.start()
         _workers_started = True
 
+        # 提前构建 LibreOffice profile 模板，首个 Word 任务无需等待首启初始化
+        from .converter import prepare_profile_template
+        threading.Thread(target=_safe_call, args=(prepare_profile_template,), name="ConverterWarmup", daemon=True).start()
+
+        # 后台保持打印机状态新鲜：/printers 与提交校验直接读取最近一次快照
+        from .printer import start_printer_refresher
+        _safe_call(start_printer_refresher)
+
         if not _cleanup_started:
             thread = threading.Thread(target=_cleanup_loop, name="TaskCleanup", daemon=True)
             thread.start()
             _cleanup_started = True
 
 
+def _safe_call(fn):
+    try:
+        fn()
+    except Exception:
+        pass
+
+
 def _cleanup_loop():
     retention = getattr(config, "TASK_RETENTION_SECONDS", 3600) or 3600
     interval = getattr(config, "TASK_CLEANUP_INTERVAL_SECONDS", 300) or 300
@@ -134,9 +299,16 @@ def _cleanup_loop():
     if interval < 5:
         interval = 5
 
+    document_ttl = int(getattr(config, "DOCUMENT_TTL_SECONDS", 1800) or 1800)
+
     while True:
         try:
             task_queue.cleanup_old_tasks(max_age_seconds=retention)
         except Exception:
             pass
+        try:
+            from .documents import document_store
+            document_store.cleanup_expired(document_ttl)
+        except Exception:
+            pass
         time.sleep(interval)
@@ -0,0 +1,114 @@
+"""带 single-flight 的内存 TTL 缓存 - Linux版本
+
+缓存过期时只有一个调用方真正去加载（例如 fork lpstat），其它并发调用方等待它的结果；
+加载失败（抛异常或 is_failure 判定为失败）按较短的 negative_ttl 缓存，避免故障期间反复重试。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Entry:
+    __slots__ = ('value', 'error', 'expires_at', 'failure')
+
+    def __init__(self, value: Any, error: Optional[BaseException], expires_at: float, failure: bool):
+        self.value = value
+        self.error = error
+        self.expires_at = expires_at
+        self.failure = failure
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    def __init__(
+        self,
+        ttl: float,
+        *,
+        negative_ttl: Optional[float] = None,
+        is_failure: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.ttl = float(ttl)
+        self.negative_ttl = self.ttl if negative_ttl is None else float(negative_ttl)
+        self._is_failure = is_failure
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'waits': 0, 'errors': 0}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """返回未过期的缓存值；否则由一个调用方执行 loader()，并发的其它调用方等待同一结果。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry.expires_at:
+                self._stats['negative_hits' if entry.failure else 'hits'] += 1
+                return self._unwrap(entry.value, entry.error)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self._stats['misses'] += 1
+            else:
+                self._stats['waits'] += 1
+
+        if not leader:
+            flight.event.wait()
+            return self._unwrap(flight.value, flight.error)
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+        failure = flight.error is not None or bool(self._is_failure and self._is_failure(flight.value))
+        ttl = self.negative_ttl if failure else self.ttl
+        with self._lock:
+            if failure:
+                self._stats['errors'] += 1
+            if ttl > 0:
+                self._entries[key] = _Entry(flight.value, flight.error, time.monotonic() + ttl, failure)
+            else:
+                self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+        flight.event.set()
+        return self._unwrap(flight.value, flight.error)
+
+    @staticmethod
+    def _unwrap(value: Any, error: Optional[BaseException]) -> Any:
+        if error is not None:
+            raise error
+        return value
+
+    def peek(self, key: Hashable, *, allow_expired: bool = False) -> Any:
+        """不触发加载地读取缓存值（无值或失败条目返回 None）。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.error is not None:
+                return None
+            if not allow_expired and time.monotonic() >= entry.expires_at:
+                return None
+            return entry.value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = _Entry(value, None, time.monotonic() + self.ttl, False)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            data = dict(self._stats)
+            data['entries'] = len(self._entries)
+        return data
@@ -14,7 +14,7 @@ UPLOAD_FOLDER = os.environ.get(
     os.path.join(tempfile.gettempdir(), 'labprinter', 'uploads')
 )
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
-ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
+ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png', 'tif', 'tiff', 'txt'}
 
 # 打印配置
 DEFAULT_PRINTER = os.environ.get('DEFAULT_PRINTER', None)  # None 使用 CUPS 默认
@@ -25,23 +25,88 @@ MAX_QUEUE_SIZE = int(os.environ.get('MAX_QUEUE_SIZE', '50'))  # 0=不限制
 TASK_RETENTION_SECONDS = int(os.environ.get('TASK_RETENTION_SECONDS', '3600'))
 TASK_CLEANUP_INTERVAL_SECONDS = int(os.environ.get('TASK_CLEANUP_INTERVAL_SECONDS', '300'))
 
+# 两阶段打印：上传后即开始后台转换，未提交打印的文档超过该秒数后清理
+DOCUMENT_TTL_SECONDS = int(os.environ.get('DOCUMENT_TTL_SECONDS', '1800'))
+MAX_PENDING_DOCUMENTS = int(os.environ.get('MAX_PENDING_DOCUMENTS', '100'))  # 0=不限制
+DOCUMENT_PREPARE_CONCURRENCY = int(os.environ.get('DOCUMENT_PREPARE_CONCURRENCY', '0'))  # 0=同 MAX_CONCURRENT_JOBS
+
 # CUPS 命令
 LP_COMMAND = os.environ.get('LP_COMMAND', 'lp')
 LPSTAT_COMMAND = os.environ.get('LPSTAT_COMMAND', 'lpstat')
+CANCEL_COMMAND = os.environ.get('CANCEL_COMMAND', 'cancel')  # 分片部分提交失败时撤回已提交的作业
 LP_TIMEOUT = int(os.environ.get('LP_TIMEOUT', '60'))
+# 打印机后端：lpstat=调用 lpstat/lp 并解析文本输出；ipp=查询与提交打印均通过 IPP 直接访问 cupsd（keep-alive 连接复用）
+PRINTER_BACKEND = os.environ.get('PRINTER_BACKEND', 'lpstat').strip().lower()
+CUPS_SERVER = os.environ.get('CUPS_SERVER', 'localhost')  # 主机名，或 cupsd 的 unix socket 路径（如 /run/cups/cups.sock）
+CUPS_PORT = int(os.environ.get('CUPS_PORT', '631'))
+IPP_TIMEOUT = int(os.environ.get('IPP_TIMEOUT', '10'))
+# 后台刷新打印机状态的间隔秒数（0=关闭，在请求中按 5 秒 TTL 同步刷新）；CUPS 无响应时按指数退避，最长间隔见下
+PRINTER_REFRESH_INTERVAL = int(os.environ.get('PRINTER_REFRESH_INTERVAL', '10'))
+PRINTER_REFRESH_MAX_BACKOFF = int(os.environ.get('PRINTER_REFRESH_MAX_BACKOFF', '120'))
 
 # LibreOffice 转换
 SOFFICE_PATH = os.environ.get('SOFFICE_PATH', '')
 CONVERT_TIMEOUT = int(os.environ.get('CONVERT_TIMEOUT', '120'))
+# 并行转换通道数：每条通道独立 profile/输出目录（1=串行，与旧版一致；进程池模式下由池大小决定并发）
+CONVERT_CONCURRENCY = int(os.environ.get('CONVERT_CONCURRENCY', '1'))
+# 批量转换：在该时间窗口(毫秒)内到达的 Word 转换合并为一次 soffice 调用（0=关闭）
+CONVERT_BATCH_WINDOW_MS = int(os.environ.get('CONVERT_BATCH_WINDOW_MS', '0'))
+CONVERT_BATCH_MAX = int(os.environ.get('CONVERT_BATCH_MAX', '8'))
+# 打印部分页面时只导出所选页（需 LibreOffice 7.4+，低版本自动退回整份转换）
+CONVERT_EXPORT_PAGE_RANGE = os.environ.get('CONVERT_EXPORT_PAGE_RANGE', 'true').lower() == 'true'
+# Word→PDF 转换缓存：按输入内容 SHA-256 + 转换器版本命名，超出容量按 LRU 淘汰（0=关闭）
+CONVERT_CACHE_DIR = os.environ.get('CONVERT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'labprinter', 'cache', 'convert'))
+CONVERT_CACHE_MAX_MB = int(os.environ.get('CONVERT_CACHE_MAX_MB', '512'))
+# 常驻 LibreOffice 进程池：>0 时启动对应数量的 soffice 监听实例，转换分派给它们（0=每次冷启动）
+CONVERT_POOL_SIZE = int(os.environ.get('CONVERT_POOL_SIZE', '0'))
+CONVERT_POOL_BASE_PORT = int(os.environ.get('CONVERT_POOL_BASE_PORT', '0'))  # 0=自动选择空闲端口
+CONVERT_POOL_HEALTH_INTERVAL = int(os.environ.get('CONVERT_POOL_HEALTH_INTERVAL', '15'))
 
 # PDF 预处理（用于兼容复杂字体/文档，必要时可开启）
 # - none: 不处理（默认）
 # - gs-pdfwrite: 使用 Ghostscript 重写 PDF（尽量嵌入字体，保持矢量）
 # - gs-rasterize: 使用 Ghostscript 将每页栅格化后再生成 PDF（最兼容，但更慢/更大）
+# 指定页面范围时只预处理所选页（gs -sPageList）
 PDF_PREPROCESS = os.environ.get('PDF_PREPROCESS', 'Ghostscript').strip().lower()
 GS_COMMAND = os.environ.get('GS_COMMAND', 'gs')
 PDF_PREPROCESS_TIMEOUT = int(os.environ.get('PDF_PREPROCESS_TIMEOUT', '180'))
 PDF_RASTER_DPI = int(os.environ.get('PDF_RASTER_DPI', '200'))
+# gs-rasterize 并行：待处理页数超过 PDF_RASTER_CHUNK_PAGES 时按页分段，每段一个 gs 进程，
+# 整个进程同时最多 PDF_RASTER_WORKERS 个（1=单进程，0=按 CPU 核数，多份文档共用），结果按页码顺序合并
+PDF_RASTER_WORKERS = int(os.environ.get('PDF_RASTER_WORKERS', '1'))
+PDF_RASTER_CHUNK_PAGES = int(os.environ.get('PDF_RASTER_CHUNK_PAGES', '20'))
+# PDF 预处理结果缓存：按输入内容 SHA-256 + 模式 + DPI + 所选页 + gs 版本命名，超出容量按 LRU 淘汰（0=关闭）
+PREPROCESS_CACHE_DIR = os.environ.get('PREPROCESS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'labprinter', 'cache', 'preprocess'))
+PREPROCESS_CACHE_MAX_MB = int(os.environ.get('PREPROCESS_CACHE_MAX_MB', '1024'))
+
+# 外部工具(soffice/gs)卡死判定：进程组 CPU 时间与输出文件在该秒数内均无变化即整组终止（0=仅按超时）
+TOOL_STALL_TIMEOUT = int(os.environ.get('TOOL_STALL_TIMEOUT', '30'))
+# 转换工具（soffice / gs，含自定义 GS_COMMAND）资源限制（0=不限制）：TOOL_* 为默认值，SOFFICE_* / GS_* 按工具覆盖（0=沿用默认值）；lp/lpstat/cancel 不受限制
+# 内存按单进程虚拟内存(RLIMIT_AS)限制；配置 TOOL_CGROUP_ROOT 后改用 cgroup v2 memory.max（按实际占用计）
+TOOL_MEMORY_LIMIT_MB = int(os.environ.get('TOOL_MEMORY_LIMIT_MB', '0'))
+TOOL_CPU_LIMIT_SECONDS = int(os.environ.get('TOOL_CPU_LIMIT_SECONDS', '0'))
+SOFFICE_MEMORY_LIMIT_MB = int(os.environ.get('SOFFICE_MEMORY_LIMIT_MB', '0'))
+SOFFICE_CPU_LIMIT_SECONDS = int(os.environ.get('SOFFICE_CPU_LIMIT_SECONDS', '0'))
+GS_MEMORY_LIMIT_MB = int(os.environ.get('GS_MEMORY_LIMIT_MB', '0'))
+GS_CPU_LIMIT_SECONDS = int(os.environ.get('GS_CPU_LIMIT_SECONDS', '0'))
+TOOL_CGROUP_ROOT = os.environ.get('TOOL_CGROUP_ROOT', '')  # 服务可写的 cgroup v2 目录，如 systemd Delegate=yes 的子树
 
 # 任务配置
 MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', '3'))
+# 按打印机分通道排队：每台打印机同时占用的工作线程上限（0=自动：MAX_CONCURRENT_JOBS，其它打印机有任务排队时少一个，至少 1）
+PRINTER_LANE_CONCURRENCY = int(os.environ.get('PRINTER_LANE_CONCURRENCY', '0'))
+PRINTER_LANE_LIMITS = os.environ.get('PRINTER_LANE_LIMITS', '')  # 单独设置某些打印机，如 "Plotter=1,HP=2"
+# 打印机池：页面上选择池名，发送前自动挑选未完成工作量最小的可用成员，如 "Room101=HP1|HP2|HP3|HP4;Lab2=A|B"
+PRINTER_POOLS = os.environ.get('PRINTER_POOLS', '')
+POOL_PAGES_PER_JOB = int(os.environ.get('POOL_PAGES_PER_JOB', '10'))  # 估算池成员上非本服务提交作业的页数
+# 大任务拆分：页数×份数达到该值时按份数（多份）或页段（单份）拆到池中多台打印机并行打印（0=不拆分）
+POOL_SHARD_MIN_PAGES = int(os.environ.get('POOL_SHARD_MIN_PAGES', '100'))
+POOL_SHARD_MAX = int(os.environ.get('POOL_SHARD_MAX', '0'))  # 单个任务最多使用的打印机数（0=池内全部可用成员）
+# 按打印机熔断：打印机停用/离线或连续提交失败达到阈值时，发往它的任务暂停（不做转换），恢复后自动继续（0=关闭）
+PRINTER_BREAKER_THRESHOLD = int(os.environ.get('PRINTER_BREAKER_THRESHOLD', '3'))  # 连续提交失败熔断阈值（0=关闭）
+PRINTER_HOLD_OFFLINE = os.environ.get('PRINTER_HOLD_OFFLINE', 'true').lower() == 'true'  # 停用/离线打印机的任务暂停等待恢复
+PRINTER_BREAKER_COOLDOWN = int(os.environ.get('PRINTER_BREAKER_COOLDOWN', '60'))  # 熔断后每隔该秒数放行一个试探任务
+PRINTER_HOLD_SECONDS = int(os.environ.get('PRINTER_HOLD_SECONDS', '600'))  # 任务最多暂停的秒数，超过即判定失败（0=不暂停，立即失败）
+# 打印作业跟踪：提交后每隔该秒数批量查询一次 CUPS，直到作业完成/取消/中止（0=关闭，提交即视为完成）
+JOB_TRACK_INTERVAL = int(os.environ.get('JOB_TRACK_INTERVAL', '3'))
+JOB_TRACK_TIMEOUT = int(os.environ.get('JOB_TRACK_TIMEOUT', '1800'))  # 超过该秒数仍未完成则停止跟踪（0=不限制）
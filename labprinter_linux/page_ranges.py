@@ -0,0 +1,151 @@
+"""页面范围（区间表示）- Linux版本
+
+"1,3,5-7" 这类范围解析为按起始页排序、已合并的闭区间，复杂度只与范围段数有关：
+"1-2000000" 不会展开成两百万个页码。校验总页数、规范化、成员判断与计数都直接在区间上完成。
+Windows 版 app/printer.py 的 parse_page_range 按同样的区间方式单独实现，不引用本模块（两套代码相互隔离）。
+"""
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+MAX_LENGTH = 200
+
+_PART = re.compile(r'(\d+)(?:-(\d+))?')
+
+
+class PageRangeError(ValueError):
+    """页面范围格式错误或超出文档页数。"""
+
+
+def _merge(intervals: Iterable[Tuple[int, int]]) -> Tuple[Tuple[int, int], ...]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+class PageRanges:
+    """不可变的页码集合（1-based），以合并后的闭区间保存。"""
+
+    __slots__ = ('intervals', '_starts', '_offsets')
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = ()):
+        self.intervals = _merge(intervals)
+        self._starts = [start for start, _ in self.intervals]
+        # _offsets[i]：第 i 个区间之前的页数，用于按序号取页/切片
+        self._offsets = [0] + list(accumulate(end - start + 1 for start, end in self.intervals))
+
+    @classmethod
+    def parse(cls, text: Optional[str], total_pages: Optional[int] = None) -> 'PageRanges':
+        """解析页面范围；给出 total_pages 时校验越界。空字符串表示全部页（需给出 total_pages）。"""
+        text = (text or '').replace(' ', '')
+        if not text:
+            if total_pages is None:
+                return cls()
+            return cls.all(total_pages)
+        if len(text) > MAX_LENGTH:
+            raise PageRangeError('页面范围过长')
+        if total_pages is not None and total_pages < 1:
+            raise PageRangeError('PDF页数无效')
+
+        intervals = []
+        for part in text.split(','):
+            if not part:
+                continue
+            m = _PART.fullmatch(part)
+            if not m:
+                raise PageRangeError(f'页面范围格式错误: {part}')
+            start = int(m.group(1))
+            end = int(m.group(2)) if m.group(2) is not None else start
+            if start < 1:
+                raise PageRangeError('页码必须大于等于1')
+            if start > end:
+                raise PageRangeError(f'起始页不能大于结束页: {part}')
+            if total_pages is not None and end > total_pages:
+                raise PageRangeError(f'页码超出范围(1-{total_pages}): {part}')
+            intervals.append((start, end))
+        if not intervals:
+            raise PageRangeError('页面范围格式错误')
+        return cls(intervals)
+
+    @classmethod
+    def all(cls, total_pages: int) -> 'PageRanges':
+        if total_pages < 1:
+            raise PageRangeError('PDF页数无效')
+        return cls([(1, total_pages)])
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[int]) -> 'PageRanges':
+        return cls((p, p) for p in pages)
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __bool__(self) -> bool:
+        return bool(self.intervals)
+
+    def __contains__(self, page: int) -> bool:
+        i = bisect_right(self._starts, page) - 1
+        return i >= 0 and page <= self.intervals[i][1]
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self.intervals:
+            yield from range(start, end + 1)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, 'PageRanges']:
+        """按序号取第 index 个页码；切片（步长为 1）返回新的 PageRanges。"""
+        if isinstance(index, slice):
+            begin, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('PageRanges 切片不支持步长')
+            if begin >= stop:
+                return PageRanges()
+            first = bisect_right(self._offsets, begin) - 1
+            last = bisect_right(self._offsets, stop - 1) - 1
+            parts = []
+            for i in range(first, last + 1):
+                start, end = self.intervals[i]
+                parts.append((start + max(0, begin - self._offsets[i]),
+                              start + min(end - start, stop - 1 - self._offsets[i])))
+            return PageRanges(parts)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        i = bisect_right(self._offsets, index) - 1
+        return self.intervals[i][0] + index - self._offsets[i]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PageRanges) and self.intervals == other.intervals
+
+    def __hash__(self) -> int:
+        return hash(self.intervals)
+
+    def __str__(self) -> str:
+        return ','.join(f'{s}-{e}' if s != e else f'{s}' for s, e in self.intervals)
+
+    def __repr__(self) -> str:
+        return f'PageRanges({str(self)!r})'
+
+    @property
+    def first(self) -> Optional[int]:
+        return self.intervals[0][0] if self.intervals else None
+
+    @property
+    def last(self) -> Optional[int]:
+        return self.intervals[-1][1] if self.intervals else None
+
+
+def normalize(text: Optional[str], total_pages: Optional[int] = None) -> str:
+    """规范化页面范围字符串（排序、合并重叠/相邻区间）。"""
+    return str(PageRanges.parse(text, total_pages))
+
+
+def count(text: Optional[str], total_pages: Optional[int] = None) -> int:
+    """页面范围内不重复的页数；空范围在给出 total_pages 时为全部页。"""
+    return len(PageRanges.parse(text, total_pages))
@@ -0,0 +1,82 @@
+"""冷启动 vs 常驻进程池 转换耗时对比
+
+用法：
+    python labprinter_linux/tests/bench_office_pool.py              # 本地替身监听进程（模拟启动开销）
+    python labprinter_linux/tests/bench_office_pool.py 文件.docx    # 真实 LibreOffice
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from labprinter_linux.app.office_pool import OfficePool  # noqa: E402
+
+ROUNDS = 5
+STARTUP_DELAY = 1.5  # 替身模拟的 soffice 冷启动耗时（秒）
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_stand_in(work_dir: str):
+    from test_office_pool import stand_in_dispatcher, stand_in_launcher
+
+    src = os.path.join(work_dir, 'doc.docx')
+    with open(src, 'wb') as f:
+        f.write(b'docx')
+
+    def make_pool(root):
+        return OfficePool(1, root_dir=root, launcher=stand_in_launcher(STARTUP_DELAY),
+                          dispatcher=stand_in_dispatcher, health_interval=0)
+
+    def cold():
+        for i in range(ROUNDS):
+            pool = make_pool(os.path.join(work_dir, f'cold-{i}'))
+            pool.start()
+            pool.convert(src, work_dir, timeout=30)
+            pool.shutdown()
+
+    pool = make_pool(os.path.join(work_dir, 'pooled'))
+    pool.start()  # 服务启动时完成，不计入单次转换
+    try:
+        pooled = _timed(lambda: [pool.convert(src, work_dir, timeout=30) for _ in range(ROUNDS)])
+    finally:
+        pool.shutdown()
+    return _timed(cold), pooled
+
+
+def bench_real(src: str, work_dir: str):
+    from labprinter_linux import config
+    from labprinter_linux.app import converter
+
+    config.CONVERT_POOL_SIZE = 0
+    cold = _timed(lambda: [converter.convert_to_pdf(src) for _ in range(ROUNDS)])
+
+    pool = OfficePool(1, root_dir=os.path.join(work_dir, 'pooled'), health_interval=0)
+    pool.start()
+    try:
+        pooled = _timed(lambda: [pool.convert(os.path.abspath(src), work_dir, timeout=120) for _ in range(ROUNDS)])
+    finally:
+        pool.shutdown()
+    return cold, pooled
+
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        if len(sys.argv) > 1:
+            cold, pooled = bench_real(sys.argv[1], work_dir)
+        else:
+            cold, pooled = bench_stand_in(work_dir)
+    print(f'冷启动: {ROUNDS} 次共 {cold:.2f}s ({cold / ROUNDS:.3f}s/次)')
+    print(f'进程池: {ROUNDS} 次共 {pooled:.2f}s ({pooled / ROUNDS:.3f}s/次)')
+    print(f'加速比: {cold / max(pooled, 1e-9):.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""PDF 页数统计：快速路径 vs pypdf 全量解析 耗时/内存对比
+
+用法：
+    python labprinter_linux/tests/bench_pdf_pages.py                # 生成的语料（大文件 + 增量更新）
+    python labprinter_linux/tests/bench_pdf_pages.py a.pdf b.pdf    # 指定真实文件
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from labprinter_linux.app import pdf_pages  # noqa: E402
+
+ROUNDS = 3
+
+CORPUS = {
+    'scan-50MB-200p': dict(pages=200, filler_bytes=50 * 1024 * 1024),
+    'classic-5000p': dict(pages=5000),
+    'objstm-5000p': dict(pages=5000, xref_stream=True, object_streams=True),
+    'updates-20x-classic': dict(pages=100, updates=(10,) * 20),
+    'updates-20x-xrefstm': dict(pages=100, xref_stream=True, object_streams=True, updates=(10,) * 20),
+}
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_file(label: str, path: str):
+    from pypdf import PdfReader
+
+    def fast():
+        pdf_pages.clear_cache()  # 每轮都走解析路径，不计缓存命中
+        return pdf_pages.count_pages(path)
+
+    fast_pages, fast_time, fast_peak = _measure(fast)
+    slow_pages, slow_time, slow_peak = _measure(lambda: len(PdfReader(path).pages))
+    _, cached_time, _ = _measure(lambda: pdf_pages.count_pages(path))
+    mark = '' if fast_pages == slow_pages else '  !! 页数不一致'
+    print(f'{label:24s} {os.path.getsize(path) / 1e6:8.1f}MB  pages={fast_pages:<6d} '
+          f'fast {fast_time * 1000:8.1f}ms/{fast_peak / 1e6:6.1f}MB  '
+          f'pypdf {slow_time * 1000:8.1f}ms/{slow_peak / 1e6:6.1f}MB  '
+          f'cached {cached_time * 1e6:6.1f}us{mark}')
+
+
+def main(paths):
+    if paths:
+        for path in paths:
+            bench_file(os.path.basename(path), path)
+        return
+
+    from conftest import make_pdf
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for label, spec in CORPUS.items():
+            path = os.path.join(work_dir, f'{label}.pdf')
+            with open(path, 'wb') as f:
+                f.write(make_pdf(**spec))
+            bench_file(label, path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,438 @@
+import io
+import stat
+import subprocess
+import threading
+import time
+import zlib
+
+import pytest
+
+# 替身 soffice：解析 --outdir 与输入文件，记录使用的 profile，为每个输入写出 <stem>.pdf
+# 内容为 BAD 的输入不产出（与 LibreOffice 跳过无法加载的文件一致），CRASH 让整个进程异常退出
+FAKE_SOFFICE = """#!/usr/bin/env python3
+import os, sys, time
+from urllib.parse import unquote, urlparse
+args = sys.argv[1:]
+if '--version' in args:
+    print('LibreOffice 7.3.7.2 fake')
+    sys.exit(0)
+profile = [a for a in args if a.startswith('-env:UserInstallation=')][0]
+profile_dir = unquote(urlparse(profile.split('=', 1)[1]).path)
+if '--terminate_after_init' in args:
+    os.makedirs(os.path.join(profile_dir, 'user'), exist_ok=True)
+    with open(os.path.join(profile_dir, 'user', 'registrymodifications.xcu'), 'w') as f:
+        f.write('seeded')
+    with open(os.environ['FAKE_SOFFICE_LOG'], 'a') as f:
+        f.write('init\\n')
+    sys.exit(0)
+out_dir = args[args.index('--outdir') + 1]
+seeded = os.path.exists(os.path.join(profile_dir, 'user', 'registrymodifications.xcu'))
+with open(os.environ['FAKE_SOFFICE_LOG'], 'a') as f:
+    f.write(profile + (' seeded' if seeded else '') + '\\n')
+active_dir = os.environ.get('FAKE_SOFFICE_ACTIVE')
+if active_dir:
+    # 记录与本进程同时在转换的 soffice 数量（<pid>.seen），用于断言并行
+    marker = os.path.join(active_dir, f'{os.getpid()}.run')
+    open(marker, 'w').close()
+time.sleep(float(os.environ.get('FAKE_SOFFICE_DELAY', '0')))
+if active_dir:
+    running = len([n for n in os.listdir(active_dir) if n.endswith('.run')])
+    with open(os.path.join(active_dir, f'{os.getpid()}.seen'), 'w') as f:
+        f.write(str(running))
+    os.remove(marker)
+for src in args[args.index('--outdir') + 2:]:
+    data = open(src, 'rb').read()
+    if data == b'CRASH':
+        sys.exit(134)
+    if data == b'BAD':
+        print('Error: source file could not be loaded', file=sys.stderr)
+        continue
+    stem = os.path.splitext(os.path.basename(src))[0]
+    with open(os.path.join(out_dir, stem + '.pdf'), 'wb') as f:
+        f.write(b'%PDF-1.4 ' + data)
+"""
+
+
+@pytest.fixture(autouse=True)
+def _print_log_in_tmp(tmp_path, monkeypatch):
+    """打印日志写到临时目录，测试不修改仓库里的 logs/。"""
+    import logging
+    from labprinter_linux.app import logger as logger_mod
+
+    handler = logging.FileHandler(str(tmp_path / 'print.log'), encoding='utf-8', delay=True)
+    handler.setFormatter(logger_mod.file_handler.formatter)
+    monkeypatch.setattr(logger_mod.print_logger, 'handlers', [handler])
+    yield
+    handler.close()
+
+
+@pytest.fixture
+def fake_soffice(tmp_path, monkeypatch):
+    """用替身脚本代替 LibreOffice；返回记录每次调用（profile 初始化/转换所用 profile）的日志文件。"""
+    import labprinter_linux.app.converter as converter_mod
+
+    script = tmp_path / 'soffice'
+    script.write_text(FAKE_SOFFICE)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    log = tmp_path / 'soffice.log'
+    log.write_text('')
+    monkeypatch.setenv('FAKE_SOFFICE_LOG', str(log))
+    monkeypatch.setattr(converter_mod.config, 'SOFFICE_PATH', str(script))
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_POOL_SIZE', 0)
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_CACHE_MAX_MB', 0)
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_CACHE_DIR', str(tmp_path / 'convert-cache'))
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_BATCH_WINDOW_MS', 0)
+    monkeypatch.setattr(converter_mod, '_CONVERT_LANES', None)
+    monkeypatch.setattr(converter_mod, '_CONVERT_BATCHER', None)
+    monkeypatch.setattr(converter_mod, '_CONVERT_CACHE', None)
+    monkeypatch.setattr(converter_mod, '_CONVERTER_VERSION', None)
+    monkeypatch.setattr(converter_mod, '_PROFILE_TEMPLATE', '')  # 默认不构建模板
+    monkeypatch.setattr(converter_mod, '_PROFILE_TEMPLATE_RETRY_AT', 0.0)
+    monkeypatch.setattr(converter_mod, '_work_root', lambda: str(tmp_path / 'work'))
+    return log
+
+
+class FakeCups:
+    """替身 cupsd：在本机端口上按 IPP/1.1 应答，记录收到的请求与建立的连接数。"""
+
+    def __init__(self):
+        self.printers = []  # 每台打印机一个属性列表 [(值类型, 名称, 值)]
+        self.default = None
+        self.jobs = []
+        self.requests = []  # (操作码, 操作属性字典, 文档数据)
+        self.job_attributes = []  # 每个 Print-Job 请求的 job 组属性
+        self.cancelled = []  # Cancel-Job 的 job-uri
+        self.print_status = 0x0000
+        self.next_job_id = 100
+        self.connections = 0
+        self.paths = []  # 每个请求的 HTTP 路径
+        self.drop_responses = 0  # 接下来这么多个请求读完后不应答、直接断开
+        self.server = None
+
+    def handle(self, message, data):
+        from labprinter_linux.app import ipp
+
+        op = message.code
+        if op == ipp.CUPS_GET_PRINTERS:
+            if not self.printers:
+                return ipp.STATUS_NOT_FOUND, []
+            return ipp.STATUS_OK, [(ipp.TAG_PRINTER, attrs) for attrs in self.printers]
+        if op == ipp.CUPS_GET_DEFAULT:
+            if self.default is None:
+                return ipp.STATUS_NOT_FOUND, []
+            return ipp.STATUS_OK, [(ipp.TAG_PRINTER, [(ipp.TAG_NAME, 'printer-name', self.default)])]
+        if op == ipp.GET_JOBS:
+            which = (message.group(ipp.TAG_OPERATION).get('which-jobs') or ['not-completed'])[0]
+
+            def finished(attrs):
+                return any(name == 'job-state' and value >= 7 for _, name, value in attrs)
+
+            jobs = [attrs for attrs in self.jobs if finished(attrs) == (which == 'completed')]
+            return ipp.STATUS_OK, [(ipp.TAG_JOB, attrs) for attrs in jobs]
+        if op == ipp.PRINT_JOB:
+            self.job_attributes.append({k: v[0] if len(v) == 1 else v for k, v in message.group(ipp.TAG_JOB).items()})
+            if self.print_status != ipp.STATUS_OK:
+                return self.print_status, []
+            self.next_job_id += 1
+            return ipp.STATUS_OK, [(ipp.TAG_JOB, [
+                (ipp.TAG_INTEGER, 'job-id', self.next_job_id),
+                (ipp.TAG_ENUM, 'job-state', 3),
+            ])]
+        if op == ipp.CANCEL_JOB:
+            self.cancelled.append(message.group(ipp.TAG_OPERATION)['job-uri'][0])
+            return ipp.STATUS_OK, []
+        return 0x0501, []  # server-error-operation-not-supported
+
+
+@pytest.fixture
+def fake_cups(monkeypatch):
+    """启动替身 cupsd 并把 IPP 后端指向它；返回 FakeCups 以便设置打印机/作业并检查请求。"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from labprinter_linux.app import ipp
+    import labprinter_linux.app.printer as printer_mod
+
+    cups = FakeCups()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            cups.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                body = bytearray()
+                while True:
+                    size = int(self.rfile.readline().strip(), 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        break
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+                body = bytes(body)
+            else:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            message = ipp.decode_message(body)
+            operation = {k: v[0] if len(v) == 1 else v for k, v in message.group(ipp.TAG_OPERATION).items()}
+            cups.requests.append((message.code, operation, message.data))
+            cups.paths.append(self.path)
+            if cups.drop_responses:
+                cups.drop_responses -= 1
+                self.close_connection = True
+                return
+            status, groups = cups.handle(message, message.data)
+            payload = ipp.encode_message(status, message.request_id, [
+                (ipp.TAG_OPERATION, [
+                    (ipp.TAG_CHARSET, 'attributes-charset', 'utf-8'),
+                    (ipp.TAG_LANGUAGE, 'attributes-natural-language', 'en'),
+                ]),
+                *groups,
+            ])
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/ipp')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cups.server = server
+
+    monkeypatch.setattr(printer_mod.config, 'PRINTER_BACKEND', 'ipp')
+    monkeypatch.setattr(ipp, '_client', ipp.IppClient('127.0.0.1', server.server_address[1], timeout=5))
+    printer_mod._SNAPSHOT_CACHE.invalidate()
+    yield cups
+    ipp._client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def _xref_stream(num, entries, *, size, prev=None, root=1, predictor=True):
+    """生成 xref 流对象；entries 为 {对象号: (类型, 字段2, 字段3)}，按 W [1 4 2] 编码。"""
+    numbers = sorted(entries)
+    index = []
+    for n in numbers:
+        if index and index[-2] + index[-1] == n:
+            index[-1] += 1
+        else:
+            index += [n, 1]
+    rows = b''.join(
+        entries[n][0].to_bytes(1, 'big') + entries[n][1].to_bytes(4, 'big') + entries[n][2].to_bytes(2, 'big')
+        for n in numbers
+    )
+    params = ''
+    if predictor:
+        # PNG Up 预测：每行前加过滤类型字节，数据为与上一行的差
+        out, prev_row = b'', bytes(7)
+        for i in range(0, len(rows), 7):
+            row = rows[i:i + 7]
+            out += b'\x02' + bytes((a - b) & 0xff for a, b in zip(row, prev_row))
+            prev_row = row
+        rows = out
+        params = ' /DecodeParms << /Columns 7 /Predictor 12 >>'
+    data = zlib.compress(rows)
+    head = (f'<< /Type /XRef /Size {size} /W [1 4 2] /Index [{" ".join(map(str, index))}] /Root {root} 0 R'
+            f'{" /Prev %d" % prev if prev is not None else ""} /Filter /FlateDecode{params} /Length {len(data)} >>')
+    return f'{num} 0 obj\n{head}\nstream\n'.encode() + data + b'\nendstream\nendobj\n'
+
+
+def make_pdf(pages, *, xref_stream=False, object_streams=False, filler_bytes=0, updates=(), deep_tree=False):
+    """生成测试用 PDF。updates 为每次增量更新追加的页数；filler_bytes 为每页内容流大小（模拟扫描件）。"""
+    out = io.BytesIO()
+    out.write(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    compressed = {}  # 对象号 -> 序号（在对象流 objstm_num 中）
+
+    def write_obj(num, body):
+        offsets[num] = out.tell()
+        out.write(f'{num} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    filler_num = 3
+    filler = bytes((i * 7) & 0xff for i in range(filler_bytes))
+    write_obj(filler_num, f'<< /Length {len(filler)} >>\nstream\n'.encode() + filler + b'\nendstream')
+
+    page_nums = list(range(10, 10 + pages))
+    dicts = {1: b'<< /Type /Catalog /Pages 2 0 R >>'}
+    for n in page_nums:
+        dicts[n] = f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {filler_num} 0 R >>'.encode()
+    kids = ' '.join(f'{n} 0 R' for n in page_nums)
+    if deep_tree:
+        dicts[2] = f'<< /Type /Pages /Kids [{kids}] /Count 4 0 R >>'.encode()
+        dicts[4] = str(pages).encode()
+    else:
+        dicts[2] = f'<< /Type /Pages /Kids [{kids}] /Count {pages} >>'.encode()
+
+    next_num = 10 + pages
+    if object_streams:
+        objstm_num = next_num
+        next_num += 1
+        header, body = [], b''
+        for i, (n, d) in enumerate(sorted(dicts.items())):
+            header.append(f'{n} {len(body)}')
+            compressed[n] = i
+            body += d + b'\n'
+        header = ' '.join(header).encode() + b'\n'
+        data = zlib.compress(header + body)
+        write_obj(objstm_num, f'<< /Type /ObjStm /N {len(dicts)} /First {len(header)} /Filter /FlateDecode /Length {len(data)} >>\nstream\n'.encode() + data + b'\nendstream')
+    else:
+        for n, d in sorted(dicts.items()):
+            write_obj(n, d)
+
+    def write_xref(prev, size, new_nums):
+        start = out.tell()
+        if xref_stream:
+            xref_num = size
+            entries = {n: (1, offsets[n], 0) for n in new_nums if n in offsets}
+            for n in new_nums:
+                if n in compressed:
+                    entries[n] = (2, objstm_num, compressed[n])
+            entries[xref_num] = (1, start, 0)
+            if prev is None:
+                entries[0] = (0, 0, 0xffff)
+            out.write(_xref_stream(xref_num, entries, size=xref_num + 1, prev=prev))
+            size = xref_num + 1
+        else:
+            out.write(b'xref\n')
+            nums = sorted(new_nums | ({0} if prev is None else set()))
+            groups = []
+            for n in nums:
+                if groups and groups[-1][-1] + 1 == n:
+                    groups[-1].append(n)
+                else:
+                    groups.append([n])
+            for group in groups:
+                out.write(f'{group[0]} {len(group)}\n'.encode())
+                for n in group:
+                    if n == 0:
+                        out.write(b'0000000000 65535 f \n')
+                    else:
+                        out.write(f'{offsets[n]:010d} 00000 n \n'.encode())
+            prev_part = f' /Prev {prev}' if prev is not None else ''
+            out.write(f'trailer\n<< /Size {size} /Root 1 0 R{prev_part} >>\n'.encode())
+        out.write(f'startxref\n{start}\n%%EOF\n'.encode())
+        return start, size
+
+    all_nums = set(offsets) | set(compressed)
+    prev, size = write_xref(None, next_num, all_nums)
+
+    total = pages
+    for added in updates:
+        # 增量更新：追加新页面并重写页树根（同一对象号 2 的新版本）
+        new_pages = list(range(size, size + added))
+        for n in new_pages:
+            write_obj(n, f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {filler_num} 0 R >>'.encode())
+        page_nums += new_pages
+        total += added
+        kids = ' '.join(f'{n} 0 R' for n in page_nums)
+        write_obj(2, f'<< /Type /Pages /Kids [{kids}] /Count {total} >>'.encode())
+        compressed.pop(2, None)
+        prev, size = write_xref(prev, size + added, set(new_pages) | {2})
+    return out.getvalue()
+
+
+class FakeGs:
+    """替身 Ghostscript（替换 printer._run_cmd）：按 -sPageList 输出对应页，页宽等于原页码，便于检查顺序；
+    多个输入文件时按顺序合并（分块栅格化的最后一步）。其它命令视为 lp，记录后返回作业号。"""
+
+    def __init__(self, path, work_dir):
+        self.path = path
+        self.work_dir = work_dir
+        self.cmds = []  # gs 调用（不含 --version 探测）
+        self.lp = []
+        self.threads = set()
+        self.version = '10.02.1'
+        self.delay = 0.0
+        self.fail_page = None  # 处理到该页时 gs 失败
+        self.ignore_page_list = False  # 模拟不认识 -sPageList 的旧版 gs
+        self.active = 0
+        self.max_active = 0  # 同时运行的 gs 进程数峰值
+        self._lock = threading.Lock()
+
+    @property
+    def runs(self):
+        return len(self.cmds)
+
+    def source(self, pages):
+        """在临时目录生成一份 pages 页的源 PDF，返回路径。"""
+        path = self.work_dir / f'source-{pages}.pdf'
+        path.write_bytes(make_pdf(pages=pages))
+        return str(path)
+
+    def run_cmd(self, cmd, timeout, *, progress_paths=(), role=None):
+        if cmd[0] != self.path:
+            self.lp.append(cmd)
+            return subprocess.CompletedProcess(cmd, 0, 'request id is HP-7 (1 file(s))\n', '')
+        if cmd[1:] == ['--version']:
+            return subprocess.CompletedProcess(cmd, 0, self.version + '\n', '')
+        with self._lock:
+            self.cmds.append(cmd)
+            self.threads.add(threading.current_thread().name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            return self._run_gs(cmd)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _run_gs(self, cmd):
+        from pypdf import PdfWriter
+
+        from labprinter_linux.app import pdf_pages
+        from labprinter_linux.page_ranges import PageRanges
+
+        time.sleep(self.delay)
+        out = next(a.split('=', 1)[1] for a in cmd if a.startswith('-sOutputFile='))
+        inputs = [a for a in cmd[1:] if not a.startswith('-')]
+        writer = PdfWriter()
+        if len(inputs) > 1:
+            for part in inputs:
+                writer.append(part)
+        else:
+            page_list = next((a.split('=', 1)[1] for a in cmd if a.startswith('-sPageList=')), None)
+            total = pdf_pages.count_pages(inputs[0])
+            if page_list and not self.ignore_page_list:
+                pages = PageRanges.parse(page_list, total)
+            else:
+                pages = PageRanges.all(total)
+            if self.fail_page is not None and self.fail_page in pages:
+                return subprocess.CompletedProcess(cmd, 1, '', 'gs crashed')
+            for page in pages:
+                writer.add_blank_page(width=page, height=100)
+        with open(out, 'wb') as f:
+            writer.write(f)
+        return subprocess.CompletedProcess(cmd, 0, '', '')
+
+
+@pytest.fixture
+def fake_gs(monkeypatch, tmp_path):
+    """用 FakeGs 代替 gs/lp：gs-rasterize 预处理、单进程、预处理缓存关闭（测试可再调整这些配置）。"""
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import gs_raster, pdf_pages
+
+    gs = tmp_path / 'gs'
+    gs.write_text('')
+    monkeypatch.setattr(printer_mod.config, 'GS_COMMAND', str(gs))
+    monkeypatch.setattr(printer_mod.config, 'PDF_PREPROCESS', 'gs-rasterize')
+    monkeypatch.setattr(printer_mod.config, 'PDF_RASTER_WORKERS', 1)
+    monkeypatch.setattr(printer_mod.config, 'PREPROCESS_CACHE_MAX_MB', 0)
+    monkeypatch.setattr(printer_mod.config, 'PREPROCESS_CACHE_DIR', str(tmp_path / 'preprocess-cache'))
+    monkeypatch.setattr(printer_mod, '_PREPROCESS_CACHE', None)
+    monkeypatch.setattr(printer_mod, '_GS_VERSION', None)
+    monkeypatch.setattr(gs_raster, '_SLOTS', None)
+    monkeypatch.setattr(printer_mod.config, 'DEFAULT_PRINTER', 'HP')
+    monkeypatch.setattr(printer_mod.config, 'ALLOWED_PRINTERS', None)
+    monkeypatch.setattr(printer_mod.config, 'PRINTER_BACKEND', 'lpstat')
+    pdf_pages.clear_cache()
+
+    fake = FakeGs(str(gs), tmp_path)
+    monkeypatch.setattr(printer_mod, '_run_cmd', fake.run_cmd)
+    yield fake
+    pdf_pages.clear_cache()
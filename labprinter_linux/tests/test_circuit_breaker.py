@@ -0,0 +1,179 @@
+import pytest
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import circuit_breaker as breaker_mod
+
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_BREAKER_THRESHOLD', 2)
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_BREAKER_COOLDOWN', 60)
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_HOLD_SECONDS', 600)
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_HOLD_OFFLINE', True)
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_POOLS', '')
+    monkeypatch.setattr(breaker_mod.config, 'DEFAULT_PRINTER', None)
+    monkeypatch.setattr(breaker_mod.config, 'MAX_CONCURRENT_JOBS', 3)
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_LANE_CONCURRENCY', 0)
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_LANE_LIMITS', '')
+    printers = {}
+
+    def peek():
+        return printer_mod.PrinterSnapshot(tuple(
+            printer_mod.PrinterState(name, status, '') for name, status in printers.items()
+        ), None, breaker_mod.time.monotonic())
+
+    monkeypatch.setattr(printer_mod, 'peek_printer_snapshot', peek)
+    instance = breaker_mod.CircuitBreaker()
+    monkeypatch.setattr(breaker_mod, 'circuit_breaker', instance)
+    return instance, printers
+
+
+def test_offline_printer_holds_tasks_until_it_recovers(breaker):
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    instance, printers = breaker
+    printers.update({'HP': 'offline', 'Canon': 'ready'})
+    queue = TaskQueue()
+    held = queue.submit('/tmp/a.pdf', {'printer': 'HP'})
+    other = queue.submit('/tmp/b.pdf', {'printer': 'Canon'})
+
+    assert queue.get_next(timeout=0) == other
+    assert queue.get_next(timeout=0) is None
+    task = queue.get_task(held)
+    assert task.state == TaskState.HELD
+    assert '已停用/离线' in task.message
+    assert queue.lane_stats()['HP']['held'] == 1
+
+    printers['HP'] = 'ready'
+    assert queue.get_next(timeout=0) == held
+
+
+def test_offline_hold_and_failure_threshold_are_gated_separately(breaker, monkeypatch):
+    from labprinter_linux.app import circuit_breaker as breaker_mod
+
+    instance, printers = breaker
+    printers['HP'] = 'offline'
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_BREAKER_THRESHOLD', 0)
+    assert '已停用/离线' in instance.reason('HP')
+
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_HOLD_OFFLINE', False)
+    assert instance.reason('HP') is None
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_BREAKER_THRESHOLD', 1)
+    instance.record_failure('HP', 'lp: Unable to connect')
+    assert '连续 1 次提交失败' in instance.reason('HP')
+
+
+def test_recovering_pool_member_gets_one_trial_task(breaker, monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import circuit_breaker as breaker_mod
+    from labprinter_linux.app.pool_router import PoolRouter
+    from labprinter_linux.app.task_queue import TaskQueue
+
+    instance, printers = breaker
+    printers.update({'HP1': 'ready', 'HP2': 'ready'})
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_POOLS', 'Room101=HP1|HP2')
+    monkeypatch.setattr(printer_mod, 'get_printer_snapshot', printer_mod.peek_printer_snapshot)
+    now = [1000.0]
+    monkeypatch.setattr(breaker_mod.time, 'monotonic', lambda: now[0])
+    for _ in range(2):
+        instance.record_failure('HP1', 'lp: Unable to connect')
+    router = PoolRouter()
+    router.choose('Room101', 'busy', 50)  # HP2 已有在途工作，空闲的 HP1 负载更低
+    now[0] += 61
+
+    # 半开的 HP1 只接一个试探任务，其余积压仍发往 HP2
+    assert [router.choose('Room101', f't{i}', 10) for i in range(3)] == ['HP1', 'HP2', 'HP2']
+    assert instance.stats()['trials'] == 1
+
+    # 池中只剩正在恢复的成员时：试探名额占用后通道关闭，不会把积压都放出去
+    monkeypatch.setattr(breaker_mod.config, 'PRINTER_POOLS', 'Solo=HP1')
+    assert not TaskQueue._lane_open('Solo')
+    now[0] += 61
+    assert TaskQueue._lane_open('Solo')
+    assert instance.stats()['trials'] == 1  # 判断通道是否放行不占用试探名额
+
+
+def test_held_task_expires_and_fails_fast(breaker, monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    instance, printers = breaker
+    printers['HP'] = 'offline'
+    monkeypatch.setattr(worker_mod, 'circuit_breaker', instance)
+    monkeypatch.setattr(worker_mod, 'convert_to_pdf', lambda *a, **k: pytest.fail('held task must not be converted'))
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    queue = TaskQueue()
+    doc = tmp_path / 'a.docx'
+    doc.write_bytes(b'docx')
+    task_id = queue.submit(str(doc), {'printer': 'HP'})
+
+    assert queue.get_next(timeout=0) is None
+    monkeypatch.setattr(worker_mod.config, 'PRINTER_HOLD_SECONDS', 0)
+    assert queue.get_next(timeout=0) == task_id
+
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(doc), {'printer': 'HP'}, 'a.docx')
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.FAILURE
+    assert '已停用/离线' in task.message
+    assert not doc.exists()
+
+
+def test_submit_failures_open_circuit_then_allow_one_trial(breaker, monkeypatch):
+    from labprinter_linux.app import circuit_breaker as breaker_mod
+
+    instance, printers = breaker
+    printers['HP'] = 'ready'
+    now = [1000.0]
+    monkeypatch.setattr(breaker_mod.time, 'monotonic', lambda: now[0])
+
+    instance.record_failure('HP', 'lp: Unable to connect')
+    assert instance.acquire('HP')
+    instance.record_failure('HP', 'lp: Unable to connect')
+    assert instance.blocked('HP')
+    assert not instance.acquire('HP')
+    assert 'HP' in instance.stats()['open']
+
+    now[0] += 61  # 冷却期过后半开：只放行一个试探任务
+    assert instance.acquire('HP')
+    assert not instance.acquire('HP')
+    instance.record_success('HP')
+    assert instance.acquire('HP') and instance.acquire('HP')
+    assert instance.stats()['recovered'] == 1
+
+
+def test_only_printer_side_errors_trip_the_breaker():
+    from labprinter_linux.app.circuit_breaker import is_printer_failure
+    from labprinter_linux.app.ipp import IppError
+    from labprinter_linux.app.printer import PrintSubmitError
+
+    assert is_printer_failure(PrintSubmitError('lp: printer not accepting jobs'))
+    assert is_printer_failure(IppError('connection refused'))
+    assert is_printer_failure(IppError('not accepting', 0x0506))
+    assert not is_printer_failure(IppError('bad format', 0x040A))
+    assert not is_printer_failure(RuntimeError('页码超出范围'))
+
+
+def test_worker_records_submit_outcome(breaker, monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.printer import PrintSubmitError
+    from labprinter_linux.app.task_queue import TaskQueue
+
+    instance, printers = breaker
+    printers['HP'] = 'ready'
+    monkeypatch.setattr(worker_mod, 'circuit_breaker', instance)
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda q: None)
+
+    def failing_print(path, options):
+        raise PrintSubmitError('lp: Unable to connect to printer')
+
+    monkeypatch.setattr(worker_mod, 'print_file', failing_print)
+    queue = TaskQueue()
+    for i in range(2):
+        pdf = tmp_path / f'{i}.pdf'
+        pdf.write_bytes(b'%PDF-1.4')
+        task_id = queue.submit(str(pdf), {'printer': 'HP'})
+        worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), {'printer': 'HP'}, f'{i}.pdf')
+
+    assert instance.blocked('HP')
+    assert 'Unable to connect' in instance.reason('HP')
@@ -0,0 +1,94 @@
+import os
+import threading
+
+import pytest
+
+
+def _convert_all(paths):
+    from labprinter_linux.app.converter import convert_to_pdf
+
+    results = {}
+
+    def run(path):
+        try:
+            results[path] = convert_to_pdf(path)
+        except Exception as e:
+            results[path] = e
+
+    threads = [threading.Thread(target=run, args=(p,)) for p in paths]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@pytest.fixture
+def batching(fake_soffice, monkeypatch):
+    import labprinter_linux.app.converter as converter_mod
+
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_BATCH_WINDOW_MS', 300)
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_BATCH_MAX', 8)
+    return fake_soffice
+
+
+def _conversions(log):
+    return [line for line in log.read_text().splitlines() if line != 'init']
+
+
+def test_burst_is_converted_in_one_invocation(batching, tmp_path):
+    paths = []
+    for i in range(4):
+        p = tmp_path / f'student{i}.docx'
+        p.write_bytes(f'doc{i}'.encode())
+        paths.append(str(p))
+
+    results = _convert_all(paths)
+
+    assert len(_conversions(batching)) == 1
+    for i, path in enumerate(paths):
+        assert open(results[path], 'rb').read() == f'%PDF-1.4 doc{i}'.encode()
+        os.remove(results[path])
+
+
+def test_bad_file_fails_only_its_own_request(batching, tmp_path):
+    good = tmp_path / 'good.docx'
+    bad = tmp_path / 'bad.docx'
+    good.write_bytes(b'fine')
+    bad.write_bytes(b'BAD')
+
+    results = _convert_all([str(good), str(bad)])
+
+    assert isinstance(results[str(bad)], RuntimeError)
+    assert open(results[str(good)], 'rb').read() == b'%PDF-1.4 fine'
+    os.remove(results[str(good)])
+
+
+def test_crashed_batch_retries_documents_individually(batching, tmp_path):
+    crash = tmp_path / 'a-crash.docx'
+    other = tmp_path / 'b-other.docx'
+    crash.write_bytes(b'CRASH')
+    other.write_bytes(b'ok')
+
+    results = _convert_all([str(crash), str(other)])
+
+    assert isinstance(results[str(crash)], RuntimeError)
+    assert open(results[str(other)], 'rb').read() == b'%PDF-1.4 ok'
+    os.remove(results[str(other)])
+
+
+def test_duplicate_stems_are_split_across_invocations(batching, tmp_path):
+    (tmp_path / 'x').mkdir()
+    (tmp_path / 'y').mkdir()
+    first = tmp_path / 'x' / 'same.docx'
+    second = tmp_path / 'y' / 'same.docx'
+    first.write_bytes(b'one')
+    second.write_bytes(b'two')
+
+    results = _convert_all([str(first), str(second)])
+
+    assert open(results[str(first)], 'rb').read() == b'%PDF-1.4 one'
+    assert open(results[str(second)], 'rb').read() == b'%PDF-1.4 two'
+    assert len(_conversions(batching)) == 2
+    for path in results.values():
+        os.remove(path)
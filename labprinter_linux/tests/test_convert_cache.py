@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+import pytest
+
+
+def test_repeat_conversion_hits_cache(fake_soffice, tmp_path, monkeypatch):
+    import labprinter_linux.app.converter as converter_mod
+
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_CACHE_MAX_MB', 16)
+    src = tmp_path / 'handout.docx'
+    src.write_bytes(b'same handout')
+
+    out1 = converter_mod.convert_to_pdf(str(src))
+    os.remove(out1)  # 调用方打印后删除自己的副本，不影响缓存
+    out2 = converter_mod.convert_to_pdf(str(src))
+
+    assert open(out2, 'rb').read() == b'%PDF-1.4 same handout'
+    os.remove(out2)
+    assert len(fake_soffice.read_text().splitlines()) == 1
+    stats = converter_mod.get_convert_cache().stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['entries'] == 1
+
+
+def test_concurrent_identical_requests_are_single_flighted(tmp_path):
+    from labprinter_linux.app.file_cache import FileCache
+
+    cache = FileCache(str(tmp_path / 'cache'), 1024 * 1024)
+    calls = []
+
+    def producer():
+        calls.append(1)
+        time.sleep(0.2)
+        path = tmp_path / f'produced-{len(calls)}.pdf'
+        path.write_bytes(b'%PDF-1.4 x')
+        return str(path)
+
+    outputs = []
+
+    def run(i):
+        outputs.append(cache.get_or_create('k', producer, str(tmp_path / f'dest-{i}.pdf')))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(outputs) == 5 and all(open(p, 'rb').read() == b'%PDF-1.4 x' for p in outputs)
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['hits'] == 4 and stats['waits'] >= 1
+
+
+def test_failure_is_shared_with_waiters_not_retried(tmp_path):
+    from labprinter_linux.app.file_cache import FileCache
+
+    cache = FileCache(str(tmp_path / 'cache'), 1024 * 1024)
+    calls = []
+
+    def producer():
+        calls.append(1)
+        time.sleep(0.3)
+        raise RuntimeError('文档损坏')
+
+    errors = []
+
+    def run(i):
+        try:
+            cache.get_or_create('k', producer, str(tmp_path / f'dest-{i}.pdf'))
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 损坏的文档只转换一次，排队中的请求直接得到同一个错误
+    assert len(calls) == 1
+    assert errors == ['文档损坏'] * 4
+    assert cache.stats()['shared_failures'] == 3
+
+    # 失败不缓存：之后的请求会重新生成
+    with pytest.raises(RuntimeError):
+        cache.get_or_create('k', producer, str(tmp_path / 'later.pdf'))
+    assert len(calls) == 2
+
+
+def test_lru_eviction_respects_byte_budget(tmp_path):
+    from labprinter_linux.app.file_cache import FileCache
+
+    cache = FileCache(str(tmp_path / 'cache'), 250)
+
+    def make(key):
+        def producer():
+            path = tmp_path / f'{key}.src'
+            path.write_bytes(b'x' * 100)
+            return str(path)
+        return producer
+
+    for key in ('a', 'b'):
+        cache.get_or_create(key, make(key), str(tmp_path / f'{key}.out'))
+    old = time.time() - 60
+    os.utime(cache._entry_path('a'), (old, old))
+    os.utime(cache._entry_path('b'), (old - 60, old - 60))
+    cache.get_or_create('a', make('a'), str(tmp_path / 'a2.out'))  # 命中，刷新 a 的访问时间
+    cache.get_or_create('c', make('c'), str(tmp_path / 'c.out'))
+
+    assert os.path.exists(cache._entry_path('a'))
+    assert not os.path.exists(cache._entry_path('b'))
+    assert os.path.exists(cache._entry_path('c'))
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] <= 250
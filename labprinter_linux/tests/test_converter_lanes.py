@@ -0,0 +1,107 @@
+import os
+import threading
+
+
+def test_same_name_uploads_do_not_collide(fake_soffice, tmp_path):
+    from labprinter_linux.app.converter import convert_to_pdf
+
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    first = tmp_path / 'a' / 'report.docx'
+    second = tmp_path / 'b' / 'report.docx'
+    first.write_bytes(b'first')
+    second.write_bytes(b'second')
+
+    out1 = convert_to_pdf(str(first))
+    out2 = convert_to_pdf(str(second))
+    try:
+        assert out1 != out2
+        assert open(out1, 'rb').read().endswith(b'first')
+        assert open(out2, 'rb').read().endswith(b'second')
+    finally:
+        os.remove(out1)
+        os.remove(out2)
+
+
+def test_lanes_convert_in_parallel_with_isolated_profiles(fake_soffice, tmp_path, monkeypatch):
+    import labprinter_linux.app.converter as converter_mod
+
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_CONCURRENCY', 3)
+    monkeypatch.setenv('FAKE_SOFFICE_DELAY', '0.5')
+    active = tmp_path / 'active'
+    active.mkdir()
+    monkeypatch.setenv('FAKE_SOFFICE_ACTIVE', str(active))
+
+    outputs = []
+    errors = []
+
+    def run(i):
+        src = tmp_path / f'doc{i}.docx'
+        src.write_bytes(b'x')
+        try:
+            outputs.append(converter_mod.convert_to_pdf(str(src)))
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for out in outputs:
+        os.remove(out)
+    assert not errors
+    assert len(outputs) == 3
+    # 3 条通道并行：至少有两个 soffice 同时在转换
+    assert max(int(p.read_text()) for p in active.glob('*.seen')) >= 2
+    profiles = fake_soffice.read_text().splitlines()
+    assert len(set(profiles)) == 3
+
+
+def test_profile_template_is_built_once_and_cloned(fake_soffice, tmp_path, monkeypatch):
+    import labprinter_linux.app.converter as converter_mod
+
+    monkeypatch.setattr(converter_mod, '_PROFILE_TEMPLATE', None)
+
+    for i in range(3):
+        src = tmp_path / f'doc{i}.docx'
+        src.write_bytes(b'x')
+        os.remove(converter_mod.convert_to_pdf(str(src)))
+
+    lines = fake_soffice.read_text().splitlines()
+    assert lines.count('init') == 1
+    assert [line.endswith(' seeded') for line in lines if line != 'init'] == [True, True, True]
+
+    # 克隆是独立副本：修改克隆不影响模板
+    template = converter_mod.prepare_profile_template()
+    clone = tmp_path / 'clone'
+    converter_mod.seed_profile(str(clone))
+    (clone / 'user' / 'registrymodifications.xcu').write_text('changed')
+    assert (tmp_path / 'work' / 'lo_profile' / 'template' / 'user' / 'registrymodifications.xcu').read_text() == 'seeded'
+    assert template.endswith('template')
+
+
+def test_failed_template_build_is_retried_later(fake_soffice, monkeypatch):
+    import labprinter_linux.app.converter as converter_mod
+
+    monkeypatch.setattr(converter_mod, '_PROFILE_TEMPLATE', None)
+    real_run_tool = converter_mod.run_tool
+    builds = []
+
+    def flaky_run_tool(tool, cmd, **kwargs):
+        if '--terminate_after_init' in cmd:
+            builds.append(cmd)
+            if len(builds) == 1:
+                raise RuntimeError('soffice 启动失败')
+        return real_run_tool(tool, cmd, **kwargs)
+
+    monkeypatch.setattr(converter_mod, 'run_tool', flaky_run_tool)
+
+    assert converter_mod.prepare_profile_template() is None
+    # 冷却期内不重试
+    assert converter_mod.prepare_profile_template() is None
+    assert len(builds) == 1
+
+    monkeypatch.setattr(converter_mod, '_PROFILE_TEMPLATE_RETRY_AT', 0.0)
+    assert converter_mod.prepare_profile_template().endswith('template')
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+from io import BytesIO
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from labprinter_linux.app import create_app
+from labprinter_linux import config
+
+
+def _pdf_bytes(pages):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    app = create_app(start_worker=False)
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    import labprinter_linux.app.routes as routes_mod
+
+    calls = []
+    monkeypatch.setattr(routes_mod.task_queue, "submit", lambda path, options, name="": calls.append((path, options, name)) or "task-1")
+    return calls
+
+
+def _wait_ready(client, doc_id):
+    for _ in range(100):
+        data = client.get(f"/documents/{doc_id}").get_json()
+        if data["state"] != "PROCESSING":
+            return data
+        time.sleep(0.02)
+    raise AssertionError("document not prepared")
+
+
+def test_staged_pdf_reports_page_count_and_prints(client, submitted):
+    res = client.post("/documents", data={"file": (BytesIO(_pdf_bytes(3)), "notes.pdf")}, content_type="multipart/form-data")
+    assert res.status_code == 201
+    doc_id = res.get_json()["document_id"]
+
+    data = _wait_ready(client, doc_id)
+    assert data["state"] == "READY" and data["page_count"] == 3
+
+    res = client.post(f"/documents/{doc_id}/print", data={"copies": "2", "page_range_type": "custom", "page_range": "2-3"})
+    assert res.status_code == 200
+    assert res.get_json()["task_id"] == "task-1"
+    path, options, name = submitted[0]
+    assert name == "notes.pdf" and options["copies"] == 2 and options["page_range"] == "2-3"
+    assert client.get(f"/documents/{doc_id}").status_code == 404
+
+
+def test_print_rejects_range_beyond_page_count(client, submitted):
+    res = client.post("/documents", data={"file": (BytesIO(_pdf_bytes(2)), "a.pdf")}, content_type="multipart/form-data")
+    doc_id = res.get_json()["document_id"]
+    _wait_ready(client, doc_id)
+
+    res = client.post(f"/documents/{doc_id}/print", data={"page_range_type": "custom", "page_range": "5"})
+    assert res.status_code == 400
+    assert not submitted
+
+
+def test_word_document_is_converted_speculatively(client, submitted, monkeypatch, tmp_path):
+    import labprinter_linux.app.converter as converter_mod
+
+    converted = tmp_path / "converted.pdf"
+
+    def fake_convert(path, page_range=""):
+        converted.write_bytes(_pdf_bytes(4))
+        return str(converted)
+
+    monkeypatch.setattr(converter_mod, "convert_to_pdf", fake_convert)
+
+    res = client.post("/documents", data={"file": (BytesIO(b"docx"), "thesis.docx")}, content_type="multipart/form-data")
+    doc_id = res.get_json()["document_id"]
+    assert _wait_ready(client, doc_id)["page_count"] == 4
+
+    client.post(f"/documents/{doc_id}/print", data={"copies": "1"})
+    path, options, name = submitted[0]
+    # 已转换完成：直接提交 PDF，原始 Word 文件被删除
+    assert path == str(converted) and name == "thesis.docx"
+    assert not any(f.endswith("thesis.docx") for f in os.listdir(config.UPLOAD_FOLDER))
+
+
+def test_image_printed_on_other_paper_is_reconverted(client, submitted):
+    import struct
+    import zlib
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    png = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 2, 2, 8, 2, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(b"\x00" + b"\xff" * 6 + b"\x00" + b"\xff" * 6)) + chunk(b"IEND", b""))
+    res = client.post("/documents", data={"file": (BytesIO(png), "photo.png")}, content_type="multipart/form-data")
+    doc_id = res.get_json()["document_id"]
+    assert _wait_ready(client, doc_id)["page_count"] == 1
+    from labprinter_linux.app.documents import document_store
+    speculative = document_store.get(doc_id).pdf_path
+
+    client.post(f"/documents/{doc_id}/print", data={"paper_size": "A3"})
+    path, options, name = submitted[0]
+    # 推测转换按 A4 排版：选了 A3 时提交原图，由打印任务按 A3 重新转换
+    assert path.endswith("photo.png") and options["paper_size"] == "A3"
+    assert not os.path.exists(speculative)
+
+
+def test_unprinted_documents_expire(client):
+    from labprinter_linux.app.documents import document_store
+
+    res = client.post("/documents", data={"file": (BytesIO(_pdf_bytes(1)), "old.pdf")}, content_type="multipart/form-data")
+    doc_id = res.get_json()["document_id"]
+    _wait_ready(client, doc_id)
+    document_store.get(doc_id).created_at -= 3600
+
+    document_store.cleanup_expired(1800)
+    assert client.get(f"/documents/{doc_id}").status_code == 404
+    assert os.listdir(config.UPLOAD_FOLDER) == []
@@ -0,0 +1,202 @@
+import os
+import struct
+import zlib
+
+import pytest
+from pypdf import PdfReader
+
+from labprinter_linux.app import fast_convert
+
+
+def _jpeg_bytes(width, height, components=3, orientation=None, adobe=False):
+    data = b'\xff\xd8'
+    if adobe:
+        app14 = b'Adobe' + struct.pack('>HHHB', 100, 0, 0, 2)
+        data += b'\xff\xee' + struct.pack('>H', len(app14) + 2) + app14
+    if orientation is not None:
+        tiff = b'MM\x00\x2a\x00\x00\x00\x08' + struct.pack('>H', 1) + struct.pack('>HHIHH', 0x0112, 3, 1, orientation, 0) + b'\x00\x00\x00\x00'
+        app1 = b'Exif\x00\x00' + tiff
+        data += b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1
+    sof = struct.pack('>BHHB', 8, height, width, components) + b'\x01\x11\x00' * components
+    data += b'\xff\xc0' + struct.pack('>H', len(sof) + 2) + sof
+    return data + b'\xff\xd9'
+
+
+def _png_bytes(width, height, color_type=2, interlace=0, trns=None, fill=0x80):
+    def chunk(ctype, body):
+        return struct.pack('>I', len(body)) + ctype + body + struct.pack('>I', zlib.crc32(ctype + body) & 0xffffffff)
+
+    channels = {0: 1, 2: 3, 3: 1, 6: 4}[color_type]
+    raw = b''.join(b'\x00' + bytes([fill]) * (width * channels) for _ in range(height))
+    data = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, interlace))
+    if color_type == 3:
+        data += chunk(b'PLTE', b'\x00\x00\x00\xff\xff\xff')
+    if trns is not None:
+        data += chunk(b'tRNS', trns)
+    return data + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def out_root(tmp_path, monkeypatch):
+    from labprinter_linux.app import converter
+
+    root = tmp_path / 'work'
+    monkeypatch.setattr(converter, '_work_root', lambda: str(root))
+    return root
+
+
+def test_jpeg_is_embedded_without_reencoding(tmp_path, out_root):
+    jpeg = _jpeg_bytes(400, 300)
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'photo.jpg', jpeg))
+
+    assert pdf.startswith(str(out_root))
+    page = PdfReader(pdf).pages[0]
+    assert float(page.mediabox.width) > float(page.mediabox.height)  # 横图用横向页面
+    image = page['/Resources']['/XObject']['/Im0'].get_object()
+    assert image['/Filter'] == '/DCTDecode'
+    assert image['/Width'] == 400
+    assert image.get_data() == jpeg
+
+
+def test_jpeg_exif_orientation_sets_page_rotation(tmp_path, out_root):
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'portrait.jpg', _jpeg_bytes(400, 300, orientation=6)))
+
+    page = PdfReader(pdf).pages[0]
+    assert page.get('/Rotate') == 90
+
+
+@pytest.mark.parametrize('orientation, rotate', [(2, None), (4, 180), (5, 270), (7, 90)])
+def test_jpeg_exif_mirror_is_drawn_flipped(tmp_path, out_root, orientation, rotate):
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'mirror.jpg', _jpeg_bytes(400, 300, orientation=orientation)))
+
+    page = PdfReader(pdf).pages[0]
+    assert page.get('/Rotate') == rotate
+    a = float(page.get_contents().get_data().split()[1])
+    assert a < 0  # 水平镜像：cm 矩阵的 x 缩放为负
+
+
+def test_adobe_cmyk_jpeg_uses_inverted_decode(tmp_path, out_root):
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'cmyk.jpg', _jpeg_bytes(10, 10, components=4, adobe=True)))
+
+    image = PdfReader(pdf).pages[0]['/Resources']['/XObject']['/Im0'].get_object()
+    assert image['/ColorSpace'] == '/DeviceCMYK'
+    assert list(image['/Decode']) == [1, 0, 1, 0, 1, 0, 1, 0]
+
+
+def test_cmyk_jpeg_without_app14_is_not_inverted(tmp_path, out_root):
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'cmyk.jpg', _jpeg_bytes(10, 10, components=4)))
+
+    image = PdfReader(pdf).pages[0]['/Resources']['/XObject']['/Im0'].get_object()
+    assert image['/ColorSpace'] == '/DeviceCMYK'
+    assert '/Decode' not in image
+
+
+@pytest.mark.parametrize('color_type', [0, 2, 3])
+def test_png_idat_passthrough(tmp_path, out_root, color_type):
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'scan.png', _png_bytes(8, 12, color_type)), paper_size='A3')
+
+    page = PdfReader(pdf).pages[0]
+    assert (round(float(page.mediabox.width)), round(float(page.mediabox.height))) == (842, 1191)
+    image = page['/Resources']['/XObject']['/Im0'].get_object()
+    assert image['/Filter'] == '/FlateDecode'
+    assert image['/DecodeParms']['/Predictor'] == 15
+
+
+def test_alpha_png_requires_pillow(tmp_path, out_root, monkeypatch):
+    import builtins
+
+    real_import = builtins.__import__
+
+    def no_pillow(name, *args, **kwargs):
+        if name == 'PIL' or name.startswith('PIL.'):
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_pillow)
+    with pytest.raises(RuntimeError, match='Pillow'):
+        fast_convert.convert_fast(_write(tmp_path, 'alpha.png', _png_bytes(4, 4, color_type=6)))
+
+
+def test_text_is_paginated_and_keeps_chinese(tmp_path, out_root):
+    lines = ['第一页 中文内容 line %d' % i for i in range(80)]
+    text = '\n'.join(lines) + '\f末页'
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'notes.txt', text.encode('gb18030')))
+
+    reader = PdfReader(pdf)
+    assert len(reader.pages) == 3  # 80 行分两页，\f 强制另起一页
+    font = reader.pages[0]['/Resources']['/Font']['/F1'].get_object()
+    assert font['/Encoding'] == '/UniGB-UTF16-H'
+    assert '末页'.encode('utf-16-be').hex().encode() in reader.pages[2].get_contents().get_data()
+
+
+def test_long_lines_are_wrapped(tmp_path, out_root):
+    pdf = fast_convert.convert_fast(_write(tmp_path, 'long.txt', ('字' * 200).encode('utf-8')))
+
+    content = PdfReader(pdf).pages[0].get_contents().get_data()
+    assert content.count(b' Tj') > 1
+
+
+def test_unsupported_extension_rejected(tmp_path, out_root):
+    with pytest.raises(RuntimeError):
+        fast_convert.convert_fast(_write(tmp_path, 'a.bmp', b'BM'))
+    assert not fast_convert.supports('.docx')
+    assert fast_convert.supports('.JPG')
+
+
+def test_multipage_tiff_keeps_every_frame(tmp_path, out_root):
+    Image = pytest.importorskip('PIL.Image')
+
+    frames = [Image.new('RGB', (300, 200), 'red'), Image.new('L', (100, 400), 80), Image.new('RGB', (50, 50), 'blue')]
+    path = tmp_path / 'scan.tif'
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+    pages = PdfReader(fast_convert.convert_fast(str(path))).pages
+    assert len(pages) == 3
+    assert float(pages[0].mediabox.width) > float(pages[0].mediabox.height)  # 横版帧用横向页面
+    assert float(pages[1].mediabox.width) < float(pages[1].mediabox.height)
+    assert pages[1]['/Resources']['/XObject']['/Im0'].get_object()['/ColorSpace'] == '/DeviceGray'
+
+
+def test_transparent_palette_png_falls_back_to_pillow(tmp_path, out_root):
+    pytest.importorskip('PIL.Image')
+
+    # 调色板第 0 项（黑）完全透明：原样嵌入会印成黑色，应合成到白底
+    data = _png_bytes(4, 4, color_type=3, trns=b'\x00', fill=0)
+    assert fast_convert._png_passthrough(data) is None
+
+    image = PdfReader(fast_convert.convert_fast(_write(tmp_path, 'logo.png', data))).pages[0]['/Resources']['/XObject']['/Im0'].get_object()
+    assert '/DecodeParms' not in image
+    assert set(image.get_data()) == {0xff}
+
+
+def test_alpha_png_is_flattened_onto_white(tmp_path, out_root):
+    Image = pytest.importorskip('PIL.Image')
+
+    img = Image.new('RGBA', (4, 4), (0, 0, 0, 0))
+    img.putpixel((0, 0), (255, 0, 0, 255))
+    path = tmp_path / 'alpha.png'
+    img.save(path)
+
+    image = PdfReader(fast_convert.convert_fast(str(path))).pages[0]['/Resources']['/XObject']['/Im0'].get_object()
+    data = image.get_data()
+    assert data[:3] == b'\xff\x00\x00' and data[3:6] == b'\xff\xff\xff'
+
+
+def test_pillow_applies_exif_mirror(tmp_path, out_root):
+    Image = pytest.importorskip('PIL.Image')
+
+    img = Image.new('RGB', (2, 1), 'white')
+    img.putpixel((0, 0), (0, 0, 0))
+    exif = Image.Exif()
+    exif[0x0112] = 2  # 水平镜像
+    path = tmp_path / 'mirrored.tif'
+    img.save(path, exif=exif)
+
+    image = PdfReader(fast_convert.convert_fast(str(path))).pages[0]['/Resources']['/XObject']['/Im0'].get_object()
+    assert image.get_data() == b'\xff\xff\xff\x00\x00\x00'
@@ -0,0 +1,134 @@
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import pytest
+from pypdf import PdfReader
+
+from labprinter_linux.app import gs_raster
+from labprinter_linux.page_ranges import PageRanges
+
+
+@pytest.fixture
+def deck(fake_gs, monkeypatch):
+    """45 页的源文档；4 个 gs 并行、每段 10 页。"""
+    from labprinter_linux import config
+
+    monkeypatch.setattr(config, 'PDF_RASTER_WORKERS', 4)
+    monkeypatch.setattr(config, 'PDF_RASTER_CHUNK_PAGES', 10)
+    return fake_gs.source(45)
+
+
+def _widths(path):
+    return [int(p.mediabox.width) for p in PdfReader(path).pages]
+
+
+def test_plan_chunks_even_split():
+    chunks = gs_raster.plan_chunks(PageRanges.parse('1-45'), 4, 10)
+    assert [str(c) for c in chunks] == ['1-9', '10-18', '19-27', '28-36', '37-45']
+    assert gs_raster.plan_chunks(PageRanges.parse('1-45'), 1, 10) == [PageRanges.parse('1-45')]
+    assert gs_raster.plan_chunks(PageRanges.parse('1-8'), 4, 10) == [PageRanges.parse('1-8')]
+
+
+def test_chunks_are_merged_in_page_order(fake_gs, deck):
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print
+
+    out = _preprocess_pdf_for_print(deck)
+    try:
+        assert _widths(out) == list(range(1, 46))
+    finally:
+        os.remove(out)
+    page_lists = sorted(a for cmd in fake_gs.cmds for a in cmd if a.startswith('-sPageList='))
+    assert len(page_lists) == 5
+    # 最后一次 gs 调用按顺序流式合并各段，而不是把各段读进内存
+    merge = fake_gs.cmds[-1]
+    assert '-sDEVICE=pdfwrite' in merge
+    # 合并不得重新压缩或降采样各段的栅格图像
+    assert {'-dPassThroughJPEGImages=true', '-dDownsampleColorImages=false', '-dAutoFilterColorImages=false'} <= set(merge)
+    parts = [a for a in merge[1:] if not a.startswith('-')]
+    assert [os.path.basename(p).rsplit('.', 2)[1] for p in parts] == [f'part{i}' for i in range(5)]
+    assert any(name.startswith('GsRaster') for name in fake_gs.threads)
+    stats = gs_raster.get_raster_stats()
+    assert stats['parallel_runs'] >= 1 and stats['recent_chunks'][-1]['pages'] == 9
+
+
+def test_selected_pages_are_chunked(deck):
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print
+
+    selected = PageRanges.parse('3-14,40-45')
+    out = _preprocess_pdf_for_print(deck, selected)
+    assert _widths(out) == list(selected)
+
+
+def test_small_jobs_use_one_threaded_gs(fake_gs, deck):
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print
+
+    _preprocess_pdf_for_print(deck, PageRanges.parse('1-5'))
+    (cmd,) = fake_gs.cmds
+    assert '-dNumRenderingThreads=4' in cmd and '-sPageList=1-5' in cmd
+
+
+def test_failed_chunk_fails_whole_run_and_cleans_up(fake_gs, deck):
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print
+
+    fake_gs.fail_page = 20
+    out_dir = os.path.join(tempfile.gettempdir(), 'labprinter', 'preprocessed')
+    before = set(glob.glob(os.path.join(out_dir, '*')))
+    with pytest.raises(RuntimeError, match='gs crashed'):
+        _preprocess_pdf_for_print(deck)
+    assert set(glob.glob(os.path.join(out_dir, '*'))) == before
+
+
+def test_worker_budget_is_shared_across_documents(fake_gs, deck, monkeypatch):
+    from labprinter_linux import config
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print
+
+    monkeypatch.setattr(config, 'PDF_RASTER_WORKERS', 2)
+    fake_gs.delay = 0.05
+    outputs, errors = [], []
+
+    def run():
+        try:
+            outputs.append(_preprocess_pdf_for_print(deck))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert not errors and len(outputs) == 3
+        # 三份文档同时栅格化，同时运行的 gs 仍不超过 PDF_RASTER_WORKERS
+        assert fake_gs.max_active == 2
+    finally:
+        for out in outputs:
+            os.remove(out)
+
+
+@pytest.mark.skipif(shutil.which('gs') is None, reason='需要 Ghostscript')
+def test_real_gs_merge_keeps_raster_images_lossless(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+
+    parts = []
+    for i, color in enumerate([(255, 0, 0), (0, 0, 255)]):
+        part = tmp_path / f'part{i}.pdf'
+        Image.new('RGB', (300, 200), color).save(part, resolution=100)
+        parts.append(str(part))
+    out = tmp_path / 'merged.pdf'
+
+    def run(cmd, out_path):
+        subprocess.run(cmd, check=True, capture_output=True)
+
+    gs_raster._merge(run, shutil.which('gs'), parts, str(out))
+
+    pages = PdfReader(str(out)).pages
+    assert len(pages) == 2
+    for page, color in zip(pages, [(255, 0, 0), (0, 0, 255)]):
+        (image,) = page.images
+        assert image.image.size == (300, 200)  # 未降采样
+        assert image.image.convert('RGB').getpixel((150, 100)) == color  # 未有损重新编码
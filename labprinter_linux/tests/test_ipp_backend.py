@@ -0,0 +1,203 @@
+import pytest
+
+
+def _printer(name, state=3, jobs=0, reasons=('none',), info='', default=False):
+    from labprinter_linux.app import ipp
+
+    return [
+        (ipp.TAG_NAME, 'printer-name', name),
+        (ipp.TAG_TEXT, 'printer-info', info),
+        (ipp.TAG_ENUM, 'printer-state', state),
+        (ipp.TAG_KEYWORD, 'printer-state-reasons', list(reasons)),
+        (ipp.TAG_ENUM, 'printer-type', 0x00020000 if default else 0),
+        (ipp.TAG_INTEGER, 'queued-job-count', jobs),
+    ]
+
+
+def test_message_round_trip_keeps_types():
+    from labprinter_linux.app import ipp
+
+    data = ipp.encode_message(0x0000, 7, [
+        (ipp.TAG_OPERATION, [(ipp.TAG_CHARSET, 'attributes-charset', 'utf-8')]),
+        (ipp.TAG_PRINTER, [
+            (ipp.TAG_ENUM, 'printer-state', 5),
+            (ipp.TAG_KEYWORD, 'printer-state-reasons', ['paused', 'toner-low-warning']),
+            (ipp.TAG_BOOLEAN, 'printer-is-accepting-jobs', False),
+            (ipp.TAG_RANGE, 'copies-supported', (1, 99)),
+            (ipp.TAG_TEXT, 'printer-info', '三楼激光打印机'),
+        ]),
+    ]) + b'%PDF'
+
+    message = ipp.decode_message(data)
+    assert message.ok and message.request_id == 7
+    printer = message.objects(ipp.TAG_PRINTER)[0]
+    assert printer['printer-state'] == 5
+    assert printer['printer-state-reasons'] == ['paused', 'toner-low-warning']
+    assert printer['printer-is-accepting-jobs'] is False
+    assert printer['copies-supported'] == (1, 99)
+    assert printer['printer-info'] == '三楼激光打印机'
+    assert message.data == b'%PDF'
+
+
+def test_get_printers_is_one_round_trip(fake_cups, monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+
+    monkeypatch.setattr(printer_mod.config, 'DEFAULT_PRINTER', None)
+    monkeypatch.setattr(printer_mod.config, 'ALLOWED_PRINTERS', None)
+    fake_cups.printers = [
+        _printer('HP', jobs=2, info='HP LaserJet', default=True),
+        _printer('Canon', state=4, jobs=1),
+        _printer('Epson', state=5, reasons=('paused',)),
+        _printer('Brother', reasons=('offline-report',)),
+    ]
+    monkeypatch.setattr(printer_mod, '_run_cmd', lambda *a, **k: pytest.fail('lpstat should not be called'))
+
+    printers = {p['name']: p for p in printer_mod.get_printers()}
+
+    assert len(fake_cups.requests) == 1
+    assert printers['HP']['is_default'] and printers['HP']['jobs'] == 2
+    assert printers['HP']['description'] == 'HP LaserJet'
+    assert printers['Canon']['status'] == 'busy'
+    assert printers['Epson']['status'] == 'offline'
+    assert printers['Brother']['status'] == 'offline'
+    assert printers['Canon']['is_default'] is False
+
+
+def test_connection_is_reused_across_queries(fake_cups, monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import ipp
+
+    monkeypatch.setattr(printer_mod.config, 'ALLOWED_PRINTERS', None)
+    fake_cups.printers = [_printer('HP', jobs=2, default=True)]
+    fake_cups.jobs = [[(0x21, 'job-id', 1), (0x45, 'job-printer-uri', 'ipp://localhost/printers/HP')]]
+
+    # 默认打印机/名称/作业数来自同一份快照：一次 CUPS-Get-Printers
+    assert printer_mod.get_default_printer() == 'HP'
+    assert printer_mod.get_printer_names() == {'HP'}
+    assert printer_mod._get_jobs_count_map() == {'HP': 2}
+    assert printer_mod.validate_printer_name('HP') is True
+    assert len(fake_cups.requests) == 1
+
+    # 后续请求复用同一条 keep-alive 连接
+    assert ipp._client.get_jobs(['job-id'])[0]['job-id'] == 1
+    assert ipp._client.get_default() is None
+    assert len(fake_cups.requests) == 3
+    assert fake_cups.connections == 1
+
+
+def test_not_found_means_no_printers(fake_cups):
+    import labprinter_linux.app.printer as printer_mod
+
+    assert printer_mod.get_printers() == []
+    assert printer_mod.get_default_printer() is None
+
+
+def test_client_reconnects_after_server_closes_idle_connection(fake_cups):
+    from labprinter_linux.app import ipp
+
+    fake_cups.printers = [_printer('HP')]
+    client = ipp._client
+    assert client.get_printers(['printer-name'])[0]['printer-name'] == 'HP'
+    for conn in client._idle:
+        conn.sock.close()  # 模拟 cupsd 关闭空闲连接
+
+    assert client.get_printers(['printer-name'])[0]['printer-name'] == 'HP'
+    assert client.stats()['errors'] == 0
+
+
+def test_request_lost_after_sending_is_not_retried(fake_cups, tmp_path):
+    from labprinter_linux.app import ipp
+
+    fake_cups.printers = [_printer('HP')]
+    client = ipp._client
+    client.get_printers(['printer-name'])
+    assert client._idle  # 下一个请求走复用连接
+
+    # 请求已送达但响应丢失：cupsd 可能已经处理，不能重发
+    fake_cups.drop_responses = 1
+    pdf = tmp_path / 'doc.pdf'
+    pdf.write_bytes(b'%PDF-1.4 test')
+    with pytest.raises(ipp.IppError):
+        client.print_job('HP', str(pdf))
+    assert [op for op, _, _ in fake_cups.requests].count(ipp.PRINT_JOB) == 1
+
+    fake_cups.drop_responses = 1
+    before = len(fake_cups.requests)
+    with pytest.raises(ipp.IppError):
+        client.get_printers(['printer-name'])
+    assert len(fake_cups.requests) == before + 1
+
+
+def test_printer_name_is_quoted_in_uri_and_path(fake_cups, tmp_path):
+    from labprinter_linux.app import ipp
+
+    pdf = tmp_path / 'doc.pdf'
+    pdf.write_bytes(b'%PDF-1.4 test')
+    ipp._client.print_job('Lab Printer#2', str(pdf))
+    _, operation, _ = fake_cups.requests[-1]
+    assert operation['printer-uri'].endswith('/printers/Lab%20Printer%232')
+    assert fake_cups.paths[-1] == '/printers/Lab%20Printer%232'
+
+
+def test_cancel_job_sends_job_uri(fake_cups):
+    import labprinter_linux.app.printer as printer_mod
+
+    printer_mod.cancel_job('101')
+    assert fake_cups.cancelled == [printer_mod._ipp_client().job_uri(101)]
+    assert fake_cups.paths[-1] == '/jobs/'
+
+
+def test_unreachable_cups_raises_ipp_error():
+    from labprinter_linux.app import ipp
+
+    client = ipp.IppClient('127.0.0.1', 1, timeout=1)
+    with pytest.raises(ipp.IppError):
+        client.get_printers(['printer-name'])
+
+
+def test_print_job_streams_file_and_returns_numeric_id(fake_cups, monkeypatch, tmp_path):
+    import labprinter_linux.app.printer as printer_mod
+
+    monkeypatch.setattr(printer_mod.config, 'ALLOWED_PRINTERS', None)
+    monkeypatch.setattr(printer_mod.config, 'PDF_PREPROCESS', 'none')
+    monkeypatch.setattr(printer_mod, '_get_pdf_total_pages', lambda path: 10)
+    monkeypatch.setattr(printer_mod, '_run_cmd', lambda *a, **k: pytest.fail('lp should not be called'))
+    pdf = tmp_path / 'doc.pdf'
+    payload = b'%PDF-1.4\n' + bytes(range(256)) * 1024  # 跨越多个 chunk
+    pdf.write_bytes(payload)
+
+    job_id = printer_mod.print_file(str(pdf), {
+        'printer': 'HP',
+        'copies': 2,
+        'page_range': '1-3,5,7-8',
+        'duplex': 'two-sided-long-edge',
+        'paper_size': 'A4',
+        'color': 'grayscale',
+    })
+
+    assert job_id == '101'
+    op, operation, data = fake_cups.requests[-1]
+    assert operation['printer-uri'].endswith('/printers/HP')
+    assert operation['document-format'] == 'application/pdf'
+    assert data == payload
+    job = fake_cups.job_attributes[-1]
+    assert job['copies'] == 2
+    assert job['page-ranges'] == [(1, 3), (5, 5), (7, 8)]
+    assert job['sides'] == 'two-sided-long-edge'
+    assert job['media'] == 'A4'
+    assert job['print-color-mode'] == 'monochrome'
+
+
+def test_print_job_error_carries_ipp_status(fake_cups, monkeypatch, tmp_path):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import ipp
+
+    monkeypatch.setattr(printer_mod.config, 'ALLOWED_PRINTERS', None)
+    monkeypatch.setattr(printer_mod.config, 'PDF_PREPROCESS', 'none')
+    fake_cups.print_status = 0x0506  # server-error-not-accepting-jobs
+    pdf = tmp_path / 'doc.pdf'
+    pdf.write_bytes(b'%PDF-1.4 test')
+
+    with pytest.raises(ipp.IppError) as e:
+        printer_mod.print_file(str(pdf), {'printer': 'HP'})
+    assert e.value.status_code == 0x0506
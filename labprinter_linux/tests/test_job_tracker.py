@@ -0,0 +1,248 @@
+import pytest
+
+
+class DummyResult:
+    def __init__(self, returncode=0, stdout="", stderr=""):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+def _tracker_with_tasks(count):
+    from labprinter_linux.app.job_tracker import JobTracker
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    queue = TaskQueue()
+    tracker = JobTracker(queue, interval=1, timeout=0)
+    task_ids = []
+    for i in range(count):
+        task_id = queue.submit(f'/tmp/{i}.pdf', {})
+        queue.update_task(task_id, state=TaskState.QUEUED)
+        tracker.track(task_id, f'HP-{101 + i}', 101 + i)
+        task_ids.append(task_id)
+    return queue, tracker, task_ids
+
+
+def test_parse_lp_job_id():
+    from labprinter_linux.app.printer import _parse_lp_job_id, parse_job_number
+
+    assert _parse_lp_job_id('request id is HP-123 (1 file(s))\n') == 'HP-123'
+    assert parse_job_number('HP-123') == 123
+    assert parse_job_number('Canon-Lab-7') == 7
+    assert parse_job_number('42') == 42
+    assert parse_job_number('lp-job-a.pdf') is None
+
+
+def _ipp_job(job_id, state, reasons='none'):
+    from labprinter_linux.app import ipp
+
+    return [
+        (ipp.TAG_INTEGER, 'job-id', job_id),
+        (ipp.TAG_ENUM, 'job-state', state),
+        (ipp.TAG_KEYWORD, 'job-state-reasons', reasons),
+    ]
+
+
+def test_lpstat_tracking_uses_one_query_per_tick(monkeypatch, fake_cups):
+    from labprinter_linux.app import ipp
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app.task_queue import TaskState
+
+    monkeypatch.setattr(printer_mod.config, 'PRINTER_BACKEND', 'lpstat')
+    outputs = {
+        'out': "printer HP now printing HP-101.  enabled since ...\n"
+               "HP-101 alice 1024 ...\nHP-102 bob 2048 ...\nHP-103 carol 512 ...\n"
+    }
+    calls = []
+
+    def fake_run_cmd(cmd, timeout):
+        calls.append(cmd)
+        return DummyResult(0, outputs['out'])
+
+    monkeypatch.setattr(printer_mod, '_run_cmd', fake_run_cmd)
+    queue, tracker, (t1, t2, t3) = _tracker_with_tasks(3)
+
+    tracker.poll_once()
+    assert calls == [[printer_mod.config.LPSTAT_COMMAND, '-p', '-W', 'not-completed', '-o']]
+    assert fake_cups.requests == []  # 作业都还在队列中：不查已结束作业
+    assert queue.get_task(t1).state == TaskState.PRINTING
+    assert queue.get_task(t2).state == TaskState.QUEUED
+
+    # 离开队列的作业向 cupsd 查询最终状态，lpstat 后端同样能报告成功/取消
+    fake_cups.jobs = [_ipp_job(101, 9), _ipp_job(102, 7, 'job-canceled-by-user')]
+    outputs['out'] = "printer HP now printing HP-103.\nHP-103 carol 512 ...\n"
+    tracker.poll_once()
+    assert len(calls) == 2
+    assert [(op, attrs['which-jobs']) for op, attrs, _ in fake_cups.requests] == [(ipp.GET_JOBS, 'completed')]
+    assert queue.get_task(t1).state == TaskState.SUCCESS
+    assert queue.get_task(t2).state == TaskState.CANCELLED
+    assert queue.get_task(t3).state == TaskState.PRINTING
+    assert tracker.pending() == 1
+
+
+def test_lpstat_tracking_without_final_state_is_unconfirmed(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app.task_queue import TaskState
+
+    def ipp_down():
+        raise ConnectionRefusedError('cupsd 不可达')
+
+    monkeypatch.setattr(printer_mod.config, 'PRINTER_BACKEND', 'lpstat')
+    monkeypatch.setattr(printer_mod, '_ipp_client', ipp_down)
+    monkeypatch.setattr(printer_mod, '_run_cmd', lambda cmd, timeout: DummyResult(0, 'printer HP is idle.\n'))
+    queue, tracker, (t1, t2) = _tracker_with_tasks(2)
+
+    tracker.poll_once()
+    # 只知道作业离开了队列，不知道是完成、取消还是中止：不能报成功
+    assert queue.get_task(t1).state == TaskState.UNCONFIRMED
+    assert queue.get_task(t1).result['status'] == 'left-queue'
+    assert queue.get_task(t2).state == TaskState.UNCONFIRMED
+    assert tracker.stats()['left-queue'] == 2
+
+
+def test_tracking_timeout_is_not_reported_as_success(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app.task_queue import TaskState
+
+    monkeypatch.setattr(printer_mod, 'query_job_states', lambda numbers: {n: ('queued', '') for n in numbers})
+    queue, tracker, (task_id,) = _tracker_with_tasks(1)
+    tracker.timeout = 0.01
+    tracker._tasks[task_id].started_at -= 1
+
+    tracker.poll_once()
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.UNCONFIRMED
+    assert task.progress < 100
+    assert task.result['status'] == 'expired'
+    assert '停止跟踪' in task.message
+    assert tracker.pending() == 0
+
+
+def test_query_failure_keeps_state(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app.task_queue import TaskState
+
+    monkeypatch.setattr(printer_mod.config, 'PRINTER_BACKEND', 'lpstat')
+    monkeypatch.setattr(printer_mod, '_run_cmd', lambda cmd, timeout: DummyResult(1, '', 'lpstat: Bad file descriptor'))
+    queue, tracker, (task_id,) = _tracker_with_tasks(1)
+
+    tracker.poll_once()
+    assert queue.get_task(task_id).state == TaskState.QUEUED
+    assert tracker.pending() == 1
+    assert tracker.stats()['poll_errors'] == 1
+
+
+def test_ipp_tracking_reports_final_states(fake_cups):
+    from labprinter_linux.app.task_queue import TaskState
+
+    queue, tracker, (t1, t2, t3) = _tracker_with_tasks(3)
+    fake_cups.jobs = [_ipp_job(101, 5), _ipp_job(102, 3), _ipp_job(103, 3)]
+    tracker.poll_once()
+    assert len(fake_cups.requests) == 1
+    assert queue.get_task(t1).state == TaskState.PRINTING
+
+    fake_cups.jobs = [_ipp_job(101, 9), _ipp_job(102, 7, 'job-canceled-by-user'), _ipp_job(103, 8, 'document-format-error')]
+    tracker.poll_once()
+    assert len(fake_cups.requests) == 3  # 未完成作业一次 + 已结束作业一次
+    assert queue.get_task(t1).state == TaskState.SUCCESS
+    assert queue.get_task(t2).state == TaskState.CANCELLED
+    assert queue.get_task(t3).state == TaskState.ABORTED
+    assert 'document-format-error' in queue.get_task(t3).message
+    assert tracker.pending() == 0
+
+    tracker.poll_once()
+    assert len(fake_cups.requests) == 3  # 没有待跟踪作业时不查询
+
+
+def test_worker_hands_submitted_job_to_tracker(monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.job_tracker import JobTracker
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+    queue = TaskQueue()
+    tracker = JobTracker(queue, interval=1, timeout=0)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda q: tracker)
+    monkeypatch.setattr(worker_mod, 'print_file', lambda path, options: 'HP-42')
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+
+    task_id = queue.submit(str(pdf), {'copies': 1})
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), {'copies': 1}, 'a.pdf')
+
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.QUEUED
+    assert task.result == {'job_id': 'HP-42', 'status': 'queued', 'printer': None}
+    assert tracker.pending() == 1
+
+
+def test_unparsable_job_id_is_not_reported_as_success(monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.job_tracker import JobTracker
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+    queue = TaskQueue()
+    tracker = JobTracker(queue, interval=1, timeout=0)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda q: tracker)
+    monkeypatch.setattr(worker_mod, 'print_file', lambda path, options: 'lp-job-a.pdf')
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+
+    task_id = queue.submit(str(pdf), {'copies': 1})
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), {'copies': 1}, 'a.pdf')
+
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.UNCONFIRMED
+    assert task.result['status'] == 'untracked'
+    assert tracker.pending() == 0
+
+
+def test_finished_states_are_cleaned_up():
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    queue = TaskQueue()
+    done = queue.submit('/tmp/a.pdf', {})
+    active = queue.submit('/tmp/b.pdf', {})
+    queue.update_task(done, state=TaskState.ABORTED)
+    queue.update_task(active, state=TaskState.QUEUED)
+
+    queue.cleanup_old_tasks(max_age_seconds=-1)
+    assert queue.get_task(done) is None
+    assert queue.get_task(active) is not None
+
+
+def test_shards_are_tracked_under_one_task(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app.job_tracker import JobTracker
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    states = {}
+    monkeypatch.setattr(printer_mod, 'query_job_states', lambda numbers: {n: states.get(n, ('queued', '')) for n in numbers})
+    queue = TaskQueue()
+    tracker = JobTracker(queue, interval=1, timeout=0)
+    released = []
+    task_id = queue.submit('/tmp/exam.pdf', {})
+    tracker.track_shards(task_id, [
+        {'job_id': 'HP1-1', 'job_number': 1, 'printer': 'HP1', 'page_range': '1-20', 'copies': 1},
+        {'job_id': 'HP2-2', 'job_number': 2, 'printer': 'HP2', 'page_range': '21-40', 'copies': 1},
+    ], on_finish=released.append)
+
+    states[1] = ('printing', '')
+    tracker.poll_once()
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.PRINTING
+    assert [s['status'] for s in task.result['shards']] == ['printing', 'queued']
+
+    states[1] = ('completed', '')
+    states[2] = ('printing', '')
+    tracker.poll_once()
+    assert queue.get_task(task_id).message == '正在打印（1/2 台打印机已完成）...'
+
+    states[2] = ('aborted', 'media-jam')
+    tracker.poll_once()
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.ABORTED
+    assert task.message == '打印机中止了任务: HP2 media-jam'
+    assert task.result['job_id'] == 'HP1-1,HP2-2'
+    assert released == [task_id]
@@ -0,0 +1,218 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# 本地替身监听进程：在指定端口上接受连接，模拟 soffice --accept=socket,...
+STAND_IN = (
+    "import socket, sys, time\n"
+    "time.sleep(float(sys.argv[2]))\n"
+    "s = socket.socket(); s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)\n"
+    "s.bind(('127.0.0.1', int(sys.argv[1]))); s.listen(16)\n"
+    "while True:\n"
+    "    c, _ = s.accept(); c.close()\n"
+)
+
+
+def stand_in_launcher(startup_delay=0.0):
+    def launch(instance):
+        return subprocess.Popen([sys.executable, '-c', STAND_IN, str(instance.port), str(startup_delay)])
+    return launch
+
+
+def stand_in_dispatcher(instance, input_path, out_dir, timeout, target='pdf'):
+    import os
+    from pathlib import Path
+
+    assert instance.is_healthy()
+    out = os.path.join(out_dir, f'{Path(input_path).stem}.pdf')
+    with open(out, 'wb') as f:
+        f.write(b'%%PDF-1.4 converted by instance %d' % instance.index)
+    return out
+
+
+@pytest.fixture
+def pool(tmp_path):
+    from labprinter_linux.app.office_pool import OfficePool
+
+    p = OfficePool(
+        2,
+        root_dir=str(tmp_path / 'pool'),
+        launcher=stand_in_launcher(),
+        dispatcher=stand_in_dispatcher,
+        startup_timeout=10,
+        health_interval=0,
+    )
+    p.start()
+    yield p
+    p.shutdown()
+
+
+def test_pool_dispatches_to_long_lived_instances(pool, tmp_path):
+    src = tmp_path / 'a.docx'
+    src.write_bytes(b'docx')
+    pids = {inst.process.pid for inst in pool._instances}
+
+    for _ in range(4):
+        out = pool.convert(str(src), str(tmp_path), timeout=5)
+        assert open(out, 'rb').read().startswith(b'%PDF')
+
+    stats = pool.stats()
+    assert stats['conversions'] == 4
+    assert stats['restarts'] == 0
+    # 实例常驻：多次转换不会重新拉起进程
+    assert {inst.process.pid for inst in pool._instances} == pids
+
+
+def test_health_check_restarts_dead_instance(pool):
+    victim = pool._instances[0]
+    victim.process.kill()
+    victim.process.wait()
+
+    assert pool.health_check() == 1
+    assert victim.is_healthy()
+    assert pool.stats()['restarts'] == 1
+
+
+def test_convert_restarts_dead_instance_before_dispatch(pool, tmp_path):
+    src = tmp_path / 'b.docx'
+    src.write_bytes(b'docx')
+    for inst in pool._instances:
+        inst.process.kill()
+        inst.process.wait()
+
+    out = pool.convert(str(src), str(tmp_path), timeout=5)
+    assert out.endswith('b.pdf')
+    assert pool.stats()['restarts'] == 1
+
+
+def test_slow_conversion_times_out_and_restarts_instance(tmp_path):
+    import threading
+    from labprinter_linux.app.office_pool import OfficePool
+
+    release = threading.Event()
+
+    def slow_dispatcher(instance, input_path, out_dir, timeout, target='pdf'):
+        release.wait(30)  # 模拟卡住的 UNO 调用
+
+    p = OfficePool(1, root_dir=str(tmp_path / 'pool'), launcher=stand_in_launcher(),
+                   dispatcher=slow_dispatcher, startup_timeout=10, health_interval=0)
+    p.start()
+    try:
+        old_pid = p._instances[0].process.pid
+        src = tmp_path / 'slow.docx'
+        src.write_bytes(b'docx')
+        with pytest.raises(RuntimeError, match='超时'):
+            p.convert(str(src), str(tmp_path), timeout=0.5)
+        stats = p.stats()
+        assert stats['timeouts'] == 1 and stats['restarts'] == 1
+        assert p._instances[0].is_healthy() and p._instances[0].process.pid != old_pid
+    finally:
+        release.set()
+        p.shutdown()
+
+
+def test_slow_pool_conversion_is_not_treated_as_stalled(tmp_path, monkeypatch):
+    import time
+    from labprinter_linux.app.office_pool import OfficePool
+
+    # 常驻实例在另一个进程组里干活，分派方看起来毫无进展：只受转换超时约束
+    monkeypatch.setattr('labprinter_linux.app.office_pool.config.TOOL_STALL_TIMEOUT', 0.2)
+
+    def slow_dispatcher(instance, input_path, out_dir, timeout, target='pdf'):
+        time.sleep(1.0)
+        return stand_in_dispatcher(instance, input_path, out_dir, timeout, target)
+
+    p = OfficePool(1, root_dir=str(tmp_path / 'pool'), launcher=stand_in_launcher(),
+                   dispatcher=slow_dispatcher, startup_timeout=10, health_interval=0)
+    p.start()
+    try:
+        src = tmp_path / 'long.docx'
+        src.write_bytes(b'docx')
+        out = p.convert(str(src), str(tmp_path), timeout=10)
+        assert open(out, 'rb').read().startswith(b'%PDF')
+        assert p.stats()['restarts'] == 0
+    finally:
+        p.shutdown()
+
+
+def test_waiting_for_an_instance_counts_against_the_timeout(tmp_path):
+    import threading
+    import time
+    from labprinter_linux.app.office_pool import OfficePool
+
+    def slow_dispatcher(instance, input_path, out_dir, timeout, target='pdf'):
+        # 与真实 UNO 调用一样，实例被杀掉后立即返回
+        end = time.monotonic() + 1.4
+        while time.monotonic() < end:
+            if instance.process.poll() is not None:
+                raise RuntimeError('实例已退出')
+            time.sleep(0.05)
+        return stand_in_dispatcher(instance, input_path, out_dir, timeout, target)
+
+    p = OfficePool(1, root_dir=str(tmp_path / 'pool'), launcher=stand_in_launcher(),
+                   dispatcher=slow_dispatcher, startup_timeout=10, health_interval=0)
+    p.start()
+    try:
+        src = tmp_path / 'busy.docx'
+        src.write_bytes(b'docx')
+        first = threading.Thread(target=p.convert, args=(str(src), str(tmp_path), 10))
+        first.start()
+        time.sleep(0.2)
+        start = time.monotonic()
+        # 排队约 1.2 秒后只剩约 0.8 秒的分派预算，不够 1.4 秒的转换：总耗时不超过一个 timeout
+        with pytest.raises(RuntimeError, match='超时'):
+            p.convert(str(src), str(tmp_path), timeout=2)
+        assert time.monotonic() - start < 2.5
+        first.join()
+    finally:
+        p.shutdown()
+
+
+def test_stats_do_not_start_the_pool(monkeypatch):
+    import labprinter_linux.app.converter as converter_mod
+    import labprinter_linux.app.office_pool as pool_mod
+
+    monkeypatch.setattr(pool_mod.config, 'CONVERT_POOL_SIZE', 2)
+    monkeypatch.setattr(pool_mod, '_pool', None)
+    monkeypatch.setattr(pool_mod, 'uno_available', lambda: True)
+    monkeypatch.setattr(pool_mod.OfficePool, 'start', lambda self: pytest.fail('stats must not start the pool'))
+    assert converter_mod.get_convert_stats()['pool'] is None
+
+
+def test_pool_disabled_without_uno(monkeypatch):
+    import labprinter_linux.app.office_pool as pool_mod
+
+    monkeypatch.setattr(pool_mod.config, 'CONVERT_POOL_SIZE', 2)
+    monkeypatch.setattr(pool_mod, '_pool', None)
+    monkeypatch.setattr(pool_mod, 'uno_available', lambda: False)
+    assert pool_mod.get_office_pool() is None
+
+
+def test_convert_to_pdf_uses_pool_when_enabled(fake_soffice, monkeypatch, tmp_path):
+    import labprinter_linux.app.converter as converter_mod
+
+    src = tmp_path / 'c.docx'
+    src.write_bytes(b'docx')
+    calls = []
+
+    class FakePool:
+        def convert(self, input_path, out_dir, timeout, target='pdf'):
+            calls.append(input_path)
+            return stand_in_dispatcher(FakeInstance(), input_path, out_dir, timeout)
+
+    class FakeInstance:
+        index = 0
+
+        def is_healthy(self):
+            return True
+
+    monkeypatch.setattr(converter_mod, 'get_office_pool', lambda: FakePool())
+
+    out = converter_mod.convert_to_pdf(str(src))
+    try:
+        assert open(out, 'rb').read().startswith(b'%PDF')
+        assert calls == [str(src)]
+    finally:
+        os.remove(out)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+
+def test_convert_target_carries_page_range():
+    from labprinter_linux.app.converter import _pdf_convert_target
+
+    assert _pdf_convert_target('') == 'pdf'
+    target = _pdf_convert_target('3-4')
+    assert target.startswith('pdf:writer_pdf_Export:')
+    assert json.loads(target.split(':', 2)[2]) == {'PageRange': {'type': 'string', 'value': '3-4'}}
+
+
+@pytest.mark.parametrize('version, expected', [
+    ('LibreOffice 7.3.7.2 30(Build:2)', False),
+    ('LibreOffice 7.4.1.2 40(Build:2)', True),
+    ('LibreOffice 24.2.0.3', True),
+])
+def test_page_range_export_requires_lo_74(monkeypatch, version, expected):
+    import labprinter_linux.app.converter as converter_mod
+
+    monkeypatch.setattr(converter_mod, '_find_soffice', lambda: '/usr/bin/soffice')
+    monkeypatch.setattr(converter_mod, '_CONVERTER_VERSION', version)
+    monkeypatch.setattr(converter_mod.config, 'CONVERT_EXPORT_PAGE_RANGE', True)
+    assert converter_mod.supports_page_range_export() is expected
+
+
+def test_count_range_pages_merges_overlaps():
+    from labprinter_linux.app.printer import _count_range_pages
+
+    assert _count_range_pages('3-4') == 2
+    assert _count_range_pages('1-3,2-5,9') == 6
+    assert _count_range_pages('1-2000000') == 2000000
+
+
+def _run_worker(monkeypatch, tmp_path, exported_pages):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.task_queue import TaskQueue
+
+    src = tmp_path / 'thesis.docx'
+    src.write_bytes(b'docx')
+    pdf = tmp_path / 'thesis.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+    seen = {}
+
+    def fake_convert(path, page_range=''):
+        seen['convert_range'] = page_range
+        return str(pdf)
+
+    def fake_print(path, options):
+        seen['print_range'] = options['page_range']
+        return 'HP-1'
+
+    monkeypatch.setattr(worker_mod, 'supports_page_range_export', lambda: True)
+    monkeypatch.setattr(worker_mod, 'convert_to_pdf', fake_convert)
+    monkeypatch.setattr(worker_mod, '_get_pdf_total_pages', lambda path: exported_pages)
+    monkeypatch.setattr(worker_mod, 'print_file', fake_print)
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda queue: None)
+
+    queue = TaskQueue()
+    options = {'copies': 1, 'page_range': '3-4'}
+    task_id = queue.submit(str(src), options, 'thesis.docx')
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(src), options, 'thesis.docx')
+    return queue.get_task(task_id), seen
+
+
+def test_worker_exports_only_requested_pages_and_remaps_range(monkeypatch, tmp_path):
+    task, seen = _run_worker(monkeypatch, tmp_path, exported_pages=2)
+    assert task.state.value == 'SUCCESS'
+    assert seen == {'convert_range': '3-4', 'print_range': '1-2'}
+    assert task.options['page_range'] == '1-2'
+
+
+def test_worker_rejects_range_beyond_document(monkeypatch, tmp_path):
+    task, seen = _run_worker(monkeypatch, tmp_path, exported_pages=1)
+    assert task.state.value == 'FAILURE'
+    assert '页码超出范围' in task.message
+    assert 'print_range' not in seen
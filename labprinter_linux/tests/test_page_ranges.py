@@ -0,0 +1,72 @@
+import pytest
+
+from labprinter_linux.page_ranges import PageRangeError, PageRanges, count, normalize
+
+
+def test_parse_merges_and_normalizes():
+    ranges = PageRanges.parse(' 9, 1-3,2-5 ,6,12-14')
+    assert ranges.intervals == ((1, 6), (9, 9), (12, 14))
+    assert str(ranges) == '1-6,9,12-14'
+    assert len(ranges) == 10
+    assert list(ranges) == [1, 2, 3, 4, 5, 6, 9, 12, 13, 14]
+    assert normalize('3,1,2') == '1-3'
+    assert normalize('') == ''
+    assert count('1-3,2-5,9') == 6
+
+
+def test_membership_and_indexing_without_expanding():
+    ranges = PageRanges.parse('1-1000000,2000000-3000000')
+    assert len(ranges) == 2000001
+    assert 500 in ranges and 2500000 in ranges
+    assert 1000001 not in ranges and 0 not in ranges and 3000001 not in ranges
+    assert ranges[0] == 1 and ranges[999999] == 1000000 and ranges[1000000] == 2000000
+    assert ranges[-1] == 3000000
+    assert str(ranges[999998:1000002]) == '999999-1000000,2000000-2000001'
+    assert ranges.first == 1 and ranges.last == 3000000
+
+
+def test_validation_against_total_pages():
+    assert PageRanges.parse('', 5) == PageRanges([(1, 5)])
+    assert str(PageRanges.parse('2-5', 5)) == '2-5'
+    with pytest.raises(PageRangeError, match=r'页码超出范围\(1-5\): 4-6'):
+        PageRanges.parse('4-6', 5)
+    with pytest.raises(PageRangeError, match='PDF页数无效'):
+        PageRanges.parse('1', 0)
+
+
+@pytest.mark.parametrize('text, message', [
+    ('1-', '页面范围格式错误'),
+    ('a', '页面范围格式错误'),
+    ('1;2', '页面范围格式错误'),
+    (',', '页面范围格式错误'),
+    ('0-3', '页码必须大于等于1'),
+    ('5-3', '起始页不能大于结束页'),
+    ('1,' * 150, '页面范围过长'),
+])
+def test_invalid_ranges(text, message):
+    with pytest.raises(PageRangeError, match=message):
+        PageRanges.parse(text)
+
+
+def test_errors_are_value_errors():
+    # Windows 后端沿用 ValueError 语义
+    with pytest.raises(ValueError):
+        PageRanges.parse('x')
+
+
+def test_linux_wrappers_raise_runtime_error():
+    from labprinter_linux.app.printer import _normalize_page_range, _parse_page_ranges
+
+    assert _normalize_page_range('5,1-3,4') == '1-5'
+    assert len(_parse_page_ranges('', 7)) == 7
+    with pytest.raises(RuntimeError, match='页码超出范围'):
+        _parse_page_ranges('1-8', 7)
+    with pytest.raises(RuntimeError, match='页面范围格式错误'):
+        _normalize_page_range('1--2')
+
+
+def test_plan_shards_accepts_page_ranges():
+    from labprinter_linux.app.pool_router import plan_shards
+
+    plan = plan_shards(PageRanges.parse('1-1000000'), 1, 3)
+    assert [(str(p), c) for p, c in plan] == [('1-333334', 1), ('333335-666667', 1), ('666668-1000000', 1)]
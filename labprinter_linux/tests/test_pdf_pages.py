@@ -0,0 +1,72 @@
+import pytest
+from pypdf import PdfReader
+
+from labprinter_linux.app import pdf_pages
+
+from conftest import make_pdf
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    pdf_pages.clear_cache()
+    yield
+    pdf_pages.clear_cache()
+
+
+CASES = {
+    'classic': dict(pages=7),
+    'xref_stream': dict(pages=12, xref_stream=True),
+    'object_streams': dict(pages=30, xref_stream=True, object_streams=True),
+    'classic_updates': dict(pages=5, updates=(3, 2)),
+    'stream_updates': dict(pages=4, xref_stream=True, object_streams=True, updates=(6,)),
+    'indirect_count': dict(pages=9, deep_tree=True),
+}
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_fast_count_matches_pypdf(tmp_path, name):
+    path = tmp_path / f'{name}.pdf'
+    path.write_bytes(make_pdf(**CASES[name]))
+
+    assert pdf_pages.count_pages(str(path)) == len(PdfReader(str(path)).pages)
+    assert pdf_pages.get_page_count_stats()['fast'] == 1
+
+
+def test_broken_file_falls_back_to_pypdf(tmp_path, monkeypatch):
+    import re
+
+    data = make_pdf(pages=3)
+    path = tmp_path / 'broken.pdf'
+    # startxref 指向错误位置：快速路径放弃，pypdf 重建交叉引用后仍能读出页数
+    path.write_bytes(re.sub(rb'startxref\n\d+', b'startxref\n17', data))
+
+    assert pdf_pages.count_pages(str(path)) == 3
+    assert pdf_pages.get_page_count_stats()['fallback'] == 1
+
+
+def test_garbage_raises_runtime_error(tmp_path):
+    path = tmp_path / 'not.pdf'
+    path.write_bytes(b'this is not a pdf')
+    with pytest.raises(RuntimeError):
+        pdf_pages.count_pages(str(path))
+
+
+def test_results_are_cached_by_content(tmp_path, monkeypatch):
+    data = make_pdf(pages=4, xref_stream=True)
+    first, second = tmp_path / 'a.pdf', tmp_path / 'b.pdf'
+    first.write_bytes(data)
+    second.write_bytes(data)
+
+    assert pdf_pages.count_pages(str(first)) == 4
+    monkeypatch.setattr(pdf_pages, '_Document', lambda buf: pytest.fail('should hit the cache'))
+    assert pdf_pages.count_pages(str(first)) == 4  # 同一文件：按路径/大小/mtime 命中，不再哈希
+    assert pdf_pages.count_pages(str(second)) == 4  # 内容相同的另一个文件：按内容哈希命中
+    assert pdf_pages.get_page_count_stats()['hits'] == 2
+
+
+def test_printer_uses_fast_counter(tmp_path):
+    from labprinter_linux.app.printer import _get_pdf_total_pages
+
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=6, updates=(1,)))
+    assert _get_pdf_total_pages(str(path)) == 7
@@ -0,0 +1,220 @@
+import subprocess
+
+import pytest
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import pool_router as router_mod
+
+    monkeypatch.setattr(router_mod.config, 'PRINTER_POOLS', 'Room101=HP1|HP2|HP3|HP4')
+    monkeypatch.setattr(router_mod.config, 'ALLOWED_PRINTERS', None)
+    monkeypatch.setattr(router_mod.config, 'POOL_PAGES_PER_JOB', 10)
+    states = {}
+
+    def snapshot():
+        return printer_mod.PrinterSnapshot(tuple(
+            printer_mod.PrinterState(name, status, '', jobs=jobs) for name, (status, jobs) in states.items()
+        ), None, 0.0)
+
+    monkeypatch.setattr(printer_mod, 'get_printer_snapshot', snapshot)
+    return router_mod.PoolRouter(), states
+
+
+def test_parse_pools():
+    from labprinter_linux.app.pool_router import _parse_pools
+
+    assert _parse_pools(' Room101 = HP1 | HP2 ;Lab2=A;bad;Empty=') == {'Room101': ['HP1', 'HP2'], 'Lab2': ['A']}
+    assert _parse_pools({'P': ['A', ' B ']}) == {'P': ['A', 'B']}
+
+
+def test_routes_to_least_loaded_enabled_member(pool):
+    router, states = pool
+    states.update({'HP1': ('busy', 3), 'HP2': ('offline', 0), 'HP3': ('ready', 1), 'HP4': ('ready', 1)})
+
+    # HP2 已停用被跳过；HP3/HP4 负载相同时按配置顺序
+    assert router.choose('Room101', 't1', pages=50) == 'HP3'
+    # HP3 现在有 50 页在途（CUPS 作业数 1 已被本服务作业抵消），HP4 估算 10 页
+    assert router.choose('Room101', 't2', pages=5) == 'HP4'
+    assert router.choose('Room101', 't3', pages=5) == 'HP4'
+    assert router.stats()['inflight_pages'] == {'HP3': 50, 'HP4': 10}
+
+    router.release('t1')
+    assert router.choose('Room101', 't4', pages=1) == 'HP3'
+
+
+def test_prefers_ready_member_on_tie(pool):
+    router, states = pool
+    states.update({'HP1': ('busy', 0), 'HP2': ('ready', 0)})
+    assert router.choose('Room101', 't1', pages=1) == 'HP2'
+
+
+def test_no_available_member_raises(pool):
+    router, states = pool
+    states.update({'HP1': ('offline', 0)})
+    with pytest.raises(RuntimeError, match='没有可用的打印机'):
+        router.choose('Room101', 't1', pages=1)
+
+
+def test_worker_routes_pool_and_reports_printer(pool, monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.task_queue import TaskQueue
+
+    router, states = pool
+    states.update({'HP1': ('ready', 4), 'HP2': ('ready', 0)})
+    sent = []
+    monkeypatch.setattr(worker_mod, 'pool_router', router)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda queue: None)
+    monkeypatch.setattr(worker_mod, '_get_pdf_total_pages', lambda path: 3)
+    monkeypatch.setattr(worker_mod, 'print_file', lambda path, options: sent.append(options['printer']) or 'HP2-7')
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+
+    queue = TaskQueue()
+    options = {'copies': 2, 'printer': 'Room101', 'page_range': ''}
+    task_id = queue.submit(str(pdf), options)
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), options, 'a.pdf')
+
+    task = queue.get_task(task_id)
+    assert sent == ['HP2']
+    assert task.result == {'job_id': 'HP2-7', 'status': 'completed', 'printer': 'HP2'}
+    assert router.stats()['inflight_pages'] == {}  # 未跟踪作业时提交后立即释放
+
+
+def test_pool_lane_limit_scales_with_members(pool, monkeypatch):
+    from labprinter_linux.app import task_queue as tq
+
+    monkeypatch.setattr(tq.config, 'MAX_CONCURRENT_JOBS', 3)
+    monkeypatch.setattr(tq.config, 'PRINTER_LANE_CONCURRENCY', 0)
+    monkeypatch.setattr(tq.config, 'PRINTER_LANE_LIMITS', '')
+    queue = tq.TaskQueue()
+    assert queue.lane_limit('Room101') == 12
+    queue.submit('/tmp/x.pdf', {'printer': 'Solo'})
+    assert queue.lane_limit('Room101') == 8  # 其它打印机有任务排队：每成员让出一个
+
+
+def test_plan_shards_by_copies_and_by_pages():
+    from labprinter_linux.app.pool_router import plan_shards
+
+    pages = list(range(1, 41))
+    assert plan_shards(pages, 30, 4) == [(pages, 8), (pages, 8), (pages, 7), (pages, 7)]
+    assert plan_shards(pages, 2, 4) == [(pages, 1), (pages, 1)]
+    assert plan_shards(list(range(1, 11)), 1, 3) == [([1, 2, 3, 4], 1), ([5, 6, 7], 1), ([8, 9, 10], 1)]
+    # 双面：每个页段都是偶数页，同一张纸不会被拆开
+    assert plan_shards(list(range(1, 11)), 1, 3, duplex=True) == [([1, 2, 3, 4], 1), ([5, 6, 7, 8], 1), ([9, 10], 1)]
+    assert plan_shards([1], 1, 4) == [([1], 1)]
+    assert plan_shards(pages, 5, 1) == [(pages, 5)]
+
+
+def test_worker_splits_large_job_across_pool(pool, monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.job_tracker import JobTracker
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    router, states = pool
+    states.update({'HP1': ('ready', 0), 'HP2': ('ready', 2), 'HP3': ('offline', 0), 'HP4': ('ready', 0)})
+    monkeypatch.setattr(worker_mod.config, 'POOL_SHARD_MIN_PAGES', 100)
+    monkeypatch.setattr(worker_mod.config, 'POOL_SHARD_MAX', 0)
+    queue = TaskQueue()
+    tracker = JobTracker(queue, interval=1, timeout=0)
+    sent = {}
+
+    def fake_print(path, options):
+        sent[options['printer']] = (options['page_range'], options['copies'])
+        return f"{options['printer']}-{len(sent)}"
+
+    monkeypatch.setattr(worker_mod, 'pool_router', router)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda q: tracker)
+    monkeypatch.setattr(worker_mod, '_get_pdf_total_pages', lambda path: 40)
+    monkeypatch.setattr(worker_mod, 'print_file', fake_print)
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    pdf = tmp_path / 'exam.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+
+    options = {'copies': 30, 'printer': 'Room101', 'page_range': '', 'duplex': 'one-sided'}
+    task_id = queue.submit(str(pdf), options)
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), options, 'exam.pdf')
+
+    assert sent == {'HP1': ('1-40', 10), 'HP2': ('1-40', 10), 'HP4': ('1-40', 10)}
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.QUEUED
+    assert [s['printer'] for s in task.result['shards']] == ['HP1', 'HP4', 'HP2']
+    assert router.stats()['inflight_pages'] == {'HP1': 400, 'HP2': 400, 'HP4': 400}
+    assert tracker.pending() == 1
+
+
+def test_failed_shard_fails_task(pool, monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    router, states = pool
+    states.update({'HP1': ('ready', 0), 'HP2': ('ready', 0)})
+    monkeypatch.setattr(worker_mod.config, 'POOL_SHARD_MIN_PAGES', 10)
+
+    def fake_print(path, options):
+        if options['printer'] == 'HP2':
+            raise RuntimeError('打印机不接受作业')
+        return 'HP1-1'
+
+    monkeypatch.setattr(worker_mod, 'pool_router', router)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda q: None)
+    monkeypatch.setattr(worker_mod, '_get_pdf_total_pages', lambda path: 20)
+    monkeypatch.setattr(worker_mod, 'print_file', fake_print)
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+
+    queue = TaskQueue()
+    options = {'copies': 1, 'printer': 'Room101', 'page_range': ''}
+    task_id = queue.submit(str(pdf), options)
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), options, 'a.pdf')
+
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.FAILURE
+    assert 'HP2' in task.message and 'HP1-1' in task.message
+    assert router.stats()['inflight_pages'] == {}
+
+
+def test_failed_shard_cancels_submitted_shards(pool, monkeypatch, tmp_path):
+    import labprinter_linux.app.print_worker as worker_mod
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app.task_queue import TaskQueue, TaskState
+
+    router, states = pool
+    states.update({'HP1': ('ready', 0), 'HP2': ('ready', 0), 'HP3': ('ready', 0)})
+    monkeypatch.setattr(worker_mod.config, 'POOL_SHARD_MIN_PAGES', 10)
+    monkeypatch.setattr(printer_mod.config, 'PRINTER_BACKEND', 'lpstat')
+
+    def fake_print(path, options):
+        if options['printer'] == 'HP2':
+            raise RuntimeError('打印机不接受作业')
+        return f"{options['printer']}-1"
+
+    cancels = []
+
+    def fake_run_cmd(cmd, timeout, **kwargs):
+        cancels.append(cmd)
+        return subprocess.CompletedProcess(cmd, 1 if cmd[1] == 'HP3-1' else 0, '', 'cancel: 作业已完成')
+
+    monkeypatch.setattr(worker_mod, 'pool_router', router)
+    monkeypatch.setattr(worker_mod, 'get_job_tracker', lambda q: None)
+    monkeypatch.setattr(worker_mod, '_get_pdf_total_pages', lambda path: 30)
+    monkeypatch.setattr(worker_mod, 'print_file', fake_print)
+    monkeypatch.setattr(worker_mod, 'log_print_result', lambda *a, **k: None)
+    monkeypatch.setattr(printer_mod, '_run_cmd', fake_run_cmd)
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+
+    queue = TaskQueue()
+    options = {'copies': 1, 'printer': 'Room101', 'page_range': ''}
+    task_id = queue.submit(str(pdf), options)
+    worker_mod.PrintWorker(queue)._process_task(task_id, str(pdf), options, 'a.pdf')
+
+    task = queue.get_task(task_id)
+    assert task.state == TaskState.FAILURE
+    assert sorted(cmd[1] for cmd in cancels) == ['HP1-1', 'HP3-1']
+    assert all(cmd[0] == printer_mod.config.CANCEL_COMMAND for cmd in cancels)
+    assert '已取消已提交的分片: HP1-1' in task.message
+    assert '取消失败，可能仍会打印: HP3-1' in task.message
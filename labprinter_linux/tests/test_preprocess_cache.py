@@ -0,0 +1,74 @@
+import os
+import threading
+
+import pytest
+
+from labprinter_linux.app import pdf_pages
+from labprinter_linux.page_ranges import PageRanges
+
+
+@pytest.fixture
+def lecture(fake_gs, monkeypatch):
+    """开启预处理缓存（fake_gs 已指向临时目录），返回 30 页的源文档。"""
+    from labprinter_linux import config
+
+    monkeypatch.setattr(config, 'PREPROCESS_CACHE_MAX_MB', 64)
+    return fake_gs.source(30)
+
+
+def test_repeat_print_skips_ghostscript(fake_gs, lecture):
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print, get_preprocess_stats
+
+    first = _preprocess_pdf_for_print(lecture)
+    second = _preprocess_pdf_for_print(lecture)
+    assert fake_gs.runs == 1
+    assert first != second
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+    # 调用方打印后删除自己的副本，不影响缓存条目
+    os.remove(first)
+    os.remove(second)
+    third = _preprocess_pdf_for_print(lecture)
+    os.remove(third)
+    assert fake_gs.runs == 1
+    stats = get_preprocess_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1 and stats['entries'] == 1
+
+
+def test_key_covers_pages_mode_dpi_and_version(fake_gs, lecture, monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+
+    printer_mod._preprocess_pdf_for_print(lecture)
+    printer_mod._preprocess_pdf_for_print(lecture, PageRanges.parse('1-2'))
+    assert fake_gs.runs == 2
+    monkeypatch.setattr(printer_mod.config, 'PDF_RASTER_DPI', 300)
+    printer_mod._preprocess_pdf_for_print(lecture)
+    assert fake_gs.runs == 3
+    monkeypatch.setattr(printer_mod.config, 'PDF_PREPROCESS', 'gs-pdfwrite')
+    printer_mod._preprocess_pdf_for_print(lecture)
+    assert fake_gs.runs == 4
+    # 升级 Ghostscript 后旧条目不再命中
+    fake_gs.version = '10.03.0'
+    monkeypatch.setattr(printer_mod, '_GS_VERSION', None)
+    printer_mod._preprocess_pdf_for_print(lecture)
+    assert fake_gs.runs == 5
+
+
+def test_concurrent_identical_requests_run_gs_once(fake_gs, lecture):
+    from labprinter_linux.app.printer import _preprocess_pdf_for_print
+
+    fake_gs.delay = 0.2
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(_preprocess_pdf_for_print(lecture)))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake_gs.runs == 1
+    assert len(set(results)) == 4
+    for path in results:
+        assert pdf_pages.count_pages(path) == 30
+        os.remove(path)
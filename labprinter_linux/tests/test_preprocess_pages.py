@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.fixture
+def big_pdf(fake_gs):
+    return fake_gs.source(400)
+
+
+def test_only_selected_pages_are_preprocessed(fake_gs, big_pdf):
+    from labprinter_linux.app.printer import print_file
+
+    assert print_file(big_pdf, {'page_range': '7,3'}) == 'HP-7'
+
+    gs_cmd = fake_gs.cmds[0]
+    assert gs_cmd[-2:] == ['-sPageList=3,7', big_pdf]
+    lp_cmd = fake_gs.lp[0]
+    # 预处理结果只含所选的 2 页，lp 整份打印
+    assert not any(a.startswith('page-ranges=') for a in lp_cmd)
+
+
+def test_full_range_preprocesses_whole_document(fake_gs, big_pdf):
+    from labprinter_linux.app.printer import print_file
+
+    print_file(big_pdf, {'page_range': '1-400'})
+    assert not any(a.startswith('-sPageList=') for a in fake_gs.cmds[0])
+    assert not any(a.startswith('page-ranges=') for a in fake_gs.lp[0])
+
+
+def test_old_gs_ignoring_page_list_keeps_range(fake_gs, big_pdf):
+    from labprinter_linux.app.printer import print_file
+
+    fake_gs.ignore_page_list = True
+    print_file(big_pdf, {'page_range': '3,7'})
+    assert 'page-ranges=3,7' in fake_gs.lp[0]
+
+
+def test_out_of_range_fails_before_preprocessing(fake_gs, big_pdf):
+    from labprinter_linux.app.printer import print_file
+
+    with pytest.raises(RuntimeError, match='页码超出范围'):
+        print_file(big_pdf, {'page_range': '399-401'})
+    assert fake_gs.cmds == []
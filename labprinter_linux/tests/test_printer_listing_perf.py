@@ -8,66 +8,62 @@ class DummyResult:
         self.stderr = stderr
 
 
-def test_get_printers_uses_single_lpstat_o(monkeypatch):
+LPSTAT_COMMAND_ARGS = ["-d", "-p", "-o"]
+
+
+def test_listing_and_validation_share_one_lpstat_call(monkeypatch):
     import labprinter_linux.app.printer as printer_mod
 
     # 清空缓存，保证本测试可控
-    printer_mod._DEFAULT_PRINTER_CACHE = None
-    printer_mod._PRINTER_NAMES_CACHE = None
-    printer_mod._JOBS_COUNT_CACHE = None
+    printer_mod._SNAPSHOT_CACHE.invalidate()
 
-    monkeypatch.setattr(printer_mod.config, "DEFAULT_PRINTER", "HP")
+    monkeypatch.setattr(printer_mod.config, "DEFAULT_PRINTER", None)
     monkeypatch.setattr(printer_mod.config, "ALLOWED_PRINTERS", None)
 
     calls = []
 
     def fake_run_cmd(cmd, timeout):
         calls.append(cmd)
-        if cmd[1] == "-p":
-            return DummyResult(
-                0,
-                "printer HP is idle. enabled since ...\n"
-                "printer Canon is idle. enabled since ...\n",
-                "",
-            )
-        if cmd[1] == "-o":
+        if cmd[1:] == LPSTAT_COMMAND_ARGS:
             return DummyResult(
                 0,
+                "system default destination: HP\n"
+                "printer HP is idle.  enabled since ...\n"
+                "printer Canon now printing Canon-55.  enabled since ...\n"
+                "\tWaiting for job to complete.\n"
+                "printer Epson disabled since ...\n"
                 "HP-123 user 1024 ...\n"
                 "HP-124 user 1024 ...\n"
                 "Canon-55 user 1024 ...\n",
                 "",
             )
-        if cmd[1] == "-d":
-            return DummyResult(0, "system default destination: HP\n", "")
         raise AssertionError(f"unexpected cmd: {cmd}")
 
     monkeypatch.setattr(printer_mod, "_run_cmd", fake_run_cmd)
 
-    printers = printer_mod.get_printers()
-    assert {p["name"] for p in printers} == {"HP", "Canon"}
-    jobs = {p["name"]: p["jobs"] for p in printers}
-    assert jobs["HP"] == 2
-    assert jobs["Canon"] == 1
+    printers = {p["name"]: p for p in printer_mod.get_printers()}
+    assert set(printers) == {"HP", "Canon", "Epson"}
+    assert printers["HP"]["jobs"] == 2 and printers["HP"]["is_default"]
+    assert printers["Canon"]["jobs"] == 1 and printers["Canon"]["status"] == "busy"
+    assert printers["Epson"]["status"] == "offline"
 
-    # 只允许 1 次 lpstat -p + 1 次 lpstat -o，不应按打印机逐个调用 lpstat -o <printer>
-    assert calls.count([printer_mod.config.LPSTAT_COMMAND, "-p"]) == 1
-    assert calls.count([printer_mod.config.LPSTAT_COMMAND, "-o"]) == 1
+    # 列表、默认打印机、名称校验读同一份快照：只 fork 一次 lpstat
+    assert printer_mod.get_default_printer() == "HP"
+    assert printer_mod.validate_printer_name("Canon") is True
+    assert printer_mod.validate_printer_name("Missing") is False
+    assert calls == [[printer_mod.config.LPSTAT_COMMAND, *LPSTAT_COMMAND_ARGS]]
 
 
 def test_allowed_printers_filters_list_and_validation(monkeypatch):
     import labprinter_linux.app.printer as printer_mod
 
-    printer_mod._PRINTER_NAMES_CACHE = None
-    printer_mod._JOBS_COUNT_CACHE = None
+    printer_mod._SNAPSHOT_CACHE.invalidate()
     monkeypatch.setattr(printer_mod.config, "DEFAULT_PRINTER", "HP")
     monkeypatch.setattr(printer_mod.config, "ALLOWED_PRINTERS", ["HP"])
 
     def fake_run_cmd(cmd, timeout):
-        if cmd[1] == "-p":
-            return DummyResult(0, "printer HP is idle.\nprinter Canon is idle.\n", "")
-        if cmd[1] == "-o":
-            return DummyResult(0, "HP-1 user ...\nCanon-2 user ...\n", "")
+        if cmd[1:] == LPSTAT_COMMAND_ARGS:
+            return DummyResult(0, "printer HP is idle.\nprinter Canon is idle.\nHP-1 user ...\nCanon-2 user ...\n", "")
         raise AssertionError(f"unexpected cmd: {cmd}")
 
     monkeypatch.setattr(printer_mod, "_run_cmd", fake_run_cmd)
@@ -78,10 +74,10 @@ def test_allowed_printers_filters_list_and_validation(monkeypatch):
     assert printer_mod.validate_printer_name("Canon") is False
 
 
-def test_default_printer_is_cached(monkeypatch):
+def test_snapshot_is_cached(monkeypatch):
     import labprinter_linux.app.printer as printer_mod
 
-    printer_mod._DEFAULT_PRINTER_CACHE = None
+    printer_mod._SNAPSHOT_CACHE.invalidate()
 
     calls = []
     now = {"t": 100.0}
@@ -91,16 +87,76 @@ def test_default_printer_is_cached(monkeypatch):
 
     def fake_run_cmd(cmd, timeout):
         calls.append(cmd)
-        return DummyResult(0, "system default destination: HP\n", "")
+        return DummyResult(0, "system default destination: HP\nprinter HP is idle.\n", "")
 
     monkeypatch.setattr(printer_mod.time, "monotonic", fake_monotonic)
     monkeypatch.setattr(printer_mod, "_run_cmd", fake_run_cmd)
 
     assert printer_mod.get_default_printer() == "HP"
-    assert printer_mod.get_default_printer() == "HP"
-    assert calls.count([printer_mod.config.LPSTAT_COMMAND, "-d"]) == 1
+    assert printer_mod.get_printer_names() == {"HP"}
+    assert len(calls) == 1
 
     now["t"] = 200.0
     assert printer_mod.get_default_printer() == "HP"
-    assert calls.count([printer_mod.config.LPSTAT_COMMAND, "-d"]) == 2
+    assert len(calls) == 2
+
+
+def test_lpstat_failure_yields_empty_snapshot(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+
+    printer_mod._SNAPSHOT_CACHE.invalidate()
+    monkeypatch.setattr(printer_mod, "_run_cmd", lambda cmd, timeout: DummyResult(1, "", "lpstat: Bad file descriptor"))
+
+    assert printer_mod.get_printers() == []
+    assert printer_mod.get_default_printer() is None
+    assert printer_mod.get_printer_snapshot().ok is False
+
 
+def test_refresher_serves_last_good_snapshot_and_backs_off(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+
+    printer_mod._SNAPSHOT_CACHE.invalidate()
+    monkeypatch.setattr(printer_mod.config, "ALLOWED_PRINTERS", None)
+    outputs = [DummyResult(0, "printer HP is idle.\n", "")]
+
+    def fake_run_cmd(cmd, timeout):
+        result = outputs[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(printer_mod, "_run_cmd", fake_run_cmd)
+    refresher = printer_mod.PrinterRefresher(interval=10, max_backoff=60)
+    monkeypatch.setattr(printer_mod, "_REFRESHER", refresher)
+
+    assert refresher.refresh_once() is True
+    good = printer_mod.get_printer_snapshot()
+
+    # CUPS 无响应：继续提供上一次成功的快照，刷新间隔指数退避且有上限
+    outputs[0] = TimeoutError("lpstat timed out")
+    delays = []
+    for _ in range(4):
+        assert refresher.refresh_once() is False
+        delays.append(refresher.delay)
+    assert delays == [20, 40, 60, 60]
+    assert printer_mod.get_printer_snapshot() is good
+    assert printer_mod.get_printer_names() == {"HP"}
+
+    outputs[0] = DummyResult(0, "printer HP is idle.\nprinter Canon is idle.\n", "")
+    assert refresher.refresh_once() is True
+    assert refresher.delay == 10
+    assert printer_mod.get_printer_names() == {"HP", "Canon"}
+
+
+def test_requests_never_query_cups_while_refresher_runs(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+
+    monkeypatch.setattr(printer_mod, "_REFRESHER", printer_mod.PrinterRefresher(interval=10, max_backoff=60))
+    stale = printer_mod.PrinterSnapshot((printer_mod.PrinterState("HP"),), "HP", taken_at=0.0)
+    cache = printer_mod.SingleFlightCache(5.0)
+    cache.put(printer_mod._SNAPSHOT_KEY, stale)
+    monkeypatch.setattr(printer_mod, "_SNAPSHOT_CACHE", cache)
+    monkeypatch.setattr(printer_mod, "_run_cmd", lambda *a, **k: pytest.fail("request thread must not fork lpstat"))
+
+    assert printer_mod.get_printer_snapshot() is stale
+    assert printer_mod.get_default_printer() == "HP"
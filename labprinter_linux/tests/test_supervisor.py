@@ -0,0 +1,144 @@
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+
+def _alive(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+def test_orphaned_children_are_killed(tmp_path):
+    from labprinter_linux.app.supervisor import get_tool_stats, run_tool
+
+    pid_file = tmp_path / 'child.pid'
+    start = time.monotonic()
+    result = run_tool('orphan-test', ['sh', '-c', f'sleep 30 & echo $! > {pid_file}; echo done'], timeout=20, stall_timeout=0)
+
+    assert result.returncode == 0 and result.stdout.strip() == 'done'
+    assert time.monotonic() - start < 5
+    time.sleep(0.1)
+    assert not _alive(int(pid_file.read_text()))
+    assert get_tool_stats()['orphan-test']['orphans'] == 1
+
+
+def test_stalled_tool_is_killed_before_timeout():
+    from labprinter_linux.app.supervisor import ToolStalled, get_tool_stats, run_tool
+
+    start = time.monotonic()
+    with pytest.raises(ToolStalled):
+        run_tool('stall-test', ['sleep', '30'], timeout=20, stall_timeout=1)
+    assert time.monotonic() - start < 5
+    stats = get_tool_stats()['stall-test']
+    assert stats['stalls'] == 1 and stats['kills'] == 1
+
+
+def test_busy_tool_is_not_considered_stalled():
+    from labprinter_linux.app.supervisor import run_tool
+
+    code = 'import time\nend = time.time() + 2\nwhile time.time() < end: pass\nprint("ok")'
+    result = run_tool('busy-test', [sys.executable, '-c', code], timeout=20, stall_timeout=1)
+    assert result.stdout.strip() == 'ok'
+
+
+def test_timeout_kills_whole_group(tmp_path):
+    from labprinter_linux.app.supervisor import get_tool_stats, run_tool
+
+    pid_file = tmp_path / 'child.pid'
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_tool('timeout-test', ['sh', '-c', f'sleep 30 & echo $! > {pid_file}; wait'], timeout=1, stall_timeout=0)
+    time.sleep(0.1)
+    assert not _alive(int(pid_file.read_text()))
+    assert get_tool_stats()['timeout-test']['timeouts'] == 1
+
+
+def test_memory_limit_fails_with_clear_cause(monkeypatch):
+    from labprinter_linux import config
+    from labprinter_linux.app.supervisor import ToolLimitExceeded, get_tool_stats, run_tool
+
+    monkeypatch.setattr(config, 'GS_MEMORY_LIMIT_MB', 200)
+    with pytest.raises(ToolLimitExceeded, match='内存限制'):
+        run_tool('mem-test', [sys.executable, '-c', 'b = bytearray(512 * 1024 * 1024)'], timeout=20, stall_timeout=0, role='gs')
+    assert get_tool_stats()['mem-test']['memory_limits'] == 1
+
+
+def test_cpu_limit_fails_with_clear_cause(monkeypatch):
+    from labprinter_linux import config
+    from labprinter_linux.app.supervisor import ToolLimitExceeded, get_tool_stats, run_tool
+
+    monkeypatch.setattr(config, 'GS_CPU_LIMIT_SECONDS', 1)
+    start = time.monotonic()
+    with pytest.raises(ToolLimitExceeded, match='CPU'):
+        run_tool('cpu-test', [sys.executable, '-c', 'while True: pass'], timeout=20, stall_timeout=0, role='gs')
+    assert time.monotonic() - start < 10
+    assert get_tool_stats()['cpu-test']['cpu_limits'] == 1
+
+
+def test_crash_under_memory_limit_reports_raw_signal(monkeypatch):
+    from labprinter_linux import config
+    from labprinter_linux.app.supervisor import get_tool_stats, run_tool
+
+    monkeypatch.setattr(config, 'GS_MEMORY_LIMIT_MB', 200)
+    code = 'import os, signal; os.kill(os.getpid(), signal.SIGSEGV)'
+    result = run_tool('segv-test', [sys.executable, '-c', code], timeout=20, stall_timeout=0, role='gs')
+
+    # 没有内存申请失败的证据：不归咎于内存限制
+    assert result.returncode == -signal.SIGSEGV
+    assert 'SIGSEGV' in result.stderr
+    assert get_tool_stats()['segv-test']['memory_limits'] == 0
+
+
+def test_limits_are_applied_to_the_child(monkeypatch):
+    from labprinter_linux import config
+    from labprinter_linux.app.supervisor import run_tool
+
+    monkeypatch.setattr(config, 'SOFFICE_MEMORY_LIMIT_MB', 300)
+    monkeypatch.setattr(config, 'SOFFICE_CPU_LIMIT_SECONDS', 7)
+    code = 'import resource, time; time.sleep(0.3); print(resource.getrlimit(resource.RLIMIT_AS)[0], resource.getrlimit(resource.RLIMIT_CPU))'
+    result = run_tool('limits-test', [sys.executable, '-c', code], timeout=20, stall_timeout=0, role='soffice')
+    assert result.stdout.split(None, 1) == [str(300 * 1024 * 1024), '(7, 12)\n']
+
+
+def test_limits_do_not_affect_tools_without_role_and_peak_rss_is_recorded(monkeypatch):
+    from labprinter_linux import config
+    from labprinter_linux.app.supervisor import get_tool_stats, run_tool
+
+    monkeypatch.setattr(config, 'TOOL_MEMORY_LIMIT_MB', 64)
+    code = 'import time\nb = bytearray(b"x" * (96 * 1024 * 1024))\ntime.sleep(1.5)\nprint("ok")'
+    result = run_tool('rss-test', [sys.executable, '-c', code], timeout=20, stall_timeout=0)
+
+    assert result.stdout.strip() == 'ok'
+    stats = get_tool_stats()['rss-test']
+    assert stats['peak_rss_bytes'] >= 90 * 1024 * 1024
+    assert stats['memory_limits'] == 0
+
+
+def test_cups_tools_are_not_stall_checked(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+
+    calls = []
+    monkeypatch.setattr(printer_mod, 'run_tool', lambda tool, cmd, **kw: calls.append((tool, kw['stall_timeout'])))
+    printer_mod._run_cmd([printer_mod.config.LPSTAT_COMMAND, '-p'], timeout=10)
+    printer_mod._run_cmd(['/usr/bin/cancel', '12'], timeout=10)
+    printer_mod._run_cmd(['gs', '--version'], timeout=10)
+    assert [c[1] for c in calls] == [0, 0, None]
+
+
+def test_limits_follow_role_not_executable_name(monkeypatch):
+    import labprinter_linux.app.printer as printer_mod
+    from labprinter_linux.app import supervisor
+
+    monkeypatch.setattr(printer_mod.config, 'TOOL_MEMORY_LIMIT_MB', 100)
+    monkeypatch.setattr(printer_mod.config, 'GS_MEMORY_LIMIT_MB', 900)
+    calls = []
+    monkeypatch.setattr(printer_mod, 'run_tool', lambda tool, cmd, **kw: calls.append((tool, supervisor.tool_limits(kw['role'])[0])))
+    printer_mod._run_cmd(['/opt/gs/bin/gs-10', '-o', 'out.pdf'], timeout=10, role='gs')
+    printer_mod._run_cmd([printer_mod.config.LP_COMMAND, '-d', 'HP'], timeout=10)
+    printer_mod._run_cmd([printer_mod.config.CANCEL_COMMAND, '12'], timeout=10)
+    assert calls == [('gs', 900 * 1024 * 1024), ('lp', 0), ('cancel', 0)]
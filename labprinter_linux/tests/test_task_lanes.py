@@ -0,0 +1,100 @@
+import pytest
+
+
+@pytest.fixture
+def lanes(monkeypatch):
+    from labprinter_linux.app import task_queue as tq
+
+    monkeypatch.setattr(tq.config, 'DEFAULT_PRINTER', None)
+    monkeypatch.setattr(tq.config, 'MAX_CONCURRENT_JOBS', 3)
+    monkeypatch.setattr(tq.config, 'MAX_QUEUE_SIZE', 50)
+    monkeypatch.setattr(tq.config, 'PRINTER_LANE_CONCURRENCY', 0)
+    monkeypatch.setattr(tq.config, 'PRINTER_LANE_LIMITS', '')
+    return tq
+
+
+def test_single_printer_uses_every_worker(lanes):
+    queue = lanes.TaskQueue()
+    tasks = [queue.submit(f'/tmp/{i}.pdf', {'printer': 'HP'}) for i in range(4)]
+
+    claimed = [queue.get_next(timeout=0) for _ in range(3)]
+    assert claimed == tasks[:3]
+    assert queue.lane_stats()['HP'] == {'queued': 1, 'held': 0, 'running': 3, 'limit': 3}
+
+
+def test_slow_printer_leaves_a_worker_for_waiting_printers(lanes):
+    queue = lanes.TaskQueue()
+    plotter = [queue.submit(f'/tmp/p{i}.pdf', {'printer': 'Plotter'}) for i in range(4)]
+    first = queue.get_next(timeout=0)
+    second = queue.get_next(timeout=0)
+    laser = [queue.submit(f'/tmp/l{i}.pdf', {'printer': 'HP'}) for i in range(2)]
+
+    # 其它打印机有任务排队：Plotter 的上限降为 2（MAX_CONCURRENT_JOBS-1），第三个工作线程留给 HP
+    assert queue.get_next(timeout=0) == laser[0]
+    stats = queue.lane_stats()
+    assert stats['Plotter'] == {'queued': 2, 'held': 0, 'running': 2, 'limit': 2}
+    assert stats['HP'] == {'queued': 1, 'held': 0, 'running': 1, 'limit': 2}
+
+    queue.task_done(laser[0])
+    assert queue.get_next(timeout=0) == laser[1]
+    queue.task_done(laser[1])
+    # HP 不再有排队任务：Plotter 可以用满全部工作线程
+    assert queue.get_next(timeout=0) == plotter[2]
+    assert queue.lane_stats()['Plotter'] == {'queued': 1, 'held': 0, 'running': 3, 'limit': 3}
+    queue.task_done(first)
+    queue.task_done(second)
+    assert queue.get_next(timeout=0) == plotter[3]
+
+
+def test_lanes_are_served_round_robin(lanes):
+    queue = lanes.TaskQueue()
+    a = [queue.submit(f'/tmp/a{i}.pdf', {'printer': 'A'}) for i in range(2)]
+    b = [queue.submit(f'/tmp/b{i}.pdf', {'printer': 'B'}) for i in range(2)]
+
+    order = []
+    for _ in range(4):
+        task_id = queue.get_next(timeout=0)
+        order.append(task_id)
+        queue.task_done(task_id)
+    assert order == [a[0], b[0], a[1], b[1]]
+
+
+def test_per_printer_limits_and_default_lane(lanes, monkeypatch):
+    monkeypatch.setattr(lanes.config, 'PRINTER_LANE_LIMITS', 'Plotter=1, HP = 3')
+    queue = lanes.TaskQueue()
+    assert queue.lane_limit('Plotter') == 1
+    assert queue.lane_limit('HP') == 3
+    assert queue.lane_limit('Canon') == 3
+
+    queue.submit('/tmp/x.pdf', {'printer': ''})
+    assert queue.lane_stats() == {'(default)': {'queued': 1, 'held': 0, 'running': 0, 'limit': 3}}
+    assert queue.lane_limit('Canon') == 2
+
+
+def test_queue_size_limit_counts_waiting_tasks(lanes, monkeypatch):
+    monkeypatch.setattr(lanes.config, 'MAX_QUEUE_SIZE', 2)
+    queue = lanes.TaskQueue()
+    queue.submit('/tmp/1.pdf', {'printer': 'A'})
+    queue.submit('/tmp/2.pdf', {'printer': 'B'})
+    with pytest.raises(RuntimeError):
+        queue.submit('/tmp/3.pdf', {'printer': 'C'})
+
+    queue.get_next(timeout=0)
+    queue.submit('/tmp/3.pdf', {'printer': 'C'})
+
+
+def test_waiting_worker_wakes_when_lane_frees(lanes, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(lanes.config, 'PRINTER_LANE_LIMITS', {'Plotter': 1})
+    queue = lanes.TaskQueue()
+    first = queue.submit('/tmp/1.pdf', {'printer': 'Plotter'})
+    second = queue.submit('/tmp/2.pdf', {'printer': 'Plotter'})
+    assert queue.get_next(timeout=0) == first
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(queue.get_next(timeout=5)))
+    waiter.start()
+    queue.task_done(first)
+    waiter.join(5)
+    assert got == [second]
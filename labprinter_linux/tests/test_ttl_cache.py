@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from labprinter_linux.app.ttl_cache import SingleFlightCache
+
+
+def test_concurrent_misses_load_once():
+    cache = SingleFlightCache(60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('k', loader))) for _ in range(40)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == ['value'] * 40
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['waits'] + stats['hits'] == 39
+
+
+def test_failures_are_negatively_cached_and_shared(monkeypatch):
+    now = {'t': 100.0}
+    monkeypatch.setattr(time, 'monotonic', lambda: now['t'])
+    cache = SingleFlightCache(60, negative_ttl=5)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError('cups down')
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match='cups down'):
+            cache.get('k', failing)
+    assert len(calls) == 1
+    assert cache.stats()['negative_hits'] == 2
+
+    now['t'] = 106.0  # 负缓存过期后重试
+    assert cache.get('k', lambda: 'ok') == 'ok'
+    now['t'] = 150.0
+    assert cache.get('k', failing) == 'ok'  # 正常值按完整 TTL 缓存
+
+
+def test_is_failure_values_use_negative_ttl(monkeypatch):
+    now = {'t': 0.0}
+    monkeypatch.setattr(time, 'monotonic', lambda: now['t'])
+    cache = SingleFlightCache(60, negative_ttl=0, is_failure=lambda v: v is None)
+
+    assert cache.get('k', lambda: None) is None
+    assert cache.get('k', lambda: 'fresh') == 'fresh'  # negative_ttl=0：失败结果不缓存
+    assert cache.peek('k') == 'fresh'
+    now['t'] = 61.0
+    assert cache.peek('k') is None
+    assert cache.peek('k', allow_expired=True) == 'fresh'
@@ -52,3 +52,13 @@ class TestDevModeDocumentProperties:
         result = printer_mod._driver_validate_devmode(object(), "Printer", devmode)
         assert result is devmode
 
+
+
+class TestParsePageRange:
+    def test_overlapping_ranges_are_merged(self):
+        assert printer_mod.parse_page_range('5-7,1-3,3', 10) == [0, 1, 2, 4, 5, 6]
+        assert printer_mod._parse_page_intervals('5-7,1-4', 10) == [(1, 7)]
+
+    def test_huge_range_is_rejected_before_expansion(self):
+        with pytest.raises(ValueError, match='超出范围'):
+            printer_mod.parse_page_range('1-2000000', 10)